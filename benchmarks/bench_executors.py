@@ -0,0 +1,183 @@
+"""
+执行器基准测试
+
+使用 Claude CLI 替身和临时 tmux 服务器, 测量 ClaudeCliExecutor / ClaudeCliDirectExecutor /
+TmuxCommandExecutor 在不同并发下的延迟分位数、进程启动开销和最大可持续吞吐
+
+用法:
+    python benchmarks/bench_executors.py --sessions 16 --concurrency 1,4,16 --latency-ms 200
+"""
+
+import sys 
+import json 
+import time 
+import argparse 
+import threading 
+from concurrent .futures import ThreadPoolExecutor 
+from pathlib import Path 
+from typing import Callable ,List 
+
+sys .path .insert (0 ,str (Path (__file__ ).parent ))
+
+from harness import FakeEnvironment ,FakeClaudeOptions ,LatencyStats ,print_table 
+
+from feishu_bot .session import SessionManager ,SessionConfig 
+from feishu_bot .command import (
+ClaudeCliExecutor ,
+ClaudeCliDirectExecutor ,
+TmuxCommandExecutor ,
+ResourceLimits 
+)
+
+
+EXECUTORS =('claude','direct','tmux')
+
+
+def build_sessions (env :FakeEnvironment ,kind :str ,count :int ):
+
+    session_manager =SessionManager (
+    env .storage_path (f"sessions-{kind }.json"),
+    SessionConfig (cleanup_interval_minutes =0 )
+    )
+
+    sessions =[]
+    for i in range (count ):
+        tmux_name =f"bench-{kind }-{i }"
+        if kind =='tmux':
+            env .create_tmux_session (tmux_name )
+        sessions .append (session_manager .create_session (
+        user_id =f"bench_user_{i }",
+        open_id =f"ou_bench_{i }",
+        tmux_session =tmux_name ,
+        working_dir =str (env .root )
+        ))
+    return session_manager ,sessions 
+
+
+def make_call (kind :str ,session_manager ,limits :ResourceLimits )->Callable :
+
+    if kind =='claude':
+        executor =ClaudeCliExecutor (session_manager ,limits )
+        return lambda s ,i :executor .execute_command (s .token ,f"bench command {i }",s .user_id )
+    if kind =='direct':
+        executor =ClaudeCliDirectExecutor (session_manager ,limits )
+        return lambda s ,i :executor .send_message (s .open_id ,f"bench message {i }")
+    executor =TmuxCommandExecutor (session_manager ,limits )
+    return lambda s ,i :executor .execute_command (s .token ,f"echo bench {i }",s .user_id )
+
+
+def run_level (call :Callable ,sessions :list ,concurrency :int ,commands :int )->LatencyStats :
+
+    stats =LatencyStats ()
+    lock =threading .Lock ()
+
+    def worker (worker_index :int )->None :
+        session =sessions [worker_index %len (sessions )]
+        for i in range (commands ):
+            start =time .perf_counter ()
+            try :
+                result =call (session ,i )
+                ok =result .success 
+            except Exception :
+                ok =False 
+            elapsed_ms =(time .perf_counter ()-start )*1000 
+            with lock :
+                stats .latencies_ms .append (elapsed_ms )
+                if not ok :
+                    stats .errors +=1 
+
+    start =time .perf_counter ()
+    with ThreadPoolExecutor (max_workers =concurrency )as pool :
+        list (pool .map (worker ,range (concurrency )))
+    stats .duration_s =time .perf_counter ()-start 
+    return stats 
+
+
+def bench_executor (kind :str ,env :FakeEnvironment ,args ,claude_options :FakeClaudeOptions )->dict :
+
+    session_manager ,sessions =build_sessions (env ,kind ,args .sessions )
+    limits =ResourceLimits ()
+
+
+    env .set_claude (FakeClaudeOptions (output_bytes =0 ))
+    call =make_call (kind ,session_manager ,limits )
+    spawn =run_level (call ,sessions ,1 ,args .spawn_samples )
+
+    env .set_claude (claude_options )
+    levels =[]
+    for concurrency in args .concurrency :
+        stats =run_level (call ,sessions ,concurrency ,args .commands )
+        row ={'executor':kind ,'concurrency':concurrency }
+        row .update (stats .summary ())
+        levels .append (row )
+
+    sustainable =[
+    row for row in levels 
+    if row ['p95_ms']<=args .slo_p95_ms and row ['error_rate']<=args .max_error_rate 
+    ]
+    max_cps =max ((row ['throughput_per_s']for row in sustainable ),default =0.0 )
+
+    return {
+    'executor':kind ,
+    'spawn_overhead':spawn .summary (),
+    'levels':levels ,
+    'max_sustainable_cps':max_cps 
+    }
+
+
+def parse_args (argv :List [str ]):
+
+    parser =argparse .ArgumentParser (description ="Executor throughput benchmark")
+    parser .add_argument ('--executor',choices =EXECUTORS +('all',),default ='all')
+    parser .add_argument ('--sessions',type =int ,default =8 )
+    parser .add_argument ('--concurrency',type =lambda v :[int (x )for x in v .split (',')],default =[1 ,2 ,4 ,8 ])
+    parser .add_argument ('--commands',type =int ,default =10 ,help ="commands per worker at each level")
+    parser .add_argument ('--spawn-samples',type =int ,default =20 )
+    parser .add_argument ('--latency-ms',type =float ,default =100 )
+    parser .add_argument ('--jitter-ms',type =float ,default =0 )
+    parser .add_argument ('--output-bytes',type =int ,default =4096 )
+    parser .add_argument ('--stream-chunks',type =int ,default =1 )
+    parser .add_argument ('--fail-rate',type =float ,default =0 )
+    parser .add_argument ('--slo-p95-ms',type =float ,default =5000 )
+    parser .add_argument ('--max-error-rate',type =float ,default =0.01 )
+    parser .add_argument ('--fake-tmux',action ='store_true',help ="use the tmux stand-in even if tmux is installed")
+    parser .add_argument ('--json',dest ='json_path',default ="",help ="write results to this file")
+    return parser .parse_args (argv )
+
+
+def main (argv :List [str ])->int :
+
+    args =parse_args (argv )
+    kinds =EXECUTORS if args .executor =='all'else (args .executor ,)
+    claude_options =FakeClaudeOptions (
+    latency_ms =args .latency_ms ,
+    jitter_ms =args .jitter_ms ,
+    output_bytes =args .output_bytes ,
+    stream_chunks =args .stream_chunks ,
+    fail_rate =args .fail_rate 
+    )
+
+    results =[]
+    with FakeEnvironment (claude_options ,real_tmux =not args .fake_tmux )as env :
+        print (f"tmux: {'throwaway server'if env .real_tmux else 'stand-in'}, workdir: {env .root }")
+        for kind in kinds :
+            results .append (bench_executor (kind ,env ,args ,claude_options ))
+
+    columns =['executor','concurrency','count','errors','throughput_per_s','p50_ms','p95_ms','p99_ms']
+    print ()
+    print_table ([row for r in results for row in r ['levels']],columns )
+    print ()
+    for r in results :
+        spawn =r ['spawn_overhead']
+        print (
+        f"{r ['executor']}: spawn overhead p50={spawn ['p50_ms']}ms p95={spawn ['p95_ms']}ms, "
+        f"max sustainable {r ['max_sustainable_cps']} cmd/s (p95 <= {args .slo_p95_ms }ms)"
+        )
+
+    if args .json_path :
+        Path (args .json_path ).write_text (json .dumps (results ,indent =2 ),encoding ='utf-8')
+    return 0 
+
+
+if __name__ =="__main__":
+    sys .exit (main (sys .argv [1 :]))
@@ -0,0 +1,412 @@
+"""
+HTTP 入口压测 - 在进程内启动 webhook 服务与机器人服务, 按给定速率回放混合流量
+
+- 两个服务各自运行在独立线程的 uvicorn 中, 飞书开放平台替身同样以 uvicorn 线程监听本机端口,
+  服务通过 feishu.base_url 访问替身; Claude CLI 使用 fakes/fake_claude.py
+- 流量构成: Hook 通知 (标准 JSON 与 Windows 终端转义损坏的载荷语料)、url_verification、
+  im.message.receive_v1 (/help 与 "<令牌>: <命令>") 以及重复投递的事件
+- 开环发压: 请求按预定时间发出, 不等待前一个请求完成; 延迟从预定发送时间算起,
+  服务变慢时排队时间也计入延迟, 不会因压测端被拖慢而低估尾延迟
+- 每个速率阶段输出各类流量的吞吐、延迟分位数与错误率, 以及出站消息送达数与事件循环最大延迟
+
+用法:
+    python benchmarks/bench_ingress.py --rates 20,50,100 --duration 10
+    python benchmarks/bench_ingress.py --rates 200 --mix notification=1,windows=1 --arrivals poisson
+"""
+
+import sys 
+import json 
+import time 
+import uuid 
+import random 
+import socket 
+import asyncio 
+import argparse 
+import threading 
+from collections import Counter ,deque 
+from pathlib import Path 
+from typing import Callable ,Dict ,List ,Tuple 
+
+sys .path .insert (0 ,str (Path (__file__ ).parent ))
+
+import httpx 
+import uvicorn 
+import yaml 
+
+from harness import PROJECT_ROOT ,FakeEnvironment ,FakeClaudeOptions ,LatencyStats ,print_table 
+from fakes .mock_feishu import create_mock_feishu_app ,MockFeishuOptions 
+
+sys .path .insert (0 ,str (PROJECT_ROOT /'services'))
+
+from feishu_bot .config import Config 
+from feishu_bot .config .config import (
+FeishuConfig ,
+SessionConf ,
+LoggingConfig ,
+SecurityConfig ,
+ExecutionConfig ,
+OutboxConfig ,
+EventsConfig 
+)
+
+
+SCENARIOS =('notification','windows','verification','help','command','redelivery')
+
+DEFAULT_MIX ='notification=4,windows=2,verification=1,help=2,command=2,redelivery=1'
+
+CORPUS_FILE =Path (__file__ ).parent /'corpus'/'hook_payloads.jsonl'
+
+REQUIRED_FIELDS =('type','user_id','open_id','tmux_session')
+
+
+def free_port ()->int :
+
+    with socket .socket ()as sock :
+        sock .bind (('127.0.0.1',0 ))
+        return sock .getsockname ()[1 ]
+
+
+class ServerThread :
+
+
+    def __init__ (self ,app ,name :str ):
+        self .name =name 
+        self .port =free_port ()
+        self .url =f"http://127.0.0.1:{self .port }"
+        self .server =uvicorn .Server (uvicorn .Config (
+        app ,
+        host ='127.0.0.1',
+        port =self .port ,
+        log_config =None ,
+        log_level ='warning',
+        access_log =False ,
+        lifespan ='on'
+        ))
+        self .thread =threading .Thread (target =self .server .run ,name =f"bench-{name }",daemon =True )
+
+    def start (self ,timeout :float =30 )->None :
+
+        self .thread .start ()
+        deadline =time .monotonic ()+timeout 
+        while not self .server .started :
+            if not self .thread .is_alive ()or time .monotonic ()>deadline :
+                raise RuntimeError (f"{self .name } failed to start")
+            time .sleep (0.05 )
+
+    def stop (self ,timeout :float =60 )->None :
+
+        self .server .should_exit =True 
+        self .thread .join (timeout )
+
+
+def parse_mix (text :str )->Dict [str ,float ]:
+
+    mix ={}
+    for item in text .split (','):
+        name ,_ ,weight =item .partition ('=')
+        name =name .strip ()
+        if name not in SCENARIOS :
+            raise ValueError (f"unknown scenario: {name } (choose from {', '.join (SCENARIOS )})")
+        mix [name ]=float (weight or 1 )
+    return {name :weight for name ,weight in mix .items ()if weight >0 }
+
+
+def load_windows_payloads ()->List [str ]:
+
+    payloads =[]
+    with open (CORPUS_FILE ,'r',encoding ='utf-8')as f :
+        for line in f :
+            if not line .strip ():
+                continue 
+            case =json .loads (line )
+            expected =case .get ('expected')
+            if expected and all (expected .get (key )for key in REQUIRED_FIELDS ):
+                payloads .append (case ['input'])
+    return payloads 
+
+
+def write_whitelist (env :FakeEnvironment ,users :int )->str :
+
+    allowed =[
+    {
+    'user_id':f"bench_user_{i }",
+    'open_id':f"ou_bench_{i }",
+    'permissions':['command_execute','session_manage'],
+    'max_sessions':5 
+    }
+    for i in range (users )
+    ]
+    allowed .append ({
+    'user_id':'78495dd8',
+    'open_id':'ou_94f57fde84ec51561745ae6bc13ec6f8',
+    'permissions':['command_execute','session_manage']
+    })
+    path =env .storage_path ('whitelist.yaml')
+    Path (path ).write_text (yaml .safe_dump ({
+    'allowed_users':allowed ,
+    'admin_users':[user ['open_id']for user in allowed ]
+    }),encoding ='utf-8')
+    return path 
+
+
+def build_config (env :FakeEnvironment ,service :str ,feishu_url :str ,whitelist :str ,args )->Config :
+
+    config =Config ()
+    config .feishu =FeishuConfig (app_id ='bench_app',app_secret ='bench_secret',base_url =feishu_url ,http2 =False )
+    config .session =SessionConf (storage_file =env .storage_path (f"sessions-{service }.json"),cleanup_interval_minutes =0 )
+    config .logging =LoggingConfig (level =args .log_level ,file =env .storage_path ('logs/bench.log'),console =args .verbose )
+    config .security =SecurityConfig (whitelist_file =whitelist )
+    config .execution =ExecutionConfig (
+    usage_storage_file =env .storage_path (f"usage-{service }.json"),
+    cli_probe_cache_file =env .storage_path ('claude_cli.json')
+    )
+    config .outbox =OutboxConfig (storage_file =env .storage_path ('outbox.jsonl'))
+    config .events =EventsConfig (drain_timeout_seconds =args .drain_seconds )
+    return config 
+
+
+class Workload :
+
+
+    def __init__ (self ,users :int ,tokens :List [str ],windows_payloads :List [str ],seed :int ):
+        self .users =users 
+        self .tokens =tokens 
+        self .windows_payloads =windows_payloads 
+        self .random =random .Random (seed )
+        self .delivered_events :deque =deque (maxlen =200 )
+
+    def pick (self ,mix :Dict [str ,float ])->str :
+
+        return self .random .choices (list (mix ),weights =list (mix .values ()))[0 ]
+
+    def build (self ,scenario :str ,i :int )->Tuple [str ,str ,str ,bytes ,Callable ]:
+
+        if scenario =='redelivery'and not self .delivered_events :
+            scenario ='help'
+
+        if scenario =='notification':
+            user =i %self .users 
+            body =json .dumps ({
+            'type':self .random .choice (('completed','waiting','error')),
+            'user_id':f"bench_user_{user }",
+            'open_id':f"ou_bench_{user }",
+            'project_name':'bench',
+            'description':f"bench task {i }",
+            'working_dir':'/tmp/bench',
+            'tmux_session':f"bench-{user }",
+            'task_output':f"done {i }"
+            },ensure_ascii =False ).encode ('utf-8')
+            return scenario ,'webhook','/webhook/notification',body ,_notification_ok 
+
+        if scenario =='windows':
+            body =self .random .choice (self .windows_payloads ).encode ('utf-8')
+            return scenario ,'webhook','/webhook/notification',body ,_notification_ok 
+
+        if scenario =='verification':
+            challenge =uuid .uuid4 ().hex 
+            body =json .dumps ({'type':'url_verification','challenge':challenge ,'token':'bench'}).encode ('utf-8')
+            return scenario ,'bot','/webhook/event',body ,lambda r :r .status_code ==200 and r .json ().get ('challenge')==challenge 
+
+        if scenario =='redelivery':
+            body =self .random .choice (self .delivered_events )
+            return scenario ,'bot','/webhook/event',body ,lambda r :r .status_code ==200 and r .json ().get ('msg')=='duplicate'
+
+        user =i %self .users 
+        if scenario =='command':
+            text =f"{self .tokens [user %len (self .tokens )]}: echo bench {i }"
+        else :
+            text ='/help'
+        body =json .dumps ({
+        'schema':'2.0',
+        'header':{
+        'event_id':uuid .uuid4 ().hex ,
+        'event_type':'im.message.receive_v1',
+        'create_time':str (int (time .time ()*1000 )),
+        'token':'bench',
+        'app_id':'bench_app',
+        'tenant_key':'bench'
+        },
+        'event':{
+        'sender':{'sender_id':{'open_id':f"ou_bench_{user }",'user_id':f"bench_user_{user }"},'sender_type':'user'},
+        'message':{
+        'message_id':f"om_{uuid .uuid4 ().hex }",
+        'chat_type':'p2p',
+        'message_type':'text',
+        'content':json .dumps ({'text':text },ensure_ascii =False )
+        }
+        }
+        },ensure_ascii =False ).encode ('utf-8')
+        return scenario ,'bot','/webhook/event',body ,_event_ok 
+
+
+def _notification_ok (response :httpx .Response )->bool :
+
+    return response .status_code ==200 and response .json ().get ('success')is True 
+
+
+def _event_ok (response :httpx .Response )->bool :
+
+    return response .status_code ==200 and response .json ().get ('msg')=='success'
+
+
+async def run_stage (rate :float ,args ,mix :Dict [str ,float ],workload :Workload ,urls :Dict [str ,str ])->dict :
+
+    total =max (1 ,int (rate *args .duration ))
+    stats :Dict [str ,LatencyStats ]={}
+    statuses :Counter =Counter ()
+    semaphore =asyncio .Semaphore (args .concurrency )
+    limits =httpx .Limits (max_connections =args .concurrency ,max_keepalive_connections =args .concurrency )
+
+    async with httpx .AsyncClient (limits =limits ,timeout =args .timeout )as client :
+
+        async def send (i :int ,due :float )->None :
+
+            scenario ,service ,path ,body ,check =workload .build (workload .pick (mix ),i )
+            stage =stats .setdefault (scenario ,LatencyStats ())
+            ok =False 
+            async with semaphore :
+                try :
+                    response =await client .post (urls [service ]+path ,content =body ,headers ={'Content-Type':'application/json'})
+                    statuses [response .status_code ]+=1 
+                    ok =check (response )
+                except (httpx .HTTPError ,ValueError )as e :
+                    statuses [type (e ).__name__ ]+=1 
+            stage .latencies_ms .append ((time .perf_counter ()-due )*1000 )
+            if not ok :
+                stage .errors +=1 
+            elif service =='bot'and scenario in ('help','command'):
+                workload .delivered_events .append (body )
+
+        started =time .perf_counter ()
+        offset =0.0 
+        tasks =[]
+        for i in range (total ):
+            due =started +offset 
+            delay =due -time .perf_counter ()
+            if delay >0 :
+                await asyncio .sleep (delay )
+            tasks .append (asyncio .ensure_future (send (i ,due )))
+            offset +=workload .random .expovariate (rate )if args .arrivals =='poisson'else 1 /rate 
+        await asyncio .gather (*tasks )
+        duration =time .perf_counter ()-started 
+
+    total_stats =LatencyStats (duration_s =duration )
+    rows =[]
+    for scenario in SCENARIOS :
+        if scenario not in stats :
+            continue 
+        stats [scenario ].duration_s =duration 
+        total_stats .latencies_ms .extend (stats [scenario ].latencies_ms )
+        total_stats .errors +=stats [scenario ].errors 
+        rows .append (dict ({'rate':rate ,'scenario':scenario },**stats [scenario ].summary ()))
+    rows .append (dict ({'rate':rate ,'scenario':'total'},**total_stats .summary ()))
+    return {'rate':rate ,'rows':rows ,'statuses':{str (k ):v for k ,v in statuses .items ()}}
+
+
+async def collect_service_stats (urls :Dict [str ,str ])->dict :
+
+    async with httpx .AsyncClient (timeout =10 )as client :
+        webhook =(await client .get (urls ['webhook']+'/webhook/stats')).json ()
+        bot =(await client .get (urls ['bot']+'/stats')).json ()
+    return {
+    'webhook_outbound_sent':webhook ['outbound']['sent'],
+    'webhook_outbound_queued':webhook ['outbound']['queued'],
+    'webhook_loop_max_lag_ms':(webhook ['watchdog']or {}).get ('max_lag_ms'),
+    'bot_outbound_sent':bot ['outbound']['sent'],
+    'bot_outbound_queued':bot ['outbound']['queued'],
+    'bot_events':bot ['events'],
+    'bot_loop_max_lag_ms':(bot ['watchdog']or {}).get ('max_lag_ms')
+    }
+
+
+def parse_args (argv :List [str ]):
+
+    parser =argparse .ArgumentParser (description ="HTTP ingress load test for the webhook and bot services")
+    parser .add_argument ('--rates',default ='20,50,100',help ="comma separated request rates (req/s), one stage each")
+    parser .add_argument ('--duration',type =float ,default =10 ,help ="seconds per stage")
+    parser .add_argument ('--mix',default =DEFAULT_MIX ,help =f"scenario weights, scenarios: {', '.join (SCENARIOS )}")
+    parser .add_argument ('--arrivals',choices =('uniform','poisson'),default ='uniform')
+    parser .add_argument ('--concurrency',type =int ,default =256 ,help ="max requests in flight")
+    parser .add_argument ('--timeout',type =float ,default =30 )
+    parser .add_argument ('--users',type =int ,default =20 )
+    parser .add_argument ('--settle',type =float ,default =2 ,help ="seconds to wait after each stage before reading service stats")
+    parser .add_argument ('--claude-latency-ms',type =float ,default =200 )
+    parser .add_argument ('--feishu-latency-ms',type =float ,default =20 )
+    parser .add_argument ('--drain-seconds',type =float ,default =5 )
+    parser .add_argument ('--seed',type =int ,default =0 )
+    parser .add_argument ('--log-level',default ='ERROR')
+    parser .add_argument ('--verbose',action ='store_true',help ="print service logs to the console")
+    parser .add_argument ('--json',dest ='json_path',default ="",help ="write results to this file")
+    return parser .parse_args (argv )
+
+
+def main (argv :List [str ])->int :
+
+    args =parse_args (argv )
+    mix =parse_mix (args .mix )
+    rates =[float (rate )for rate in args .rates .split (',')if rate .strip ()]
+
+    import webhook_service 
+    import bot_service 
+
+    results =[]
+    with FakeEnvironment (FakeClaudeOptions (latency_ms =args .claude_latency_ms ),real_tmux =False )as env :
+        mock_app =create_mock_feishu_app (MockFeishuOptions (latency_ms =args .feishu_latency_ms ))
+        mock =ServerThread (mock_app ,'mock-feishu')
+        mock .start ()
+
+        whitelist =write_whitelist (env ,args .users )
+        feishu_url =mock .url 
+        webhook =ServerThread (webhook_service .create_app (build_config (env ,'webhook',feishu_url ,whitelist ,args )),'webhook')
+        bot_app =bot_service .create_app (build_config (env ,'bot',feishu_url ,whitelist ,args ))
+        bot =ServerThread (bot_app ,'bot')
+        servers =[webhook ,bot ]
+
+        try :
+            for server in servers :
+                server .start ()
+
+            tokens =[
+            bot_app .state .session_manager .create_session (
+            user_id =f"bench_user_{i }",
+            open_id =f"ou_bench_{i }",
+            tmux_session =f"bench-{i }",
+            working_dir =str (env .root )
+            ).token 
+            for i in range (args .users )
+            ]
+            workload =Workload (args .users ,tokens ,load_windows_payloads (),args .seed )
+            urls ={'webhook':webhook .url ,'bot':bot .url }
+
+            for rate in rates :
+                delivered_before =len (mock_app .state .mock .messages )
+                stage =asyncio .run (run_stage (rate ,args ,mix ,workload ,urls ))
+                time .sleep (args .settle )
+                stage ['delivered']=len (mock_app .state .mock .messages )-delivered_before 
+                stage ['services']=asyncio .run (collect_service_stats (urls ))
+                results .append (stage )
+        finally :
+            for server in reversed (servers ):
+                server .stop ()
+            mock .stop ()
+
+    columns =['rate','scenario','count','errors','error_rate','throughput_per_s','p50_ms','p95_ms','p99_ms','max_ms']
+    print_table ([row for stage in results for row in stage ['rows']],columns )
+    print ()
+    for stage in results :
+        services =stage ['services']
+        events =services ['bot_events']
+        print (
+        f"rate {stage ['rate']:g}/s: statuses {stage ['statuses']}, delivered to Feishu {stage ['delivered']}, "
+        f"outbound queued webhook={services ['webhook_outbound_queued']} bot={services ['bot_outbound_queued']}, "
+        f"bot tasks completed={events ['completed']} rejected={events ['rejected']} queued={events ['queued']}, "
+        f"loop max lag webhook={services ['webhook_loop_max_lag_ms']}ms bot={services ['bot_loop_max_lag_ms']}ms"
+        )
+
+    if args .json_path :
+        Path (args .json_path ).write_text (json .dumps (results ,indent =2 ),encoding ='utf-8')
+    return 0 
+
+
+if __name__ =="__main__":
+    sys .exit (main (sys .argv [1 :]))
@@ -0,0 +1,171 @@
+"""
+JSON 编解码微基准
+
+对比改造前的写法 (标准库 json, 先 decode 再解析, 会话文件 indent=2) 与
+feishu_bot.utils.jsoncodec 在真实形状负载上的耗时:
+- im.message.receive_v1 事件入站 (外层 + message.content 二次解析)
+- Claude Code webhook 通知入站
+- 会话文件保存 / 加载
+- 飞书发送消息请求体编码
+
+用法:
+    python benchmarks/bench_json.py --iterations 20000 --sessions 200
+"""
+
+import sys 
+import json 
+import time 
+import argparse 
+from pathlib import Path 
+from typing import Callable ,List 
+
+sys .path .insert (0 ,str (Path (__file__ ).parent ))
+
+from harness import print_table 
+
+from feishu_bot .utils import jsoncodec 
+
+
+def make_event (i :int )->bytes :
+
+    return json .dumps ({
+    "schema":"2.0",
+    "header":{
+    "event_id":f"5e3702a84e847582be8db7fb73283c{i :02d}",
+    "event_type":"im.message.receive_v1",
+    "create_time":"1608725989000",
+    "token":"rvaYgkR4z1sdRJXUk3NhldM3S7DRwQvS",
+    "app_id":"cli_a1b2c3d4e5f6",
+    "tenant_key":"2ca1d211f64f6438"
+    },
+    "event":{
+    "sender":{
+    "sender_id":{
+    "union_id":"on_8ed6aa67826108097d9ee143816345",
+    "user_id":"e33ggbyz",
+    "open_id":"ou_84aad35d084aa403a838cf73ee18467"
+    },
+    "sender_type":"user",
+    "tenant_key":"736588c9260f175e"
+    },
+    "message":{
+    "message_id":f"om_5ce6d572455d361153b7cb51da133{i :03d}",
+    "create_time":"1609073151345",
+    "chat_id":"oc_5ce6d572455d361153b7xx51da133945",
+    "chat_type":"p2p",
+    "message_type":"text",
+    "content":json .dumps ({"text":"AB12CD34: 帮我检查一下 src/feishu_bot 下的测试覆盖率, 并修复失败的用例"}),
+    "mentions":[]
+    }
+    }
+    },ensure_ascii =False ).encode ('utf-8')
+
+
+def make_notification ()->bytes :
+
+    return json .dumps ({
+    "event":"task_completed",
+    "user_id":"e33ggbyz",
+    "open_id":"ou_84aad35d084aa403a838cf73ee18467",
+    "tmux_session":"claude-feishu-2",
+    "working_dir":"D:\\work\\projects\\py-feishu2cc",
+    "description":"重构出站消息调度并补充基准测试",
+    "project_name":"py-feishu2cc",
+    "task_output":"已完成以下修改:\n"+"- 更新模块与配置\n"*40 
+    },ensure_ascii =False ).encode ('utf-8')
+
+
+def make_sessions (count :int )->dict :
+
+    return {
+    'sessions':{
+    f"TK{i :06d}":{
+    'token':f"TK{i :06d}",
+    'user_id':f"user_{i %20 }",
+    'open_id':f"ou_{i :032d}",
+    'tmux_session':f"claude-{i }",
+    'working_dir':f"/home/dev/projects/repo-{i %7 }",
+    'description':"修复通知发送失败后没有重试的问题",
+    'status':'active',
+    'created_at':'2025-01-01T12:00:00.123456',
+    'expires_at':'2025-01-02T12:00:00.123456',
+    'last_active_at':'2025-01-01T13:30:00.654321'
+    }
+    for i in range (count )
+    },
+    'updated_at':'2025-01-01T13:30:00.654321'
+    }
+
+
+def measure (fn :Callable [[],object ],iterations :int )->float :
+
+    fn ()
+    started =time .perf_counter ()
+    for _ in range (iterations ):
+        fn ()
+    return (time .perf_counter ()-started )/iterations *1e6 
+
+
+def parse_args (argv :List [str ]):
+
+    parser =argparse .ArgumentParser (description ="JSON codec micro-benchmark")
+    parser .add_argument ('--iterations',type =int ,default =20000 )
+    parser .add_argument ('--sessions',type =int ,default =200 ,help ="sessions in the storage file payload")
+    parser .add_argument ('--json',dest ='json_path',default ="",help ="write results to this file")
+    return parser .parse_args (argv )
+
+
+def main (argv :List [str ])->int :
+
+    args =parse_args (argv )
+
+    event =make_event (1 )
+    notification =make_notification ()
+    sessions =make_sessions (args .sessions )
+    sessions_file =json .dumps (sessions ,indent =2 ,ensure_ascii =False ).encode ('utf-8')
+    send_body ={'receive_id':'ou_84aad35d084aa403a838cf73ee18467','msg_type':'text',
+    'content':json .dumps ({"text":make_notification ().decode ('utf-8')},ensure_ascii =False )}
+
+    def stdlib_event ():
+        body =json .loads (event .decode ('utf-8'))
+        return json .loads (body ['event']['message']['content'])
+
+    def codec_event ():
+        body =jsoncodec .loads (event )
+        return jsoncodec .loads (body ['event']['message']['content'])
+
+    storage_iterations =max (1 ,args .iterations //max (1 ,args .sessions //10 ))
+    cases =[
+    ('event ingress',len (event ),args .iterations ,stdlib_event ,codec_event ),
+    ('notification ingress',len (notification ),args .iterations ,
+    lambda :json .loads (notification .decode ('utf-8')),lambda :jsoncodec .loads (notification )),
+    ('session save',len (sessions_file ),storage_iterations ,
+    lambda :json .dumps (sessions ,indent =2 ,ensure_ascii =False ).encode ('utf-8'),lambda :jsoncodec .dumpb (sessions )),
+    ('session load',len (sessions_file ),storage_iterations ,
+    lambda :json .loads (sessions_file .decode ('utf-8')),lambda :jsoncodec .loads (sessions_file )),
+    ('send body',len (json .dumps (send_body )),args .iterations ,
+    lambda :json .dumps (send_body ).encode ('utf-8'),lambda :jsoncodec .dumpb (send_body )),
+    ]
+
+    results =[]
+    for name ,size ,iterations ,baseline ,candidate in cases :
+        baseline_us =measure (baseline ,iterations )
+        codec_us =measure (candidate ,iterations )
+        results .append ({
+        'payload':name ,
+        'bytes':size ,
+        'stdlib_us':round (baseline_us ,2 ),
+        'codec_us':round (codec_us ,2 ),
+        'speedup':f"{round (baseline_us /codec_us ,2 )}x"if codec_us else '-'
+        })
+
+    print (f"codec backend: {jsoncodec .BACKEND }")
+    print_table (results ,['payload','bytes','stdlib_us','codec_us','speedup'])
+
+    if args .json_path :
+        Path (args .json_path ).write_text (json .dumps (results ,indent =2 ),encoding ='utf-8')
+    return 0 
+
+
+if __name__ =="__main__":
+    sys .exit (main (sys .argv [1 :]))
@@ -0,0 +1,195 @@
+"""
+出站消息调度基准测试
+
+在进程内启动飞书开放平台替身 (按文档频控限制拒绝超限请求), 向若干用户突发发送消息,
+对比直接调用客户端与经过 OutboundScheduler 调度时的成功率、吞吐和排队延迟
+--flood 额外向单个用户持续灌入命令结果消息, 测量此时其他用户与该用户 waiting 通知的延迟
+
+用法:
+    python benchmarks/bench_outbound.py --messages 300 --users 20 --app-qps 50 --user-qps 5
+    python benchmarks/bench_outbound.py --flood 200 --users 20
+"""
+
+import sys 
+import json 
+import time 
+import asyncio 
+import argparse 
+from pathlib import Path 
+from typing import List 
+
+sys .path .insert (0 ,str (Path (__file__ ).parent ))
+
+import httpx 
+
+from harness import LatencyStats ,print_table 
+from fakes .mock_feishu import create_mock_feishu_app ,MockFeishuOptions 
+
+from feishu_bot .bot import AsyncFeishuClient ,OutboundScheduler 
+from feishu_bot .bot .outbound import PRIORITY_RESULT ,PRIORITY_WAITING 
+
+
+async def run_mode (mode :str ,args )->dict :
+
+    app =create_mock_feishu_app (MockFeishuOptions (
+    latency_ms =args .latency_ms ,
+    app_qps =args .app_qps ,
+    user_qps =args .user_qps 
+    ))
+    client =AsyncFeishuClient (
+    'bench_app',
+    'bench_secret',
+    base_url ='http://mock-feishu',
+    http2 =False ,
+    transport =httpx .ASGITransport (app =app )
+    )
+    await client .start ()
+
+    sender =client 
+    scheduler =None 
+    if mode =='scheduler':
+        scheduler =OutboundScheduler (
+        client ,
+        app_rate =args .app_qps *args .headroom ,
+        app_burst =max (1.0 ,args .app_qps *(1 -args .headroom )),
+        user_rate =args .user_qps *args .headroom ,
+        user_burst =max (1.0 ,args .user_qps *(1 -args .headroom )),
+        workers =args .workers 
+        )
+        sender =scheduler 
+
+    stats =LatencyStats ()
+
+    async def _send (i :int ):
+
+        t =time .perf_counter ()
+        ok =await sender .send_text_message (f"ou_bench_{i %args .users }",f"bench message {i }")
+        stats .latencies_ms .append ((time .perf_counter ()-t )*1000 )
+        if not ok :
+            stats .errors +=1 
+
+    started =time .perf_counter ()
+    await asyncio .gather (*[_send (i )for i in range (args .messages )])
+    stats .duration_s =time .perf_counter ()-started 
+
+    row ={'mode':mode }
+    row .update (stats .summary ())
+    row ['delivered']=len (app .state .mock .messages )
+    row ['rate_limited']=app .state .mock .rate_limited 
+
+    if scheduler is not None :
+        queue =scheduler .stats ()['queue_latency_ms']
+        row ['queue_p95_ms']=queue ['p95']
+        row ['retried']=scheduler .retried 
+        await scheduler .stop ()
+
+    await client .aclose ()
+    return row 
+
+
+async def run_flood (args )->List [dict ]:
+
+    app =create_mock_feishu_app (MockFeishuOptions (
+    latency_ms =args .latency_ms ,
+    app_qps =args .app_qps ,
+    user_qps =args .user_qps 
+    ))
+    client =AsyncFeishuClient (
+    'bench_app',
+    'bench_secret',
+    base_url ='http://mock-feishu',
+    http2 =False ,
+    transport =httpx .ASGITransport (app =app )
+    )
+    await client .start ()
+    scheduler =OutboundScheduler (
+    client ,
+    app_rate =args .app_qps *args .headroom ,
+    app_burst =max (1.0 ,args .app_qps *(1 -args .headroom )),
+    user_rate =args .user_qps *args .headroom ,
+    user_burst =max (1.0 ,args .user_qps *(1 -args .headroom )),
+    workers =args .workers 
+    )
+
+    groups ={}
+
+    async def _send (group :str ,open_id :str ,priority :str ,i :int ):
+
+        stats =groups .setdefault (group ,LatencyStats ())
+        t =time .perf_counter ()
+        ok =await scheduler .send_text_message (open_id ,f"{group } {i }",priority =priority )
+        stats .latencies_ms .append ((time .perf_counter ()-t )*1000 )
+        if not ok :
+            stats .errors +=1 
+
+    async def _waiting ():
+
+        await asyncio .sleep (args .flood_delay )
+        await asyncio .gather (
+        _send ('waiting, flooded user','ou_flood',PRIORITY_WAITING ,0 ),
+        *[_send ('waiting, other users',f"ou_bench_{i }",PRIORITY_WAITING ,i )for i in range (args .users )]
+        )
+
+    started =time .perf_counter ()
+    await asyncio .gather (
+    _waiting (),
+    *[_send ('result, flooded user','ou_flood',PRIORITY_RESULT ,i )for i in range (args .flood )]
+    )
+    elapsed =time .perf_counter ()-started 
+    await scheduler .stop ()
+    await client .aclose ()
+
+    rows =[]
+    for group ,stats in groups .items ():
+        stats .duration_s =elapsed 
+        row ={'group':group }
+        row .update (stats .summary ())
+        rows .append (row )
+    rows .append ({'group':'rate limited by mock','count':app .state .mock .rate_limited })
+    return rows 
+
+
+def parse_args (argv :List [str ]):
+
+    parser =argparse .ArgumentParser (description ="Outbound scheduler benchmark")
+    parser .add_argument ('--messages',type =int ,default =300 )
+    parser .add_argument ('--users',type =int ,default =20 )
+    parser .add_argument ('--app-qps',type =float ,default =50 )
+    parser .add_argument ('--user-qps',type =float ,default =5 )
+    parser .add_argument ('--latency-ms',type =float ,default =20 )
+    parser .add_argument ('--workers',type =int ,default =8 )
+    parser .add_argument ('--headroom',type =float ,default =0.9 ,help ="scheduler rate as a fraction of the limit, the rest is burst")
+    parser .add_argument ('--flood',type =int ,default =0 ,help ="also flood one user with this many result messages and measure waiting-lane latency")
+    parser .add_argument ('--flood-delay',type =float ,default =1.0 ,help ="seconds into the flood before the waiting messages are sent")
+    parser .add_argument ('--json',dest ='json_path',default ="",help ="write results to this file")
+    return parser .parse_args (argv )
+
+
+def main (argv :List [str ])->int :
+
+    args =parse_args (argv )
+
+    results =[asyncio .run (run_mode (mode ,args ))for mode in ('direct','scheduler')]
+
+    columns =[
+    'mode','count','errors','delivered','rate_limited','retried',
+    'throughput_per_s','p50_ms','p95_ms','p99_ms','queue_p95_ms'
+    ]
+    print_table (results ,columns )
+    print ()
+    print (f"allowed rate: {min (args .app_qps ,args .users *args .user_qps )} msg/s")
+
+    if args .flood :
+        flood =asyncio .run (run_flood (args ))
+        print ()
+        print (f"single-user flood: {args .flood } result messages to one user, waiting messages sent after {args .flood_delay }s")
+        print_table (flood ,['group','count','errors','p50_ms','p95_ms','max_ms'])
+        results .append ({'mode':'flood','groups':flood })
+
+    if args .json_path :
+        Path (args .json_path ).write_text (json .dumps (results ,indent =2 ),encoding ='utf-8')
+    return 0 
+
+
+if __name__ =="__main__":
+    sys .exit (main (sys .argv [1 :]))
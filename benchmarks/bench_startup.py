@@ -0,0 +1,181 @@
+"""
+启动耗时基准 - 基于 python -X importtime 统计各子包的冷启动导入开销
+
+每个目标在全新的解释器进程中导入 (可选禁用字节码缓存), 解析 importtime 输出:
+- 导入耗时: 扣除空解释器自带模块后, 顶层导入项的累计耗时之和
+- 重量级依赖: lark-oapi / APScheduler / pydantic 等是否被连带加载
+超出预算或加载了不应加载的依赖时以非零状态退出, 可直接用于 CI
+
+用法:
+    python benchmarks/bench_startup.py --repeat 5
+    python benchmarks/bench_startup.py --budget feishu_bot.bot=150
+    python benchmarks/bench_startup.py --no-bytecode-cache --budget-scale 6
+"""
+
+import os 
+import sys 
+import json 
+import tempfile 
+import argparse 
+import statistics 
+import subprocess 
+from pathlib import Path 
+from typing import Dict ,List ,Set ,Tuple 
+
+sys .path .insert (0 ,str (Path (__file__ ).parent ))
+
+from harness import PROJECT_ROOT ,print_table 
+
+SRC_DIR =PROJECT_ROOT /'src'
+
+TARGETS ={
+'feishu_bot':'import feishu_bot',
+'feishu_bot.config':'from feishu_bot.config import get_config',
+'feishu_bot.utils':'from feishu_bot.utils import jsoncodec, parse_relaxed, setup_logging',
+'feishu_bot.session':'from feishu_bot.session import SessionManager',
+'feishu_bot.security':'from feishu_bot.security import UserMappingService',
+'feishu_bot.command':'from feishu_bot.command import ClaudeCliExecutor, UsageLedger',
+'feishu_bot.notification':'from feishu_bot.notification import NotificationSender, CardRenderer',
+'feishu_bot.bot':'from feishu_bot.bot import AsyncFeishuClient, OutboundScheduler, LongConnectionClient',
+}
+
+DEFAULT_BUDGETS_MS ={
+'feishu_bot':15 ,
+'feishu_bot.config':100 ,
+'feishu_bot.utils':40 ,
+'feishu_bot.session':60 ,
+'feishu_bot.security':100 ,
+'feishu_bot.command':60 ,
+'feishu_bot.notification':400 ,
+'feishu_bot.bot':400 ,
+}
+
+HEAVY_MODULES =['lark_oapi','apscheduler','pydantic','httpx','websockets','yaml']
+
+FORBIDDEN_MODULES ={'lark_oapi','apscheduler','pydantic'}
+
+
+def parse_importtime (stderr :str )->List [Tuple [str ,int ,int ]]:
+
+
+    entries =[]
+    for line in stderr .splitlines ():
+        if not line .startswith ('import time:')or 'cumulative'in line :
+            continue 
+        _ ,cumulative_us ,name =line [len ('import time:'):].split ('|',2 )
+        depth =(len (name )-len (name .lstrip (' '))-1 )//2 
+        entries .append ((name .strip (),int (cumulative_us ),depth ))
+    return entries 
+
+
+def run_import (statement :str ,env :Dict [str ,str ])->List [Tuple [str ,int ,int ]]:
+
+    code =f"import sys; sys.path.insert(0, {repr (str (SRC_DIR ))}); {statement }"
+    result =subprocess .run (
+    [sys .executable ,'-X','importtime','-c',code ],
+    capture_output =True ,
+    text =True ,
+    env =env ,
+    cwd =str (PROJECT_ROOT )
+    )
+    if result .returncode !=0 :
+        raise RuntimeError (f"{statement } failed:\n{result .stderr [-2000 :]}")
+    return parse_importtime (result .stderr )
+
+
+def import_cost (entries :List [Tuple [str ,int ,int ]],baseline :Set [str ])->Tuple [float ,Set [str ]]:
+
+
+    total_us =0 
+    loaded =set ()
+    for name ,cumulative_us ,depth in entries :
+        if name in baseline :
+            continue 
+        loaded .add (name )
+        if depth ==0 :
+            total_us +=cumulative_us 
+    return total_us /1000 ,loaded 
+
+
+def make_env (no_bytecode_cache :bool )->Dict [str ,str ]:
+
+    env =dict (os .environ )
+    env .pop ('PYTHONPROFILEIMPORTTIME',None )
+    if no_bytecode_cache :
+        env ['PYTHONDONTWRITEBYTECODE']='1'
+        env ['PYTHONPYCACHEPREFIX']=tempfile .mkdtemp (prefix ='bench-startup-')
+    return env 
+
+
+def parse_budgets (values :List [str ])->Dict [str ,float ]:
+
+    budgets =dict (DEFAULT_BUDGETS_MS )
+    for value in values :
+        name ,_ ,ms =value .partition ('=')
+        if name not in TARGETS or not ms :
+            raise SystemExit (f"invalid budget {repr (value )}, expected one of {', '.join (TARGETS )} as name=ms")
+        budgets [name ]=float (ms )
+    return budgets 
+
+
+def parse_args (argv :List [str ]):
+
+    parser =argparse .ArgumentParser (description ="Cold import time per feishu_bot subpackage")
+    parser .add_argument ('--repeat',type =int ,default =5 ,help ="fresh interpreter runs per target, the median is reported")
+    parser .add_argument ('--budget',action ='append',default =[],help ="override a budget, e.g. feishu_bot.bot=150 (ms)")
+    parser .add_argument ('--no-bytecode-cache',action ='store_true',help ="compile from source on every run")
+    parser .add_argument ('--budget-scale',type =float ,default =1.0 ,help ="multiply every budget, e.g. 6 together with --no-bytecode-cache")
+    parser .add_argument ('--json',dest ='json_path',default ="",help ="write results to this file")
+    return parser .parse_args (argv )
+
+
+def main (argv :List [str ])->int :
+
+    args =parse_args (argv )
+    budgets =parse_budgets (args .budget )
+
+    baseline ={name for name ,_ ,_ in run_import ('pass',make_env (False ))}
+
+    rows =[]
+    failures =0 
+    for target ,statement in TARGETS .items ():
+        samples =[]
+        loaded :Set [str ]=set ()
+        for _ in range (max (1 ,args .repeat )):
+            cost_ms ,loaded =import_cost (run_import (statement ,make_env (args .no_bytecode_cache )),baseline )
+            samples .append (cost_ms )
+
+        median_ms =statistics .median (samples )
+        heavy =[name for name in HEAVY_MODULES if name in loaded ]
+        forbidden =sorted (FORBIDDEN_MODULES &set (heavy ))
+        budget_ms =budgets [target ]*args .budget_scale 
+        over_budget =median_ms >budget_ms 
+        status ='ok'
+        if over_budget or forbidden :
+            failures +=1 
+            status ='OVER BUDGET'if over_budget else 'HEAVY DEPENDENCY'
+
+        rows .append ({
+        'target':target ,
+        'median_ms':round (median_ms ,1 ),
+        'max_ms':round (max (samples ),1 ),
+        'budget_ms':round (budget_ms ,1 ),
+        'modules':len (loaded ),
+        'heavy':','.join (heavy )or '-',
+        'status':status 
+        })
+
+    print (f"python {sys .version .split ()[0 ]}, {args .repeat } runs per target"
+    f"{', no bytecode cache'if args .no_bytecode_cache else ''}")
+    print_table (rows ,['target','median_ms','max_ms','budget_ms','modules','heavy','status'])
+
+    if args .json_path :
+        Path (args .json_path ).write_text (json .dumps (rows ,indent =2 ),encoding ='utf-8')
+
+    print ()
+    print ("OK"if not failures else f"{failures } targets over budget")
+    return 1 if failures else 0 
+
+
+if __name__ =="__main__":
+    sys .exit (main (sys .argv [1 :]))
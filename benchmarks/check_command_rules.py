@@ -0,0 +1,41 @@
+"""
+命令规则回归 - 逐条回放 benchmarks/corpus/command_rules.jsonl, 比对 CommandValidator 的放行 / 拦截结果
+
+每条用例可带 dangerous (追加危险规则) 与 allowed (放行规则), 与 configs/config.yaml 中
+security.dangerous_commands / security.allowed_commands 的写法一致
+
+用法:
+    python benchmarks/check_command_rules.py
+"""
+
+import sys 
+import json 
+from pathlib import Path 
+
+from feishu_bot .command import CommandValidator 
+
+CORPUS_FILE =Path (__file__ ).parent /'corpus'/'command_rules.jsonl'
+
+
+def main ()->int :
+
+    with open (CORPUS_FILE ,'r',encoding ='utf-8')as f :
+        cases =[json .loads (line )for line in f if line .strip ()]
+
+    failures =0 
+    for case in cases :
+        validator =CommandValidator (
+        dangerous_commands =case .get ('dangerous'),
+        allowed_commands =case .get ('allowed')
+        )
+        reason =validator .check_command (case ['command'])
+        if (reason is not None )!=case ['blocked']:
+            failures +=1 
+            print (f"  FAIL {case ['name']}: {repr (case ['command'])} -> {reason or 'allowed'}")
+
+    print (f"command rules: {len (cases )-failures }/{len (cases )} cases passed")
+    return 1 if failures else 0 
+
+
+if __name__ =='__main__':
+    sys .exit (main ())
@@ -0,0 +1,69 @@
+"""
+可编程的 Claude CLI 替身 - 用于基准测试
+
+通过环境变量控制行为:
+- FAKE_CLAUDE_LATENCY_MS: 每次调用的基础延迟
+- FAKE_CLAUDE_JITTER_MS: 延迟的随机抖动范围
+- FAKE_CLAUDE_OUTPUT_BYTES: 输出字节数
+- FAKE_CLAUDE_STREAM_CHUNKS: 输出分块数 (>1 时在延迟期间分块流式输出)
+- FAKE_CLAUDE_FAIL_RATE: 失败概率 (0~1), 失败时退出码为 1
+"""
+
+import os 
+import sys 
+import time 
+import random 
+
+
+def _env_float (name :str ,default :float =0.0 )->float :
+
+    try :
+        return float (os .environ .get (name ,default ))
+    except ValueError :
+        return default 
+
+
+def main (argv :list )->int :
+
+    if '--version'in argv :
+        print ("1.0.0 (Fake Claude Code)")
+        return 0 
+
+    prompt =""
+    if '-p'in argv :
+        index =argv .index ('-p')
+        if index +1 <len (argv ):
+            prompt =argv [index +1 ]
+
+    latency_ms =_env_float ('FAKE_CLAUDE_LATENCY_MS')
+    jitter_ms =_env_float ('FAKE_CLAUDE_JITTER_MS')
+    output_bytes =int (_env_float ('FAKE_CLAUDE_OUTPUT_BYTES',64 ))
+    chunks =max (1 ,int (_env_float ('FAKE_CLAUDE_STREAM_CHUNKS',1 )))
+    fail_rate =_env_float ('FAKE_CLAUDE_FAIL_RATE')
+
+    delay =max (0.0 ,latency_ms +random .uniform (-jitter_ms ,jitter_ms ))/1000 
+
+    if fail_rate >0 and random .random ()<fail_rate :
+        time .sleep (delay )
+        sys .stderr .write (f"fake claude: simulated failure for prompt {repr (prompt [:40 ])}\n")
+        return 1 
+
+    header =f"fake reply to: {prompt [:80 ]}\n"
+    body_size =max (0 ,output_bytes -len (header .encode ('utf-8')))
+    body =('x'*79 +'\n')*(body_size //80 )+'x'*(body_size %80 )
+    payload =header +body 
+
+    chunk_size =max (1 ,len (payload )//chunks )
+    pieces =[payload [i :i +chunk_size ]for i in range (0 ,len (payload ),chunk_size )]or ['']
+
+    out =sys .stdout 
+    for piece in pieces :
+        time .sleep (delay /len (pieces ))
+        out .write (piece )
+        out .flush ()
+
+    return 0 
+
+
+if __name__ =="__main__":
+    sys .exit (main (sys .argv [1 :]))
@@ -0,0 +1,70 @@
+"""
+tmux 替身 - 在没有安装 tmux 的机器上运行执行器基准测试
+
+只实现执行器用到的子命令: has-session / send-keys / send / capture-pane / new-session / kill-server
+会话状态保存在 FAKE_TMUX_STATE_DIR 目录中, 每个会话一个文件
+"""
+
+import os 
+import sys 
+from pathlib import Path 
+
+
+def _session_file (name :str )->Path :
+
+    state_dir =Path (os .environ .get ('FAKE_TMUX_STATE_DIR','.fake_tmux'))
+    state_dir .mkdir (parents =True ,exist_ok =True )
+    return state_dir /f"{name }.log"
+
+
+def _target (argv :list )->str :
+
+    for flag in ('-t','-s'):
+        if flag in argv :
+            index =argv .index (flag )
+            if index +1 <len (argv ):
+                return argv [index +1 ]
+    return ""
+
+
+def main (argv :list )->int :
+
+    if not argv :
+        return 1 
+
+    command =argv [0 ]
+    target =_target (argv )
+
+    if command =='new-session':
+        _session_file (target ).touch ()
+        return 0 
+
+    if command =='kill-server':
+        return 0 
+
+    session_file =_session_file (target )
+
+    if command =='has-session':
+        return 0 if session_file .exists ()else 1 
+
+    if command in ('send-keys','send'):
+        if not session_file .exists ():
+            sys .stderr .write (f"can't find session: {target }\n")
+            return 1 
+        keys =[arg for arg in argv [3 :]if arg not in ('Enter','C-m')]
+        with open (session_file ,'a',encoding ='utf-8')as f :
+            f .write (f"$ {' '.join (keys )}\n")
+        return 0 
+
+    if command =='capture-pane':
+        if not session_file .exists ():
+            return 1 
+        lines =session_file .read_text (encoding ='utf-8').splitlines ()
+        sys .stdout .write ('\n'.join (lines [-10 :])+'\n')
+        return 0 
+
+    return 0 
+
+
+if __name__ =="__main__":
+    sys .exit (main (sys .argv [1 :]))
@@ -0,0 +1,163 @@
+"""
+本地 OTLP 收集器替身 - 接收 tracing 导出的 span 并按链路汇总耗时
+
+- POST /v1/traces: 接收 OTLP/HTTP JSON (与 tracing.exporter=otlp 对接)
+- GET /mock/traces: 按链路汇总的 span 树, 可按 token / event_id 过滤
+- 也可以直接读取 tracing.exporter=file 生成的文件, 在终端打印各链路的耗时分解
+
+用法:
+    python benchmarks/fakes/mock_collector.py --port 4318
+    python benchmarks/fakes/mock_collector.py --file data/logs/traces-bot.jsonl --token ABCD1234
+"""
+
+import sys 
+import json 
+import argparse 
+from collections import defaultdict 
+from typing import Any ,Dict ,List 
+
+from fastapi import FastAPI ,Request 
+
+
+def _value (value :Dict [str ,Any ])->Any :
+
+    for key in ('stringValue','boolValue','doubleValue'):
+        if key in value :
+            return value [key ]
+    if 'intValue'in value :
+        return int (value ['intValue'])
+    return None 
+
+
+def flatten (payload :Dict [str ,Any ])->List [Dict [str ,Any ]]:
+
+
+    spans =[]
+    for resource_spans in payload .get ('resourceSpans',[]):
+        service =""
+        for attribute in resource_spans .get ('resource',{}).get ('attributes',[]):
+            if attribute ['key']=='service.name':
+                service =_value (attribute ['value'])
+        for scope_spans in resource_spans .get ('scopeSpans',[]):
+            for span in scope_spans .get ('spans',[]):
+                attributes ={item ['key']:_value (item ['value'])for item in span .get ('attributes',[])}
+                spans .append ({
+                'trace_id':span ['traceId'],
+                'span_id':span ['spanId'],
+                'parent_id':span .get ('parentSpanId',''),
+                'name':span ['name'],
+                'service':service ,
+                'start_ns':int (span ['startTimeUnixNano']),
+                'duration_ms':round ((int (span ['endTimeUnixNano'])-int (span ['startTimeUnixNano']))/1e6 ,3 ),
+                'error':span .get ('status',{}).get ('code')==2 ,
+                'attributes':attributes 
+                })
+    return spans 
+
+
+def build_traces (spans :List [Dict [str ,Any ]],token :str ="",event_id :str ="")->List [Dict [str ,Any ]]:
+
+
+    by_trace =defaultdict (list )
+    for span in spans :
+        by_trace [span ['trace_id']].append (span )
+
+    traces =[]
+    for trace_id ,members in by_trace .items ():
+        if token and not any (span ['attributes'].get ('token')==token for span in members ):
+            continue 
+        if event_id and not any (span ['attributes'].get ('event_id')==event_id for span in members ):
+            continue 
+
+        ids ={span ['span_id']for span in members }
+        children =defaultdict (list )
+        roots =[]
+        for span in sorted (members ,key =lambda item :item ['start_ns']):
+            if span ['parent_id']in ids :
+                children [span ['parent_id']].append (span )
+            else :
+                roots .append (span )
+
+        def tree (span ):
+            return dict (span ,children =[tree (child )for child in children [span ['span_id']]])
+
+        traces .append ({
+        'trace_id':trace_id ,
+        'spans':len (members ),
+        'start_ns':min (span ['start_ns']for span in members ),
+        'roots':[tree (root )for root in roots ]
+        })
+    traces .sort (key =lambda trace :trace ['start_ns'])
+    return traces 
+
+
+def format_trace (trace :Dict [str ,Any ])->List [str ]:
+
+    lines =[f"trace {trace ['trace_id']} ({trace ['spans']} spans)"]
+
+    def walk (span ,depth ):
+        labels =[f"{key }={span ['attributes'][key ]}"for key in ('token','event_id')if key in span ['attributes']]
+        marker =" ERROR"if span ['error']else ""
+        lines .append (f"{'  '*(depth +1 )}{span ['name']:<{40 -2 *depth }} {span ['duration_ms']:>10.3f} ms{marker }  {' '.join (labels )}")
+        for child in span ['children']:
+            walk (child ,depth +1 )
+
+    for root in trace ['roots']:
+        walk (root ,0 )
+    return lines 
+
+
+def create_mock_collector_app ()->FastAPI :
+
+    app =FastAPI (title ="Mock OTLP Collector")
+    app .state .spans =[]
+
+    @app .post ("/v1/traces")
+    async def receive_traces (request :Request ):
+
+        app .state .spans .extend (flatten (json .loads (await request .body ())))
+        return {}
+
+    @app .get ("/mock/traces")
+    async def list_traces (token :str ="",event_id :str =""):
+
+        return build_traces (app .state .spans ,token ,event_id )
+
+    @app .delete ("/mock/traces")
+    async def clear_traces ():
+
+        app .state .spans =[]
+        return {"cleared":True }
+
+    return app 
+
+
+def main (argv :list )->int :
+
+    parser =argparse .ArgumentParser (description ="本地 OTLP 收集器替身")
+    parser .add_argument ('--host',default ='127.0.0.1')
+    parser .add_argument ('--port',type =int ,default =4318 )
+    parser .add_argument ('--file',default ="",help ="读取 tracing.exporter=file 生成的文件并打印耗时分解")
+    parser .add_argument ('--token',default ="")
+    parser .add_argument ('--event-id',default ="")
+    args =parser .parse_args (argv )
+
+    if args .file :
+        spans =[]
+        with open (args .file ,'r',encoding ='utf-8')as f :
+            for line in f :
+                if line .strip ():
+                    spans .extend (flatten (json .loads (line )))
+        for trace in build_traces (spans ,args .token ,args .event_id ):
+            print ('\n'.join (format_trace (trace )))
+            print ()
+        return 0 
+
+    import uvicorn 
+
+    uvicorn .run (create_mock_collector_app (),host =args .host ,port =args .port ,log_level ="warning")
+    return 0 
+
+
+if __name__ =="__main__":
+    sys .exit (main (sys .argv [1 :]))
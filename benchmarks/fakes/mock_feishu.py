@@ -0,0 +1,307 @@
+"""
+本地飞书开放平台替身 - 用于客户端测试和基准测试
+
+实现 tenant_access_token 获取和 im/v1/messages 发送接口, 支持:
+- 可配置的响应延迟
+- 按概率注入限流错误 (HTTP 429 + 飞书限流错误码)
+- 按概率注入普通错误
+- 按飞书文档的频控规则 (应用级 / 单用户 QPS) 拒绝超限请求
+- 记录收到的所有消息, 便于断言
+- 长连接事件网关 (/callback/ws/endpoint + WebSocket), 通过 /mock/events 推送事件
+
+既可以通过 uvicorn 单独启动, 也可以配合 httpx.ASGITransport 在进程内使用
+"""
+
+import sys 
+import json 
+import time 
+import uuid 
+import random 
+import asyncio 
+import argparse 
+from dataclasses import dataclass ,field 
+from collections import deque 
+from pathlib import Path 
+from typing import Dict ,List 
+
+from fastapi import FastAPI ,Request ,WebSocket ,WebSocketDisconnect 
+from fastapi .responses import JSONResponse 
+
+sys .path .insert (0 ,str (Path (__file__ ).resolve ().parents [2 ]/'src'))
+
+from feishu_bot .bot .long_connection import Frame ,FRAME_CONTROL ,FRAME_DATA 
+
+
+RATE_LIMIT_CODE =99991400 
+USER_RATE_LIMIT_CODE =230020 
+TOKEN_INVALID_CODE =99991663 
+
+
+@dataclass 
+class MockFeishuOptions :
+
+    latency_ms :float =0 
+    jitter_ms :float =0 
+    rate_limit_rate :float =0 
+    error_rate :float =0 
+    token_expire :int =7200 
+    app_qps :float =0 
+    user_qps :float =0 
+    ws_ping_interval :int =120 
+
+
+@dataclass 
+class MockFeishuState :
+
+    messages :List [dict ]=field (default_factory =list )
+    token_requests :int =0 
+    rate_limited :int =0 
+    errors :int =0 
+    tokens :set =field (default_factory =set )
+    app_window :deque =field (default_factory =deque )
+    user_windows :Dict [str ,deque ]=field (default_factory =dict )
+    ws_connections :List [WebSocket ]=field (default_factory =list )
+    ws_connects :int =0 
+    ws_pings :int =0 
+    ws_acks :Dict [str ,asyncio .Future ]=field (default_factory =dict )
+
+
+def _over_limit (window :deque ,qps :float ,now :float )->bool :
+
+
+    while window and now -window [0 ]>=1.0 :
+        window .popleft ()
+    if len (window )>=qps :
+        return True 
+    window .append (now )
+    return False 
+
+
+def create_mock_feishu_app (options :MockFeishuOptions =None )->FastAPI :
+
+    options =options or MockFeishuOptions ()
+    state =MockFeishuState ()
+
+    app =FastAPI (title ="Mock Feishu Open Platform")
+    app .state .mock =state 
+    app .state .options =options 
+
+    async def _delay ():
+
+        delay =max (0.0 ,options .latency_ms +random .uniform (-options .jitter_ms ,options .jitter_ms ))
+        if delay >0 :
+            await asyncio .sleep (delay /1000 )
+
+    @app .post ("/open-apis/auth/v3/tenant_access_token/internal")
+    async def tenant_access_token (request :Request ):
+
+        await _delay ()
+        body =await request .json ()
+        state .token_requests +=1 
+
+        if not body .get ('app_id')or not body .get ('app_secret'):
+            return JSONResponse ({"code":10003 ,"msg":"invalid param"})
+
+        token =f"t-mock-{uuid .uuid4 ().hex }"
+        state .tokens .add (token )
+        return JSONResponse ({
+        "code":0 ,
+        "msg":"ok",
+        "tenant_access_token":token ,
+        "expire":options .token_expire 
+        })
+
+    @app .post ("/open-apis/im/v1/messages")
+    async def send_message (request :Request ):
+
+        await _delay ()
+
+        token =request .headers .get ('authorization','').replace ('Bearer ','',1 )
+        if token not in state .tokens :
+            return JSONResponse ({"code":TOKEN_INVALID_CODE ,"msg":"Invalid access token for authorization"})
+
+        body =await request .json ()
+        receive_id =body .get ('receive_id','')
+        now =time .monotonic ()
+
+        code =0 
+        if options .rate_limit_rate >0 and random .random ()<options .rate_limit_rate :
+            code =RATE_LIMIT_CODE 
+        elif options .app_qps >0 and _over_limit (state .app_window ,options .app_qps ,now ):
+            code =RATE_LIMIT_CODE 
+        elif options .user_qps >0 and _over_limit (state .user_windows .setdefault (receive_id ,deque ()),options .user_qps ,now ):
+            code =USER_RATE_LIMIT_CODE 
+
+        if code :
+            state .rate_limited +=1 
+            return JSONResponse (
+            {"code":code ,"msg":"request trigger frequency limit"},
+            status_code =429 ,
+            headers ={"x-ogw-ratelimit-reset":"1"}
+            )
+
+        if options .error_rate >0 and random .random ()<options .error_rate :
+            state .errors +=1 
+            return JSONResponse ({"code":230001 ,"msg":"mock internal error"},status_code =400 )
+
+        message_id =f"om_{uuid .uuid4 ().hex }"
+        state .messages .append ({
+        'message_id':message_id ,
+        'receive_id':receive_id ,
+        'receive_id_type':request .query_params .get ('receive_id_type'),
+        'msg_type':body .get ('msg_type'),
+        'content':body .get ('content'),
+        'received_at':time .time ()
+        })
+
+        return JSONResponse ({
+        "code":0 ,
+        "msg":"success",
+        "data":{"message_id":message_id }
+        })
+
+    @app .post ("/callback/ws/endpoint")
+    async def ws_endpoint (request :Request ):
+
+        body =await request .json ()
+        if not body .get ('AppID')or not body .get ('AppSecret'):
+            return JSONResponse ({"code":1000040344 ,"msg":"app_id or app_secret is null"})
+
+        base =str (request .base_url ).rstrip ('/').replace ('http','ws',1 )
+        return JSONResponse ({
+        "code":0 ,
+        "msg":"ok",
+        "data":{
+        "URL":f"{base }/callback/ws?device_id={uuid .uuid4 ().hex [:12 ]}&service_id=1",
+        "ClientConfig":{
+        "ReconnectCount":-1 ,
+        "ReconnectInterval":1 ,
+        "ReconnectNonce":0 ,
+        "PingInterval":options .ws_ping_interval 
+        }
+        }
+        })
+
+    @app .websocket ("/callback/ws")
+    async def ws_gateway (websocket :WebSocket ):
+
+        await websocket .accept ()
+        state .ws_connections .append (websocket )
+        state .ws_connects +=1 
+        try :
+            while True :
+                frame =Frame .decode (await websocket .receive_bytes ())
+                if frame .method ==FRAME_CONTROL and frame .headers .get ('type')=='ping':
+                    state .ws_pings +=1 
+                    pong =Frame (
+                    service =frame .service ,
+                    method =FRAME_CONTROL ,
+                    headers ={'type':'pong'},
+                    payload =json .dumps ({"PingInterval":options .ws_ping_interval }).encode ('utf-8')
+                    )
+                    await websocket .send_bytes (pong .encode ())
+                elif frame .method ==FRAME_DATA :
+                    future =state .ws_acks .pop (frame .headers .get ('message_id',''),None )
+                    if future is not None and not future .done ():
+                        future .set_result (frame )
+        except WebSocketDisconnect :
+            pass 
+        finally :
+            if websocket in state .ws_connections :
+                state .ws_connections .remove (websocket )
+
+    @app .post ("/mock/events")
+    async def push_event (request :Request ,fragments :int =1 ,timeout :float =10 ):
+
+        if not state .ws_connections :
+            return JSONResponse ({"code":-1 ,"msg":"no long connection"},status_code =409 )
+
+        payload =await request .body ()
+        message_type ='card'if b'card.action.trigger'in payload else 'event'
+        message_id =uuid .uuid4 ().hex 
+        future =asyncio .get_running_loop ().create_future ()
+        state .ws_acks [message_id ]=future 
+
+        fragments =max (1 ,min (fragments ,len (payload )))
+        size =-(-len (payload )//fragments )
+        websocket =state .ws_connections [0 ]
+        for seq in range (fragments ):
+            frame =Frame (
+            service =1 ,
+            method =FRAME_DATA ,
+            headers ={
+            'type':message_type ,
+            'message_id':message_id ,
+            'sum':str (fragments ),
+            'seq':str (seq ),
+            'trace_id':uuid .uuid4 ().hex 
+            },
+            payload =payload [seq *size :(seq +1 )*size ]
+            )
+            await websocket .send_bytes (frame .encode ())
+
+        try :
+            ack =await asyncio .wait_for (future ,timeout )
+        except asyncio .TimeoutError :
+            state .ws_acks .pop (message_id ,None )
+            return JSONResponse ({"code":-1 ,"msg":"ack timeout"},status_code =504 )
+
+        return {
+        "message_id":message_id ,
+        "biz_rt":ack .headers .get ('biz_rt'),
+        "response":json .loads (ack .payload or b'{}')
+        }
+
+    @app .post ("/mock/ws/disconnect")
+    async def disconnect_all ():
+
+        closed =len (state .ws_connections )
+        for websocket in list (state .ws_connections ):
+            await websocket .close ()
+        return {"closed":closed }
+
+    @app .get ("/mock/messages")
+    async def list_messages ():
+
+        return {
+        "messages":state .messages ,
+        "token_requests":state .token_requests ,
+        "rate_limited":state .rate_limited ,
+        "errors":state .errors ,
+        "ws_connections":len (state .ws_connections ),
+        "ws_connects":state .ws_connects ,
+        "ws_pings":state .ws_pings 
+        }
+
+    return app 
+
+
+def main (argv :list )->int :
+
+    parser =argparse .ArgumentParser (description ="本地飞书开放平台替身")
+    parser .add_argument ('--host',default ='127.0.0.1')
+    parser .add_argument ('--port',type =int ,default =9100 )
+    parser .add_argument ('--latency-ms',type =float ,default =0 )
+    parser .add_argument ('--jitter-ms',type =float ,default =0 )
+    parser .add_argument ('--rate-limit-rate',type =float ,default =0 )
+    parser .add_argument ('--error-rate',type =float ,default =0 )
+    parser .add_argument ('--app-qps',type =float ,default =0 ,help ="应用级 QPS 上限, 0 表示不限")
+    parser .add_argument ('--user-qps',type =float ,default =0 ,help ="单用户 QPS 上限, 0 表示不限")
+    args =parser .parse_args (argv )
+
+    import uvicorn 
+
+    app =create_mock_feishu_app (MockFeishuOptions (
+    latency_ms =args .latency_ms ,
+    jitter_ms =args .jitter_ms ,
+    rate_limit_rate =args .rate_limit_rate ,
+    error_rate =args .error_rate ,
+    app_qps =args .app_qps ,
+    user_qps =args .user_qps 
+    ))
+    uvicorn .run (app ,host =args .host ,port =args .port ,log_level ="warning")
+    return 0 
+
+
+if __name__ =="__main__":
+    sys .exit (main (sys .argv [1 :]))
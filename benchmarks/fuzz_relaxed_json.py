@@ -0,0 +1,256 @@
+"""
+宽松 JSON 解析器的语料回归、模糊测试与最坏输入规模测试
+
+1. 语料: benchmarks/corpus/hook_payloads.jsonl 中收集的真实不规范 hook 请求体, 逐条比对期望结果,
+   同时统计旧的正则修复链能正确解析多少条
+2. 往返: 随机生成对象, 以标准 JSON 和宽松写法 (裸键 / 单引号) 序列化后必须解析回原对象
+3. 变异: 对语料随机增删改字符, 解析器只能返回结果或抛出 RelaxedJSONError
+4. 规模: 构造对正则回溯不友好的输入, 逐级放大, 检查耗时随输入线性增长
+
+用法:
+    python benchmarks/fuzz_relaxed_json.py --iterations 2000 --max-size 1000000
+"""
+
+import re 
+import sys 
+import json 
+import time 
+import random 
+import argparse 
+from pathlib import Path 
+from typing import Any ,Callable ,List 
+
+sys .path .insert (0 ,str (Path (__file__ ).parent ))
+
+from harness import print_table 
+
+from feishu_bot .utils import parse_relaxed ,RelaxedJSONError 
+
+CORPUS_FILE =Path (__file__ ).parent /'corpus'/'hook_payloads.jsonl'
+
+ALPHABET ="abcXYZ09 _-.:,{}[]'\"\\/\n\t中文✅"
+
+
+def legacy_fix (body_str :str )->Any :
+
+
+    try :
+        return json .loads (body_str )
+    except json .JSONDecodeError :
+        pass 
+
+    if body_str .startswith ("'")and body_str .endswith ("';"):
+        body_str =body_str [1 :-2 ]
+    elif body_str .startswith ("'")and body_str .endswith ("'"):
+        body_str =body_str [1 :-1 ]
+
+    body_str =re .sub (r'(\{|,)\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*:',r'\1"\2":',body_str )
+    body_str =re .sub (r':(\{\{[^}]+\}\})',r':"\1"',body_str )
+    body_str =re .sub (r':\s*([^,{}"}\[\]"\s][^,{}"}]*?)(?=[,}])',
+    lambda m :f': "{m .group (1 ).strip ()}"'if not m .group (1 ).strip ().replace ('.','').replace ('-','').isdigit ()
+    and m .group (1 ).strip ()not in ['true','false','null']else f': {m .group (1 ).strip ()}',
+    body_str )
+    return json .loads (body_str )
+
+
+def load_corpus ()->List [dict ]:
+
+    with open (CORPUS_FILE ,'r',encoding ='utf-8')as f :
+        return [json .loads (line )for line in f if line .strip ()]
+
+
+def check_corpus (corpus :List [dict ])->int :
+
+    failures =0 
+    legacy_ok =0 
+    for entry in corpus :
+        try :
+            result =parse_relaxed (entry ['input'])
+        except RelaxedJSONError as e :
+            result =e 
+        if result !=entry ['expected']:
+            failures +=1 
+            print (f"  FAIL {entry ['name']}: {repr (result )}")
+
+        try :
+            legacy_ok +=legacy_fix (entry ['input'])==entry ['expected']
+        except Exception :
+            pass 
+
+    print (f"corpus: {len (corpus )-failures }/{len (corpus )} parsed correctly "
+    f"(legacy regex chain: {legacy_ok }/{len (corpus )})")
+    return failures 
+
+
+def random_string (rng :random .Random )->str :
+
+    return ''.join (rng .choice (ALPHABET )for _ in range (rng .randint (0 ,24 )))
+
+
+def random_value (rng :random .Random ,depth :int =0 )->Any :
+
+    kind =rng .randint (0 ,7 if depth <3 else 5 )
+    if kind ==0 :
+        return rng .randint (-10 **6 ,10 **6 )
+    if kind ==1 :
+        return rng .choice ([True ,False ,None ])
+    if kind ==2 :
+        return round (rng .uniform (-1000 ,1000 ),3 )
+    if kind <=5 :
+        return random_string (rng )
+    if kind ==6 :
+        return [random_value (rng ,depth +1 )for _ in range (rng .randint (0 ,4 ))]
+    return {f"k{i }_{rng .randint (0 ,99 )}":random_value (rng ,depth +1 )for i in range (rng .randint (0 ,4 ))}
+
+
+def render_relaxed (value :Any ,rng :random .Random )->str :
+
+
+    if isinstance (value ,dict ):
+        items =[]
+        for key ,item in value .items ():
+            key_text =key if rng .random ()<0.7 else f"'{key }'"
+            items .append (f"{key_text }{' '*rng .randint (0 ,2 )}:{' '*rng .randint (0 ,2 )}{render_relaxed (item ,rng )}")
+        return '{'+','.join (items )+(','if items and rng .random ()<0.2 else '')+'}'
+    if isinstance (value ,list ):
+        return '['+', '.join (render_relaxed (item ,rng )for item in value )+']'
+    if isinstance (value ,str )and "'"not in value and '\\'not in value and rng .random ()<0.5 :
+        return f"'{value }'"
+    return json .dumps (value ,ensure_ascii =rng .random ()<0.5 )
+
+
+def fuzz_round_trip (rng :random .Random ,iterations :int )->int :
+
+    failures =0 
+    for _ in range (iterations ):
+        value ={f"field{i }":random_value (rng )for i in range (rng .randint (1 ,6 ))}
+        for text in (json .dumps (value ),render_relaxed (value ,rng )):
+            try :
+                result =parse_relaxed (text )
+            except RelaxedJSONError as e :
+                result =e 
+            if result !=value :
+                failures +=1 
+                if failures <=5 :
+                    print (f"  FAIL round trip: {text [:200 ]} -> {repr (result )[:200 ]}")
+    print (f"round trip: {iterations *2 -failures }/{iterations *2 } ok")
+    return failures 
+
+
+def fuzz_mutations (rng :random .Random ,corpus :List [dict ],iterations :int )->int :
+
+    failures =0 
+    for _ in range (iterations ):
+        text =list (rng .choice (corpus )['input'])
+        for _ in range (rng .randint (1 ,8 )):
+            op =rng .randint (0 ,2 )
+            index =rng .randint (0 ,max (0 ,len (text )-1 ))
+            if op ==0 and text :
+                del text [index ]
+            elif op ==1 :
+                text .insert (index ,rng .choice (ALPHABET ))
+            elif text :
+                text [index ]=rng .choice (ALPHABET )
+        text =''.join (text )
+        try :
+            parse_relaxed (text )
+        except RelaxedJSONError :
+            pass 
+        except Exception as e :
+            failures +=1 
+            if failures <=5 :
+                print (f"  FAIL mutation raised {type (e ).__name__ }: {text [:200 ]}")
+    print (f"mutations: {iterations -failures }/{iterations } handled")
+    return failures 
+
+
+WORST_CASES ={
+'long bare output':lambda n :'{type:completed,task_output:'+'a'*n +'}',
+'unterminated bare':lambda n :'{type:completed,task_output:'+'a'*n ,
+'colons in unterminated bare':lambda n :'{type:completed,task_output:'+'at 12:30:45 '*(n //12 ),
+'commas in bare':lambda n :'{task_output:'+'x, '*(n //3 )+'}',
+'closing braces in bare':lambda n :'{task_output:'+'x} '*(n //3 )+'}',
+'open braces in bare':lambda n :'{task_output:'+'{x '*(n //3 )+'}',
+'placeholder starts':lambda n :'{a:'+'{{'*(n //2 )+'}',
+'long quoted string':lambda n :"'{\"task_output\":\""+'a\\\\'*(n //3 )+"\"}'",
+'deep nesting':lambda n :'['*n ,
+}
+
+
+def timed (fn :Callable [[str ],Any ],text :str )->float :
+
+    started =time .perf_counter ()
+    try :
+        fn (text )
+    except (ValueError ,RecursionError ):
+        pass 
+    return time .perf_counter ()-started 
+
+
+def worst_case (max_size :int ,legacy_budget_s :float )->int :
+
+    sizes =[]
+    size =1000 
+    while size <=max_size :
+        sizes .append (size )
+        size *=10 
+
+    rows =[]
+    failures =0 
+    for name ,build in WORST_CASES .items ():
+        legacy_over_budget =False 
+        per_char =[]
+        for size in sizes :
+            text =build (size )
+            parser_s =timed (parse_relaxed ,text )
+            per_char .append (parser_s /len (text ))
+
+            legacy_s =None 
+            if not legacy_over_budget :
+                legacy_s =timed (legacy_fix ,text )
+                legacy_over_budget =legacy_s >legacy_budget_s 
+
+            rows .append ({
+            'case':name ,
+            'chars':len (text ),
+            'parser_ms':round (parser_s *1000 ,2 ),
+            'legacy_ms':round (legacy_s *1000 ,2 )if legacy_s is not None else 'skipped'
+            })
+
+        if len (per_char )>1 and per_char [-1 ]>max (per_char [0 ],1e-7 )*20 :
+            failures +=1 
+            print (f"  FAIL {name }: time per char grew from {per_char [0 ]*1e9 :.0f}ns to {per_char [-1 ]*1e9 :.0f}ns")
+
+    print_table (rows ,['case','chars','parser_ms','legacy_ms'])
+    return failures 
+
+
+def parse_args (argv :List [str ]):
+
+    parser =argparse .ArgumentParser (description ="Relaxed JSON parser corpus, fuzz and worst-case tests")
+    parser .add_argument ('--iterations',type =int ,default =2000 )
+    parser .add_argument ('--max-size',type =int ,default =1000000 ,help ="largest worst-case input in characters")
+    parser .add_argument ('--legacy-budget',type =float ,default =2.0 ,help ="stop timing the legacy regex chain after this many seconds")
+    parser .add_argument ('--seed',type =int ,default =0 )
+    return parser .parse_args (argv )
+
+
+def main (argv :List [str ])->int :
+
+    args =parse_args (argv )
+    rng =random .Random (args .seed )
+    corpus =load_corpus ()
+
+    failures =check_corpus (corpus )
+    failures +=fuzz_round_trip (rng ,args .iterations )
+    failures +=fuzz_mutations (rng ,corpus ,args .iterations )
+    print ()
+    failures +=worst_case (args .max_size ,args .legacy_budget )
+
+    print ()
+    print ("OK"if not failures else f"{failures } failures")
+    return 1 if failures else 0 
+
+
+if __name__ =="__main__":
+    sys .exit (main (sys .argv [1 :]))
@@ -0,0 +1,172 @@
+"""
+基准测试公共工具: 替身程序安装、临时 tmux 服务器、延迟统计
+"""
+
+import os 
+import sys 
+import shutil 
+import tempfile 
+import subprocess 
+from pathlib import Path 
+from dataclasses import dataclass ,field 
+from typing import Dict ,List ,Optional 
+
+BENCH_DIR =Path (__file__ ).parent 
+PROJECT_ROOT =BENCH_DIR .parent 
+FAKES_DIR =BENCH_DIR /'fakes'
+
+sys .path .insert (0 ,str (PROJECT_ROOT /'src'))
+
+
+def _write_launcher (bin_dir :Path ,name :str ,script :Path )->Path :
+
+
+    if os .name =='nt':
+        launcher =bin_dir /f"{name }.cmd"
+        launcher .write_text (f'@"{sys .executable }" "{script }" %*\r\n',encoding ='utf-8')
+    else :
+        launcher =bin_dir /name 
+        launcher .write_text (f'#!/bin/sh\nexec "{sys .executable }" "{script }" "$@"\n',encoding ='utf-8')
+        launcher .chmod (0o755 )
+    return launcher 
+
+
+@dataclass 
+class FakeClaudeOptions :
+
+    latency_ms :float =0 
+    jitter_ms :float =0 
+    output_bytes :int =64 
+    stream_chunks :int =1 
+    fail_rate :float =0 
+
+    def to_env (self )->Dict [str ,str ]:
+
+        return {
+        'FAKE_CLAUDE_LATENCY_MS':str (self .latency_ms ),
+        'FAKE_CLAUDE_JITTER_MS':str (self .jitter_ms ),
+        'FAKE_CLAUDE_OUTPUT_BYTES':str (self .output_bytes ),
+        'FAKE_CLAUDE_STREAM_CHUNKS':str (self .stream_chunks ),
+        'FAKE_CLAUDE_FAIL_RATE':str (self .fail_rate )
+        }
+
+
+class FakeEnvironment :
+
+
+    def __init__ (self ,claude :Optional [FakeClaudeOptions ]=None ,real_tmux :bool =True ):
+        self .claude =claude or FakeClaudeOptions ()
+        self .real_tmux =real_tmux and shutil .which ('tmux')is not None 
+        self .root =Path (tempfile .mkdtemp (prefix ='feishu2cc-bench-'))
+        self .bin_dir =self .root /'bin'
+        self .saved_env :Dict [str ,Optional [str ]]={}
+        self .tmux_sessions :List [str ]=[]
+
+    def __enter__ (self )->'FakeEnvironment':
+
+        self .bin_dir .mkdir (parents =True ,exist_ok =True )
+        _write_launcher (self .bin_dir ,'claude',FAKES_DIR /'fake_claude.py')
+
+        env =dict (self .claude .to_env ())
+        env ['PATH']=str (self .bin_dir )+os .pathsep +os .environ .get ('PATH','')
+
+        if self .real_tmux :
+
+            tmux_dir =self .root /'tmux'
+            tmux_dir .mkdir ()
+            env ['TMUX_TMPDIR']=str (tmux_dir )
+            env ['TMUX']=''
+        else :
+            _write_launcher (self .bin_dir ,'tmux',FAKES_DIR /'fake_tmux.py')
+            env ['FAKE_TMUX_STATE_DIR']=str (self .root /'tmux-state')
+
+        for key ,value in env .items ():
+            self .saved_env [key ]=os .environ .get (key )
+            os .environ [key ]=value 
+        return self 
+
+    def __exit__ (self ,exc_type ,exc ,tb )->None :
+
+        if self .tmux_sessions :
+            subprocess .run (['tmux','kill-server'],capture_output =True ,timeout =10 )
+
+        for key ,value in self .saved_env .items ():
+            if value is None :
+                os .environ .pop (key ,None )
+            else :
+                os .environ [key ]=value 
+
+        shutil .rmtree (self .root ,ignore_errors =True )
+
+    def set_claude (self ,options :FakeClaudeOptions )->None :
+
+        self .claude =options 
+        os .environ .update (options .to_env ())
+
+    def create_tmux_session (self ,name :str )->None :
+
+        subprocess .run (
+        ['tmux','new-session','-d','-s',name ,'-x','120','-y','40'],
+        capture_output =True ,
+        timeout =10 ,
+        check =True 
+        )
+        self .tmux_sessions .append (name )
+
+    def storage_path (self ,name :str ='sessions.json')->str :
+
+        return str (self .root /name )
+
+
+def percentile (values :List [float ],pct :float )->float :
+
+    if not values :
+        return 0.0 
+    ordered =sorted (values )
+    rank =(len (ordered )-1 )*pct /100 
+    lower =int (rank )
+    upper =min (lower +1 ,len (ordered )-1 )
+    return ordered [lower ]+(ordered [upper ]-ordered [lower ])*(rank -lower )
+
+
+@dataclass 
+class LatencyStats :
+
+    latencies_ms :List [float ]=field (default_factory =list )
+    errors :int =0 
+    duration_s :float =0.0 
+
+    @property 
+    def count (self )->int :
+        return len (self .latencies_ms )
+
+    @property 
+    def throughput (self )->float :
+        return self .count /self .duration_s if self .duration_s >0 else 0.0 
+
+    @property 
+    def error_rate (self )->float :
+        return self .errors /self .count if self .count else 0.0 
+
+    def summary (self )->dict :
+
+        return {
+        'count':self .count ,
+        'errors':self .errors ,
+        'error_rate':round (self .error_rate ,4 ),
+        'duration_s':round (self .duration_s ,3 ),
+        'throughput_per_s':round (self .throughput ,2 ),
+        'p50_ms':round (percentile (self .latencies_ms ,50 ),2 ),
+        'p95_ms':round (percentile (self .latencies_ms ,95 ),2 ),
+        'p99_ms':round (percentile (self .latencies_ms ,99 ),2 ),
+        'max_ms':round (max (self .latencies_ms ),2 )if self .latencies_ms else 0.0 
+        }
+
+
+def print_table (rows :List [dict ],columns :List [str ])->None :
+
+    widths ={c :max ([len (c )]+[len (str (r .get (c ,'')))for r in rows ])for c in columns }
+    print ('  '.join (c .ljust (widths [c ])for c in columns ))
+    print ('  '.join ('-'*widths [c ]for c in columns ))
+    for row in rows :
+        print ('  '.join (str (row .get (c ,'')).ljust (widths [c ])for c in columns ))
@@ -1,83 +1,239 @@
 """
 Bot 服务入口 - 接收飞书消息事件并处理命令
+
+create_app(config) 构建相互隔离的应用实例, 导入本模块不会读取配置或启动任何组件;
+会话加载、tenant_access_token 获取、Claude CLI 探测在 lifespan 启动阶段并行执行
 """
 
 import os 
 import sys 
+import time 
 import logging 
-import json 
 from pathlib import Path 
-from typing import Dict ,Any 
+from typing import Dict ,Any ,List ,Optional ,Tuple 
 
 sys .path .insert (0 ,str (Path (__file__ ).parent .parent /'src'))
 
-from fastapi import FastAPI ,Request ,HTTPException 
-from fastapi .responses import JSONResponse 
+from fastapi import FastAPI ,Request ,HTTPException ,Depends 
+from fastapi .responses import JSONResponse ,Response 
 import uvicorn 
 
 from feishu_bot .session import SessionManager ,SessionConfig 
-from feishu_bot .config import get_config 
-from feishu_bot .bot import FeishuClient 
-from feishu_bot .command import CommandParser ,ClaudeCliExecutor ,ClaudeCliDirectExecutor 
-from feishu_bot .notification import NotificationSender 
+from feishu_bot .config import Config ,get_config 
+from feishu_bot .utils import setup_logging ,payload_logger ,log_payload ,logging_stats ,jsoncodec ,metrics ,render_metrics ,MetricsMiddleware 
+from feishu_bot .utils import tracing ,setup_tracing ,tracing_stats ,TracingMiddleware ,create_debug_router ,create_access_check ,LoopWatchdog 
+from feishu_bot .bot import AsyncFeishuClient ,OutboundScheduler ,BackgroundTaskRunner ,EventDeduplicator ,extract_event_id ,LongConnectionClient ,MessageRouter ,ROUTE_SLASH ,ROUTE_COMMAND 
+from feishu_bot .command import CommandParser ,ClaudeCliExecutor ,ClaudeCliDirectExecutor ,ResourceLimits ,UsageLedger ,CommandValidator 
+from feishu_bot .notification import (
+NotificationSender ,
+CardRenderer ,
+parse_card_action ,
+CARD_ACTION_VIEW_MORE ,
+CARD_ACTION_COMMANDS ,
+)
+from feishu_bot .security import (
+UserMappingService ,
+PolicyEngine ,
+ACTION_COMMAND ,
+ACTION_DIRECT_MESSAGE ,
+ACTION_SESSIONS ,
+ACTION_HELP ,
+)
 import platform 
+import asyncio 
+from collections import OrderedDict 
+from contextlib import asynccontextmanager 
+from dataclasses import asdict 
 
 
-logging .basicConfig (
-level =logging .INFO ,
-format ='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-
 logger =logging .getLogger (__name__ )
 
 
-config =get_config ()
+MAX_REMEMBERED_OUTPUTS =256 
+MAX_VIEW_MORE_CHARS =30000 
 
 
-session_manager =SessionManager (
-config .session .storage_file ,
-SessionConfig (
-token_length =config .session .token_length ,
-expiration_hours =config .session .expiration_hours ,
-cleanup_interval_minutes =config .session .cleanup_interval_minutes 
+EVENTS_TOTAL =metrics .counter (
+'feishu_bot_events_total',
+"Feishu events by type and outcome (accepted, duplicate, rejected, error)",
+('type','outcome')
 )
+EVENT_SECONDS =metrics .histogram (
+'feishu_bot_event_handle_seconds',
+"Time from receiving a Feishu event to acknowledging it",
+('type',)
 )
 
-if not config .feishu :
-    logger .error ("Feishu configuration not found!")
-    sys .exit (1 )
-
-feishu_client =FeishuClient (config .feishu .app_id ,config .feishu .app_secret )
-notification_sender =NotificationSender (feishu_client )
 
+def card_toast (toast_type :str ,content :str )->Dict [str ,Any ]:
 
-logger .info ("Using Claude CLI executor for automated remote control")
-command_executor =ClaudeCliExecutor (session_manager )
-direct_message_executor =ClaudeCliDirectExecutor (session_manager )
-
-command_parser =CommandParser ()
-
-
-app =FastAPI (
-title ="Feishu Bot Service",
-description ="飞书机器人服务 - 接收消息和处理命令",
-version ="1.0.0"
-)
+    return {"toast":{"type":toast_type ,"content":content }}
 
 
 class MessageHandler :
 
 
-    def __init__ (self ):
+    def __init__ (
+    self ,
+    session_manager :SessionManager ,
+    command_executor :ClaudeCliExecutor ,
+    direct_message_executor :ClaudeCliDirectExecutor ,
+    command_parser :CommandParser ,
+    notification_sender :NotificationSender ,
+    outbound :OutboundScheduler ,
+    task_runner :BackgroundTaskRunner ,
+    user_mapping_service :Optional [UserMappingService ]=None ,
+    policy_engine :Optional [PolicyEngine ]=None ,
+    event_deduplicator :Optional [EventDeduplicator ]=None ,
+    payload_log :Optional [logging .Logger ]=None 
+    ):
         self .session_manager =session_manager 
         self .command_executor =command_executor 
         self .direct_message_executor =direct_message_executor 
         self .command_parser =command_parser 
         self .notification_sender =notification_sender 
-        self .feishu_client =feishu_client 
+        self .outbound =outbound 
+        self .user_mapping_service =user_mapping_service 
+        self .policy_engine =policy_engine or PolicyEngine .open ()
+        self .event_deduplicator =event_deduplicator 
+        self .payload_log =payload_log or payload_logger ("bot")
+
+        self .last_outputs :OrderedDict =OrderedDict ()
+        self .task_runner =task_runner 
+
+        self .router =MessageRouter (self .command_parser )
+        self .router .register ('/sessions',self .handle_sessions_command ,ACTION_SESSIONS )
+        self .router .register ('/help',self .handle_help_command ,ACTION_HELP )
+
+    @property 
+    def policy (self )->PolicyEngine :
+
+
+        if self .user_mapping_service is not None :
+            return self .user_mapping_service .policy 
+        return self .policy_engine 
+
+    async def process_event (self ,raw_body :bytes )->Tuple [int ,Dict [str ,Any ]]:
+
+
+        started =time .perf_counter ()
+        event_type ,outcome ="unknown","error"
+        with tracing .span ('bot.process_event')as span :
+            try :
+                event_type ,status_code ,content =await self ._dispatch_event (raw_body )
+                if status_code >=500 :
+                    outcome ="rejected"
+                elif content .get ("msg")=="duplicate":
+                    outcome ="duplicate"
+                else :
+                    outcome ="accepted"
+                return status_code ,content 
+            finally :
+                span .set_attributes ({'event_type':event_type ,'outcome':outcome })
+                EVENTS_TOTAL .labels (event_type ,outcome ).inc ()
+                EVENT_SECONDS .labels (event_type ).observe (time .perf_counter ()-started )
+
+    async def _dispatch_event (self ,raw_body :bytes )->Tuple [str ,int ,Dict [str ,Any ]]:
+
+
+        dedup =self .event_deduplicator 
+        event_id =extract_event_id (raw_body )if dedup is not None else None 
+        tracing .set_attribute ('event_id',event_id )
+        if event_id and dedup .seen (f"event:{event_id }"):
+            return "unknown",200 ,{"code":0 ,"msg":"duplicate"}
+
+        marked =[f"event:{event_id }"]if event_id else []
+        try :
+            event_type ,status_code ,content =await self ._route_event (raw_body ,event_id ,marked )
+        except BaseException :
+            self ._forget_events (marked )
+            raise 
+        if status_code >=500 :
+            self ._forget_events (marked )
+        return event_type ,status_code ,content 
+
+    def _forget_events (self ,keys :List [str ])->None :
+
+
+        for key in keys :
+            self .event_deduplicator .forget (key )
+
+    async def _route_event (self ,raw_body :bytes ,event_id :Optional [str ],marked :List [str ])->Tuple [str ,int ,Dict [str ,Any ]]:
+
+        dedup =self .event_deduplicator 
+        log_payload (self .payload_log ,"Raw event body",raw_body )
+        body =jsoncodec .loads (raw_body )
+
+
+        if body .get ('type')=='url_verification':
+            challenge =body .get ('challenge','')
+            logger .info (f"URL verification: {challenge }")
+            return "url_verification",200 ,{"challenge":challenge }
+
+
+        event_type =body .get ('type')or body .get ('header',{}).get ('event_type','')
+        event =body .get ('event',{})
+        if event_id is None :
+            tracing .set_attribute ('event_id',body .get ('header',{}).get ('event_id'))
+
+        logger .info (f"Received event {event_type }")
+
+
+        if event_type =='card.action.trigger':
+            return event_type ,200 ,await self .handle_card_action (event )
+
+        if event_type =='im.message.receive_v1':
+
+            message =event .get ('message',{})
+
+            message_id =message .get ('message_id')
+            tracing .set_attribute ('message_id',message_id )
+            if dedup is not None and message_id :
+                if dedup .seen (f"msg:{message_id }"):
+                    logger .info (f"Dropping redelivered message {message_id }")
+                    return event_type ,200 ,{"code":0 ,"msg":"duplicate"}
+                marked .append (f"msg:{message_id }")
+
+            msg_type =message .get ('message_type')or message .get ('msg_type','')
+
+            log_payload (self .payload_log ,f"Message {message_id } content",message .get ('content',''))
+
+
+            if msg_type =='text':
+                if not self .task_runner .submit (self .handle_message ,event ):
+                    return event_type ,503 ,{"code":-1 ,"msg":"busy"}
+            else :
+                logger .info (f"Ignored message type: {msg_type }")
+        else :
+            logger .warning (f"Unknown event type: {event_type }")
+            event_type ="other"
+
+        return event_type ,200 ,{"code":0 ,"msg":"success"}
+
+    async def handle_long_connection_event (self ,payload :bytes )->Dict [str ,Any ]:
+
+
+        status_code ,content =await self .process_event (payload )
+        if status_code >=500 :
+            raise RuntimeError (content .get ('msg','event rejected'))
+        return content 
+
+    async def authorize (self ,open_id :str ,action :str ,command :str =None ,notify :bool =True )->bool :
+
+        decision =self .policy .authorize (open_id ,action ,command )
+        if not decision .allowed :
+            logger .warning (f"Denied {action } for {open_id }: {decision .reason }")
+            if notify :
+                await self .outbound .send_text_message (open_id ,f"⛔ 没有权限执行此操作\n\n{decision .reason }")
+        return decision .allowed 
 
     async def handle_message (self ,event_data :Dict [str ,Any ])->bool :
 
+        with tracing .span ('bot.handle_message',message_id =event_data .get ('message',{}).get ('message_id')):
+            return await self ._handle_message (event_data )
+
+    async def _handle_message (self ,event_data :Dict [str ,Any ])->bool :
+
         try :
 
             message =event_data .get ('message',{})
@@ -85,7 +241,7 @@ class MessageHandler :
 
 
             try :
-                content =json .loads (content_str )
+                content =jsoncodec .loads (content_str )
                 text =content .get ('text','').strip ()
             except :
                 text =content_str .strip ()
@@ -101,23 +257,24 @@ class MessageHandler :
             open_id =sender_id .get ('open_id','')
 
 
-            if text .startswith ('/sessions'):
-                await self .handle_sessions_command (open_id )
-                return True 
-            elif text .startswith ('/help'):
-                await self .handle_help_command (open_id )
+            route =self .router .route (text )
+            tracing .set_attribute ('route',route .kind )
+
+            if route .kind ==ROUTE_SLASH :
+                if await self .authorize (open_id ,route .action ):
+                    await route .handler (open_id )
                 return True 
 
 
-            parsed =self .command_parser .parse_remote_command (text )
-            if parsed :
-                token ,command =parsed 
-                await self .handle_remote_command (token ,command ,open_id )
+            if route .kind ==ROUTE_COMMAND :
+                if await self .authorize (open_id ,ACTION_COMMAND ,route .command ):
+                    await self .handle_remote_command (route .token ,route .command ,open_id )
                 return True 
 
 
             if self .direct_message_executor :
-                await self .handle_direct_message (text ,open_id )
+                if await self .authorize (open_id ,ACTION_DIRECT_MESSAGE ,text ):
+                    await self .handle_direct_message (text ,open_id )
                 return True 
 
             return False 
@@ -130,61 +287,106 @@ class MessageHandler :
 
         logger .info (f"Executing remote command: token={token }, command={command }")
 
+        with tracing .span ('bot.remote_command',token =token ):
+            session =self .session_manager .get_session (token )
+            if not session or not self .owns_session (open_id ,session ):
+                await self .outbound .send_text_message (
+                open_id ,
+                f"❌ 令牌无效: {token }\n\n请检查令牌是否正确或是否已过期。"
+                )
+                return 
+
+
+            result =await asyncio .to_thread (self .command_executor .execute_command ,token ,command ,session .user_id )
+
+
+            self .remember_output (token ,result .output if result .success else result .error )
+            await self .notification_sender .send_command_result_notification (open_id ,asdict (result ))
+
+    def owns_session (self ,open_id :str ,session )->bool :
+
+
+        if session .open_id ==open_id :
+            return True 
+        user =self .policy .get_policy (open_id )
+        return user is not None and (user .is_admin or session .user_id ==user .user_id )
+
+    def _card_session_allowed (self ,open_id :str ,token :str )->bool :
 
         session =self .session_manager .get_session (token )
-        if not session :
-            self .feishu_client .send_text_message (
-            open_id ,
-            f"❌ 令牌无效: {token }\n\n请检查令牌是否正确或是否已过期。"
-            )
-            return 
+        if session is not None and self .owns_session (open_id ,session ):
+            return True 
+        logger .warning (f"Denied card action on session {token } for {open_id }: not the session owner")
+        return False 
 
+    def remember_output (self ,token :str ,output :str ):
 
-        result =self .command_executor .execute_command (token ,command ,session .user_id )
 
+        self .last_outputs [token ]=output or ""
+        self .last_outputs .move_to_end (token )
+        while len (self .last_outputs )>MAX_REMEMBERED_OUTPUTS :
+            self .last_outputs .popitem (last =False )
 
-        if result .success :
-            message =(
-            f"✅ 命令执行成功\n"
-            f"令牌: {token }\n"
-            f"命令: {command }\n"
-            f"方法: {result .method }\n"
-            f"输出: {result .output }\n"
-            f"耗时: {result .exec_time_ms }ms"
-            )
-        else :
-            message =(
-            f"❌ 命令执行失败\n"
-            f"令牌: {token }\n"
-            f"命令: {command }\n"
-            f"错误: {result .error }\n"
-            f"耗时: {result .exec_time_ms }ms"
+    async def handle_card_action (self ,event :Dict [str ,Any ])->Dict [str ,Any ]:
+
+        open_id ,action ,token =parse_card_action (event )
+        logger .info (f"Card action: action={action }, token={token }, user={open_id }")
+
+        if not open_id or not action or not token :
+            return card_toast ("error","无效的卡片操作")
+
+        if action ==CARD_ACTION_VIEW_MORE :
+            if not await self .authorize (open_id ,ACTION_COMMAND ,notify =False ):
+                return card_toast ("error","没有权限执行此操作")
+            if not self ._card_session_allowed (open_id ,token ):
+                return card_toast ("error","没有权限查看此会话")
+            output =self .last_outputs .get (token )
+            if output is None :
+                return card_toast ("warning","没有可查看的输出, 可能已过期")
+            self .task_runner .submit (
+            self .outbound .send_text_message ,
+            open_id ,
+            f"📄 令牌 {token } 的完整输出:\n\n{output [:MAX_VIEW_MORE_CHARS ]}"
             )
+            return card_toast ("info","完整输出已发送")
+
+        command =CARD_ACTION_COMMANDS .get (action )
+        if command is None :
+            return card_toast ("error",f"未知操作: {action }")
 
-        self .feishu_client .send_text_message (open_id ,message )
+        if not await self .authorize (open_id ,ACTION_COMMAND ,command ,notify =False ):
+            return card_toast ("error","没有权限执行此操作")
+        if not self ._card_session_allowed (open_id ,token ):
+            return card_toast ("error","没有权限操作此会话")
+
+        if not self .task_runner .submit (self .handle_remote_command ,token ,command ,open_id ):
+            return card_toast ("error","机器人繁忙, 请稍后重试")
+        return card_toast ("info",f"已发送命令: {command }")
 
     async def handle_direct_message (self ,message :str ,open_id :str ):
 
         logger .info (f"Handling direct message: {message [:50 ]}...")
 
 
-        result =self .direct_message_executor .send_message (open_id ,message )
+        with tracing .span ('bot.direct_message'):
+            result =await asyncio .to_thread (self .direct_message_executor .send_message ,open_id ,message )
+            tracing .set_attribute ('token',result .token or None )
 
 
-        if result .success :
-            self .feishu_client .send_text_message (open_id ,result .output )
-        else :
-            self .feishu_client .send_text_message (
-            open_id ,
-            f"❌ 发送失败\n\n{result .error }"
-            )
+            if result .success :
+                await self .outbound .send_text_message (open_id ,result .output )
+            else :
+                await self .outbound .send_text_message (
+                open_id ,
+                f"❌ 发送失败\n\n{result .error }"
+                )
 
     async def handle_sessions_command (self ,open_id :str ):
 
         sessions =self .session_manager .list_sessions ()
 
         if not sessions :
-            self .feishu_client .send_text_message (
+            await self .outbound .send_text_message (
             open_id ,
             "📋 当前没有活跃的会话"
             )
@@ -199,7 +401,7 @@ class MessageHandler :
             f"  创建时间: {session .created_at .strftime ('%Y-%m-%d %H:%M:%S')}\n"
             )
 
-        self .feishu_client .send_text_message (open_id ,'\n'.join (message_lines ))
+        await self .outbound .send_text_message (open_id ,'\n'.join (message_lines ))
 
     async def handle_help_command (self ,open_id :str ):
 
@@ -211,6 +413,8 @@ class MessageHandler :
         "🔹 特殊命令:\n"
         "  /sessions - 查看活跃会话\n"
         "  /help - 显示此帮助\n\n"
+        "🔹 卡片按钮:\n"
+        "  继续 / git status / 查看更多 - 无需输入令牌\n\n"
         "🔹 使用流程:\n"
         "  1. Claude Code 任务完成后会发送通知\n"
         "  2. 通知中包含8位令牌(如: ABC12345)\n"
@@ -219,96 +423,194 @@ class MessageHandler :
         "  5. 执行结果会实时反馈给你\n"
         )
 
-        self .feishu_client .send_text_message (open_id ,help_text )
+        await self .outbound .send_text_message (open_id ,help_text )
 
 
-message_handler =MessageHandler ()
+def create_app (config :Optional [Config ]=None ,probe_cli :bool =True )->FastAPI :
 
 
-@app .get ("/health")
-async def health_check ():
-
-    return {
-    "status":"healthy",
-    "service":"bot",
-    "sessions":len (session_manager .list_sessions ())
-    }
+    config =config or get_config ()
+    setup_logging (config .logging ,"bot")
+    setup_tracing (config .tracing ,"bot")
 
+    if not config .feishu :
+        raise ValueError ("Feishu configuration not found")
 
-@app .post ("/webhook/event")
-async def handle_event (request :Request ):
+    session_manager =SessionManager (
+    config .session .storage_file ,
+    SessionConfig (
+    token_length =config .session .token_length ,
+    expiration_hours =config .session .expiration_hours ,
+    cleanup_interval_minutes =config .session .cleanup_interval_minutes 
+    ),
+    autostart =False 
+    )
 
     try :
+        user_mapping_service =UserMappingService (config .security .whitelist_file )
+        policy_engine =user_mapping_service .policy 
+    except Exception as e :
+        logger .warning (f"Failed to load user mapping service: {e }")
+        user_mapping_service =None 
+        policy_engine =PolicyEngine .open ()
+
+    feishu_client =AsyncFeishuClient .from_config (config .feishu )
+    outbound_scheduler =OutboundScheduler .from_config (feishu_client ,config .outbound )
+    task_runner =BackgroundTaskRunner .from_config (config .events )
+    event_deduplicator =(
+    EventDeduplicator .from_config (config .events ,config .session .storage_file )
+    if config .events .dedup_enabled else None 
+    )
+    notification_sender =NotificationSender (outbound_scheduler ,CardRenderer .from_config (config .cards ))
+
+    logger .info ("Using Claude CLI executor for automated remote control")
+    resource_limits =ResourceLimits .from_config (config .execution )
+    usage_ledger =UsageLedger .from_config (config .execution )
+    command_validator =CommandValidator .from_config (config .security ,policy_engine ,user_mapping_service )
+    command_executor =ClaudeCliExecutor (session_manager ,resource_limits ,usage_ledger ,command_validator )
+    direct_message_executor =ClaudeCliDirectExecutor (session_manager ,resource_limits ,usage_ledger )
+
+    message_handler =MessageHandler (
+    session_manager ,
+    command_executor ,
+    direct_message_executor ,
+    CommandParser (config .session .token_length ),
+    notification_sender ,
+    outbound_scheduler ,
+    task_runner ,
+    user_mapping_service ,
+    policy_engine ,
+    event_deduplicator ,
+    payload_logger ("bot")
+    )
 
-        raw_body =await request .body ()
-        logger .info (f"=== Raw request body ===")
-        logger .info (raw_body .decode ('utf-8')[:500 ])
-
-
-        import json 
-        body =json .loads (raw_body .decode ('utf-8'))
-        logger .info (f"=== Parsed JSON ===")
-        logger .info (f"Body keys: {list (body .keys ())}")
-
-
-        if body .get ('type')=='url_verification':
-            challenge =body .get ('challenge','')
-            logger .info (f"URL verification: {challenge }")
-            return JSONResponse ({"challenge":challenge })
-
-
-        event_type =body .get ('type')or body .get ('header',{}).get ('event_type','')
-        event =body .get ('event',{})
-
-        logger .info (f"=== Event info ===")
-        logger .info (f"Event type: {event_type }")
-        logger .info (f"Event keys: {list (event .keys ())if event else 'None'}")
-
-
-        if event_type =='im.message.receive_v1':
+    long_connection =(
+    LongConnectionClient .from_config (feishu_client ,config .events ,message_handler .handle_long_connection_event )
+    if config .events .mode =='long_connection'else None 
+    )
 
-            message =event .get ('message',{})
+    watchdog =LoopWatchdog .from_config (config .watchdog )if config .watchdog .enabled else None 
+
+    @asynccontextmanager 
+    async def lifespan (app :FastAPI ):
+
+        probes =[feishu_client .start (),asyncio .to_thread (session_manager .start )]
+        if probe_cli :
+            probes .append (asyncio .to_thread (
+            command_executor .check_cli ,
+            config .execution .cli_probe_cache_file ,
+            config .execution .cli_probe_ttl_seconds 
+            ))
+        await asyncio .gather (*probes )
+
+        outbound_scheduler .start ()
+        if watchdog is not None :
+            watchdog .start ()
+        task_runner .start ()
+        if long_connection is not None :
+            long_connection .start ()
+        try :
+            yield 
+        finally :
+            if watchdog is not None :
+                await watchdog .stop ()
+            if long_connection is not None :
+                await long_connection .stop ()
+            await task_runner .stop (config .events .drain_timeout_seconds )
+            await outbound_scheduler .stop ()
+            await feishu_client .aclose ()
+            session_manager .stop ()
+
+    app =FastAPI (
+    title ="Feishu Bot Service",
+    description ="飞书机器人服务 - 接收消息和处理命令",
+    version ="1.0.0",
+    lifespan =lifespan 
+    )
+    app .state .config =config 
+    app .state .session_manager =session_manager 
+    app .state .feishu_client =feishu_client 
+    app .state .outbound =outbound_scheduler 
+    app .state .watchdog =watchdog 
+    app .state .task_runner =task_runner 
+    app .state .message_handler =message_handler 
+    app .state .command_executor =command_executor 
+    app .state .long_connection =long_connection 
+    app .add_middleware (MetricsMiddleware ,service ="bot")
+    app .add_middleware (TracingMiddleware ,service ="bot")
+    if config .debug .enabled :
+        app .include_router (create_debug_router (config .debug ,user_mapping_service ,"bot"))
+
+    @app .get ("/health")
+    async def health_check ():
+
+        cli =command_executor .cli 
+        return {
+        "status":"healthy",
+        "service":"bot",
+        "sessions":len (session_manager .list_sessions ()),
+        "claude_cli":cli .version if cli is not None and cli .available else None 
+        }
+
+    @app .post ("/webhook/event")
+    async def handle_event (request :Request ):
 
-            msg_type =message .get ('message_type')or message .get ('msg_type','')
+        try :
+            status_code ,content =await message_handler .process_event (await request .body ())
+            return JSONResponse (content ,status_code =status_code )
 
-            logger .info (f"Message type: {msg_type }")
-            logger .info (f"Message content: {message .get ('content','')}")
+        except Exception as e :
+            logger .error (f"Error handling event: {e }",exc_info =True )
+            return JSONResponse (
+            {"code":-1 ,"msg":str (e )},
+            status_code =500 
+            )
 
+    @app .get ("/stats")
+    async def get_stats ():
 
-            if msg_type =='text':
-                logger .info ("Processing text message...")
-                await message_handler .handle_message (event )
-            else :
-                logger .info (f"Ignored message type: {msg_type }")
-        else :
-            logger .warning (f"Unknown event type: {event_type }")
+        sessions =session_manager .list_sessions ()
+        return {
+        "total_sessions":len (sessions ),
+        "active_sessions":sum (1 for s in sessions if s .status =='active'),
+        "feishu_app_id":config .feishu .app_id ,
+        "outbound":outbound_scheduler .stats (),
+        "events":task_runner .stats (),
+        "dedup":event_deduplicator .stats ()if event_deduplicator is not None else None ,
+        "long_connection":long_connection .stats ()if long_connection is not None else None ,
+        "logging":logging_stats (),
+        "tracing":tracing_stats (),
+        "watchdog":watchdog .stats ()if watchdog is not None else None 
+        }
 
-        return JSONResponse ({"code":0 ,"msg":"success"})
+    @app .get ("/usage",dependencies =[Depends (create_access_check (config .debug ,user_mapping_service ))])
+    async def get_usage ():
 
-    except Exception as e :
-        logger .error (f"Error handling event: {e }",exc_info =True )
-        return JSONResponse (
-        {"code":-1 ,"msg":str (e )},
-        status_code =500 
-        )
+        return usage_ledger .snapshot ()
 
+    @app .get ("/metrics")
+    async def get_metrics ():
 
-@app .get ("/stats")
-async def get_stats ():
+        return Response (render_metrics (),headers ={"Content-Type":metrics .CONTENT_TYPE })
 
-    sessions =session_manager .list_sessions ()
-    return {
-    "total_sessions":len (sessions ),
-    "active_sessions":sum (1 for s in sessions if s .status =='active'),
-    "feishu_app_id":config .feishu .app_id 
-    }
+    return app 
 
 
 if __name__ =="__main__":
+    try :
+        app =create_app ()
+    except ValueError as e :
+        logger .error (f"{e }!")
+        sys .exit (1 )
+    config =app .state .config 
+
     port =8081 
     logger .info (f"Starting bot service on port {port }")
-    logger .info (f"Event webhook URL: http://localhost:{port }/webhook/event")
-    logger .info ("Please configure this URL in Feishu Open Platform")
+    if config .events .mode =='long_connection':
+        logger .info ("Receiving events over Feishu long connection, no public callback URL required")
+    else :
+        logger .info (f"Event webhook URL: http://localhost:{port }/webhook/event")
+        logger .info ("Please configure this URL in Feishu Open Platform")
 
     uvicorn .run (
     app ,
@@ -316,69 +618,3 @@ if __name__ =="__main__":
     port =port ,
     log_level ="info"
     )
-
-
-import os 
-import sys 
-import logging 
-from pathlib import Path 
-from dotenv import load_dotenv 
-
-
-project_root =Path (__file__ ).parent .parent 
-
-
-load_dotenv (project_root /'.env')
-
-
-sys .path .insert (0 ,str (project_root /'src'))
-from feishu_bot .session import SessionManager ,SessionConfig 
-from feishu_bot .config import get_config 
-from feishu_bot .bot import FeishuClient 
-from feishu_bot .command import CommandParser ,TmuxCommandExecutor 
-from feishu_bot .notification import NotificationSender 
-
-
-logging .basicConfig (
-level =logging .INFO ,
-format ='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-
-logger =logging .getLogger (__name__ )
-
-
-def main ():
-
-    config =get_config ()
-
-
-    session_manager =SessionManager (
-    config .session .storage_file ,
-    SessionConfig (
-    token_length =config .session .token_length ,
-    expiration_hours =config .session .expiration_hours ,
-    cleanup_interval_minutes =config .session .cleanup_interval_minutes 
-    )
-    )
-
-    if not config .feishu :
-        logger .error ("Feishu configuration not found!")
-        sys .exit (1 )
-
-    feishu_client =FeishuClient (config .feishu .app_id ,config .feishu .app_secret )
-    notification_sender =NotificationSender (feishu_client )
-    command_executor =TmuxCommandExecutor (session_manager )
-    parser =CommandParser ()
-
-    logger .info ("Bot service initialized")
-    logger .info ("Note: WebSocket integration requires additional implementation")
-    logger .info ("For now, use Webhook service to receive notifications")
-
-
-
-
-
-
-
-if __name__ =="__main__":
-    main ()
@@ -10,6 +10,8 @@ from fastapi import FastAPI ,Request
 import uvicorn 
 import json 
 
+from feishu_bot .utils import parse_relaxed 
+
 app =FastAPI (title ="Webhook Debug Service")
 
 
@@ -41,27 +43,7 @@ async def debug_notification (request :Request ):
         try :
             json_data =json .loads (body_str )
         except json .JSONDecodeError :
-
-
-            if body_str .startswith ("'")and body_str .endswith ("';"):
-                body_str =body_str [1 :-2 ]
-            elif body_str .startswith ("'")and body_str .endswith ("'"):
-                body_str =body_str [1 :-1 ]
-
-
-            import re 
-            body_str =re .sub (r'(\{|,)\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*:',r'\1"\2":',body_str )
-
-
-
-            body_str =re .sub (r':(\{\{[^}]+\}\})',r':"\1"',body_str )
-
-            body_str =re .sub (r':\s*([^,{}"}\[\]"\s][^,{}"}]*?)(?=[,}])',
-            lambda m :f': "{m .group (1 ).strip ()}"'if not m .group (1 ).strip ().replace ('.','').replace ('-','').isdigit ()
-            and m .group (1 ).strip ()not in ['true','false','null']else f': {m .group (1 ).strip ()}',
-            body_str )
-
-            json_data =json .loads (body_str )
+            json_data =parse_relaxed (body_str )
 
         print ("\n📊 Parsed JSON:")
         print (json .dumps (json_data ,indent =2 ,ensure_ascii =False ))
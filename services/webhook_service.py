@@ -1,177 +1,225 @@
 """
 Webhook 服务入口
+
+create_app(config) 构建相互隔离的应用实例, 导入本模块不会读取配置或启动任何组件;
+会话加载与 tenant_access_token 获取在 lifespan 启动阶段并行执行
 """
 
 import os 
 import sys 
 import logging 
+import asyncio 
 from pathlib import Path 
+from typing import Optional 
+from contextlib import asynccontextmanager 
 from dotenv import load_dotenv 
 
 
 project_root =Path (__file__ ).parent .parent 
 
 
-load_dotenv (project_root /'.env')
-
-
 sys .path .insert (0 ,str (project_root /'src'))
 
 from fastapi import FastAPI ,HTTPException ,Request 
-from fastapi .responses import JSONResponse 
+from fastapi .responses import JSONResponse ,Response 
 import uvicorn 
-import json 
-import re 
 
 from feishu_bot .session import SessionManager ,SessionConfig 
-from feishu_bot .config import get_config 
+from feishu_bot .config import Config ,get_config 
+from feishu_bot .utils import setup_logging ,payload_logger ,log_payload ,logging_stats ,jsoncodec ,parse_relaxed ,metrics ,render_metrics ,MetricsMiddleware 
+from feishu_bot .utils import setup_tracing ,tracing_stats ,TracingMiddleware ,create_debug_router ,LoopWatchdog 
 from feishu_bot .security import UserMappingService 
-from feishu_bot .bot import FeishuClient 
+from feishu_bot .bot import AsyncFeishuClient ,OutboundScheduler 
 from feishu_bot .notification import (
 WebhookRequest ,
 WebhookResponse ,
 NotificationSender ,
+NotificationOutbox ,
+NotificationCoalescer ,
+CardRenderer ,
 WebhookHandler 
 )
 
 
-logging .basicConfig (
-level =logging .INFO ,
-format ='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-
 logger =logging .getLogger (__name__ )
 
 
-config =get_config ()
-
-
-session_manager =SessionManager (
-config .session .storage_file ,
-SessionConfig (
-token_length =config .session .token_length ,
-expiration_hours =config .session .expiration_hours ,
-cleanup_interval_minutes =config .session .cleanup_interval_minutes 
-)
-)
-
-
-try :
-    user_mapping_service =UserMappingService (config .security .whitelist_file )
-except Exception as e :
-    logger .warning (f"Failed to load user mapping service: {e }")
-    user_mapping_service =None 
+def create_app (config :Optional [Config ]=None )->FastAPI :
 
 
-if not config .feishu :
-    logger .error ("Feishu configuration not found!")
-    sys .exit (1 )
+    load_dotenv (project_root /'.env')
+    config =config or get_config ()
+    setup_logging (config .logging ,"webhook")
+    setup_tracing (config .tracing ,"webhook")
+    payload_log =payload_logger ("webhook")
 
-feishu_client =FeishuClient (config .feishu .app_id ,config .feishu .app_secret )
+    if not config .feishu :
+        raise ValueError ("Feishu configuration not found")
 
-
-notification_sender =NotificationSender (feishu_client )
+    session_manager =SessionManager (
+    config .session .storage_file ,
+    SessionConfig (
+    token_length =config .session .token_length ,
+    expiration_hours =config .session .expiration_hours ,
+    cleanup_interval_minutes =config .session .cleanup_interval_minutes 
+    ),
+    autostart =False 
+    )
 
 
-webhook_handler =WebhookHandler (
-session_manager ,
-notification_sender ,
-user_mapping_service 
-)
+    try :
+        user_mapping_service =UserMappingService (config .security .whitelist_file )
+    except Exception as e :
+        logger .warning (f"Failed to load user mapping service: {e }")
+        user_mapping_service =None 
 
+    feishu_client =AsyncFeishuClient .from_config (config .feishu )
+    outbound_scheduler =OutboundScheduler .from_config (feishu_client ,config .outbound )
 
-app =FastAPI (
-title ="Feishu Bot Webhook Service",
-description ="Claude Code 远程控制机器人 Webhook 服务",
-version ="1.0.0"
-)
 
+    notification_sender =NotificationSender (outbound_scheduler ,CardRenderer .from_config (config .cards ))
 
-@app .get ("/health")
-async def health_check ():
 
-    return {
-    "status":"healthy",
-    "service":"webhook",
-    "feishu_app_id":config .feishu .app_id 
-    }
+    coalescer =None 
+    deliver =notification_sender .deliver 
+    if config .coalescing .enabled :
+        coalescer =NotificationCoalescer .from_config (config .coalescing ,notification_sender .deliver )
+        deliver =coalescer .deliver 
 
+    outbox =None 
+    if config .outbox .enabled :
+        outbox =NotificationOutbox .from_config (config .outbox ,deliver )
 
-@app .post ("/webhook/notification",response_model =WebhookResponse )
-async def receive_notification (request :Request ):
 
-    try :
+    webhook_handler =WebhookHandler (
+    session_manager ,
+    notification_sender ,
+    user_mapping_service ,
+    outbox 
+    )
 
-        body =await request .body ()
-        body_str =body .decode ('utf-8')
+    watchdog =LoopWatchdog .from_config (config .watchdog )if config .watchdog .enabled else None 
 
+    @asynccontextmanager 
+    async def lifespan (app :FastAPI ):
 
+        await asyncio .gather (feishu_client .start (),asyncio .to_thread (session_manager .start ))
+        outbound_scheduler .start ()
+        if watchdog is not None :
+            watchdog .start ()
+        if outbox is not None :
+            outbox .start ()
         try :
-            json_data =json .loads (body_str )
-        except json .JSONDecodeError :
-
-            logger .info ("Attempting to fix malformed JSON")
-
-
-            if body_str .startswith ("'")and body_str .endswith ("';"):
-                body_str =body_str [1 :-2 ]
-            elif body_str .startswith ("'")and body_str .endswith ("'"):
-                body_str =body_str [1 :-1 ]
+            yield 
+        finally :
+            if watchdog is not None :
+                await watchdog .stop ()
+            if outbox is not None :
+                await outbox .stop ()
+            await outbound_scheduler .stop ()
+            await feishu_client .aclose ()
+            session_manager .stop ()
+
+    app =FastAPI (
+    title ="Feishu Bot Webhook Service",
+    description ="Claude Code 远程控制机器人 Webhook 服务",
+    version ="1.0.0",
+    lifespan =lifespan 
+    )
+    app .state .config =config 
+    app .state .session_manager =session_manager 
+    app .state .feishu_client =feishu_client 
+    app .state .outbound =outbound_scheduler 
+    app .state .watchdog =watchdog 
+    app .state .webhook_handler =webhook_handler 
+    app .add_middleware (MetricsMiddleware ,service ="webhook")
+    app .add_middleware (TracingMiddleware ,service ="webhook")
+    if config .debug .enabled :
+        app .include_router (create_debug_router (config .debug ,user_mapping_service ,"webhook"))
+
+    @app .get ("/health")
+    async def health_check ():
+
+        return {
+        "status":"healthy",
+        "service":"webhook",
+        "feishu_app_id":config .feishu .app_id 
+        }
+
+    @app .post ("/webhook/notification",response_model =WebhookResponse )
+    async def receive_notification (request :Request ):
 
+        try :
 
-            body_str =re .sub (r'(\{|,)\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*:',r'\1"\2":',body_str )
+            body =await request .body ()
 
 
-            body_str =re .sub (r':(\{\{[^}]+\}\})',r':"\1"',body_str )
+            try :
+                json_data =jsoncodec .loads (body )
+            except jsoncodec .JSONDecodeError :
 
-            body_str =re .sub (r':\s*([^,{}"}\[\]"\s][^,{}"}]*?)(?=[,}])',
-            lambda m :f': "{m .group (1 ).strip ()}"'if not m .group (1 ).strip ().replace ('.','').replace ('-','').isdigit ()
-            and m .group (1 ).strip ()not in ['true','false','null']else f': {m .group (1 ).strip ()}',
-            body_str )
+                logger .info ("Attempting to fix malformed JSON")
+                json_data =parse_relaxed (body .decode ('utf-8','replace'))
+                log_payload (payload_log ,"Parsed relaxed notification payload",json_data )
 
-            json_data =json .loads (body_str )
-            logger .info (f"Successfully parsed fixed JSON: {json_data }")
 
+            req =WebhookRequest (**json_data )
+            return await webhook_handler .handle_notification (req )
+        except Exception as e :
+            logger .error (f"Error handling notification: {e }",exc_info =True )
+            raise HTTPException (status_code =500 ,detail =str (e ))
 
-        req =WebhookRequest (**json_data )
-        return webhook_handler .handle_notification (req )
-    except Exception as e :
-        logger .error (f"Error handling notification: {e }",exc_info =True )
-        raise HTTPException (status_code =500 ,detail =str (e ))
+    @app .get ("/webhook/session/{token}")
+    async def get_session (token :str ):
 
+        session =webhook_handler .get_session_info (token )
+        if not session :
+            raise HTTPException (status_code =404 ,detail ="Session not found")
 
-@app .get ("/webhook/session/{token}")
-async def get_session (token :str ):
+        return {
+        "token":session .token ,
+        "user_id":session .user_id ,
+        "open_id":session .open_id ,
+        "tmux_session":session .tmux_session ,
+        "status":session .status ,
+        "created_at":session .created_at .isoformat (),
+        "expires_at":session .expires_at .isoformat ()if session .expires_at else None 
+        }
 
-    session =webhook_handler .get_session_info (token )
-    if not session :
-        raise HTTPException (status_code =404 ,detail ="Session not found")
+    @app .get ("/webhook/stats")
+    async def get_stats ():
 
-    return {
-    "token":session .token ,
-    "user_id":session .user_id ,
-    "open_id":session .open_id ,
-    "tmux_session":session .tmux_session ,
-    "status":session .status ,
-    "created_at":session .created_at .isoformat (),
-    "expires_at":session .expires_at .isoformat ()if session .expires_at else None 
-    }
+        stats =webhook_handler .get_stats ()
+        stats ['outbound']=outbound_scheduler .stats ()
+        if coalescer is not None :
+            stats ['coalescing']=coalescer .stats ()
+        stats ['logging']=logging_stats ()
+        stats ['watchdog']=watchdog .stats ()if watchdog is not None else None 
+        stats ['tracing']=tracing_stats ()
+        return stats 
 
+    @app .get ("/metrics")
+    async def get_metrics ():
 
-@app .get ("/webhook/stats")
-async def get_stats ():
+        return Response (render_metrics (),headers ={"Content-Type":metrics .CONTENT_TYPE })
 
-    return webhook_handler .get_stats ()
+    @app .post ("/webhook/cleanup")
+    async def cleanup_sessions ():
 
+        cleaned =webhook_handler .cleanup_expired_sessions ()
+        return {"cleaned_sessions":cleaned }
 
-@app .post ("/webhook/cleanup")
-async def cleanup_sessions ():
-
-    cleaned =webhook_handler .cleanup_expired_sessions ()
-    return {"cleaned_sessions":cleaned }
+    return app 
 
 
 if __name__ =="__main__":
+    try :
+        app =create_app ()
+    except ValueError as e :
+        logger .error (f"{e }!")
+        sys .exit (1 )
+    config =app .state .config 
+
     port =config .webhook .port 
     logger .info (f"Starting webhook service on port {port }")
     logger .info (f"API docs: http://localhost:{port }/docs")
@@ -5,124 +5,154 @@ Webhook 服务入口 (宽松版 - 接受任意 JSON)
 import os 
 import sys 
 import logging 
+import asyncio 
 from pathlib import Path 
+from typing import Optional 
+from contextlib import asynccontextmanager 
 
 
 sys .path .insert (0 ,str (Path (__file__ ).parent .parent /'src'))
 
 from fastapi import FastAPI ,Request 
-from fastapi .responses import JSONResponse 
+from fastapi .responses import JSONResponse ,Response 
 import uvicorn 
 
 from feishu_bot .session import SessionManager ,SessionConfig 
-from feishu_bot .config import get_config 
+from feishu_bot .config import Config ,get_config 
+from feishu_bot .utils import setup_logging ,payload_logger ,log_payload ,jsoncodec ,parse_relaxed ,metrics ,render_metrics ,MetricsMiddleware 
+from feishu_bot .utils import tracing ,setup_tracing ,tracing_stats ,TracingMiddleware ,create_debug_router ,LoopWatchdog 
 from feishu_bot .security import UserMappingService 
-from feishu_bot .bot import FeishuClient 
+from feishu_bot .bot import AsyncFeishuClient ,OutboundScheduler 
 from feishu_bot .notification import NotificationSender 
 
 
-logging .basicConfig (
-level =logging .INFO ,
-format ='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-
 logger =logging .getLogger (__name__ )
 
 
-config =get_config ()
-
-
-session_manager =SessionManager (
-config .session .storage_file ,
-SessionConfig (
-token_length =config .session .token_length ,
-expiration_hours =config .session .expiration_hours ,
-cleanup_interval_minutes =config .session .cleanup_interval_minutes 
-)
-)
-
-
-try :
-    user_mapping_service =UserMappingService (config .security .whitelist_file )
-except Exception as e :
-    logger .warning (f"Failed to load user mapping service: {e }")
-    user_mapping_service =None 
-
-
-if not config .feishu :
-    logger .error ("Feishu configuration not found!")
-    sys .exit (1 )
-
-feishu_client =FeishuClient (config .feishu .app_id ,config .feishu .app_secret )
+def create_app (config :Optional [Config ]=None )->FastAPI :
 
 
-notification_sender =NotificationSender (feishu_client )
+    config =config or get_config ()
+    setup_logging (config .logging ,"webhook")
+    setup_tracing (config .tracing ,"webhook")
+    payload_log =payload_logger ("webhook")
 
+    if not config .feishu :
+        raise ValueError ("Feishu configuration not found")
 
-app =FastAPI (
-title ="Feishu Bot Webhook Service (Flexible)",
-description ="Claude Code 远程控制机器人 Webhook 服务 (宽松版)",
-version ="1.0.0"
-)
-
+    session_manager =SessionManager (
+    config .session .storage_file ,
+    SessionConfig (
+    token_length =config .session .token_length ,
+    expiration_hours =config .session .expiration_hours ,
+    cleanup_interval_minutes =config .session .cleanup_interval_minutes 
+    ),
+    autostart =False 
+    )
 
-@app .get ("/health")
-async def health_check ():
 
-    return {
-    "status":"healthy",
-    "service":"webhook",
-    "feishu_app_id":config .feishu .app_id 
-    }
+    try :
+        user_mapping_service =UserMappingService (config .security .whitelist_file )
+    except Exception as e :
+        logger .warning (f"Failed to load user mapping service: {e }")
+        user_mapping_service =None 
+
+    feishu_client =AsyncFeishuClient .from_config (config .feishu )
+    outbound_scheduler =OutboundScheduler .from_config (feishu_client ,config .outbound )
+
+
+    notification_sender =NotificationSender (outbound_scheduler )
+
+    watchdog =LoopWatchdog .from_config (config .watchdog )if config .watchdog .enabled else None 
+
+    @asynccontextmanager 
+    async def lifespan (app :FastAPI ):
+
+        await asyncio .gather (feishu_client .start (),asyncio .to_thread (session_manager .start ))
+        outbound_scheduler .start ()
+        if watchdog is not None :
+            watchdog .start ()
+        try :
+            yield 
+        finally :
+            if watchdog is not None :
+                await watchdog .stop ()
+            await outbound_scheduler .stop ()
+            await feishu_client .aclose ()
+            session_manager .stop ()
+
+    app =FastAPI (
+    title ="Feishu Bot Webhook Service (Flexible)",
+    description ="Claude Code 远程控制机器人 Webhook 服务 (宽松版)",
+    version ="1.0.0",
+    lifespan =lifespan 
+    )
+    app .state .config =config 
+    app .state .session_manager =session_manager 
+    app .state .feishu_client =feishu_client 
+    app .state .outbound =outbound_scheduler 
+    app .state .watchdog =watchdog 
+    app .add_middleware (MetricsMiddleware ,service ="webhook")
+    app .add_middleware (TracingMiddleware ,service ="webhook")
+    if config .debug .enabled :
+        app .include_router (create_debug_router (config .debug ,user_mapping_service ,"webhook"))
+
+    @app .get ("/health")
+    async def health_check ():
 
+        return {
+        "status":"healthy",
+        "service":"webhook",
+        "feishu_app_id":config .feishu .app_id 
+        }
 
-@app .post ("/webhook/notification")
-async def receive_notification (request :Request ):
+    @app .post ("/webhook/notification")
+    async def receive_notification (request :Request ):
 
-    try :
+        try :
 
-        body =await request .body ()
-        import json 
-        data =json .loads (body )
+            body =await request .body ()
+            try :
+                data =jsoncodec .loads (body )
+            except jsoncodec .JSONDecodeError :
+                data =parse_relaxed (body .decode ('utf-8','replace'))
 
 
-        logger .info ("="*60 )
-        logger .info ("📥 Received webhook notification:")
-        logger .info (json .dumps (data ,indent =2 ,ensure_ascii =False ))
-        logger .info ("="*60 )
+            log_payload (payload_log ,"Received webhook notification",data )
 
 
-        event =data .get ('event','unknown')
-        task_id =data .get ('task_id','unknown')
-        user_id =data .get ('user_id')or config .feishu .user_id 
-        tmux_session =data .get ('tmux_session','main')
+            event =data .get ('event','unknown')
+            task_id =data .get ('task_id','unknown')
+            user_id =data .get ('user_id')or config .feishu .user_id 
+            tmux_session =data .get ('tmux_session','main')
 
 
-        notification_data =data .get ('notification',{})
-        message =notification_data .get ('message',data .get ('message','未知通知'))
-        details =notification_data .get ('details',data .get ('details',''))
+            notification_data =data .get ('notification',{})
+            message =notification_data .get ('message',data .get ('message','未知通知'))
+            details =notification_data .get ('details',data .get ('details',''))
 
-        logger .info (f"Event: {event }, Task: {task_id }, User: {user_id }")
+            logger .info (f"Event: {event }, Task: {task_id }, User: {user_id }")
 
 
-        session =session_manager .create_session (
-        user_id =user_id ,
-        tmux_session =tmux_session 
-        )
+            session =session_manager .create_session (
+            user_id =user_id ,
+            tmux_session =tmux_session 
+            )
 
-        logger .info (f"✅ Created session: {session .token }")
+            tracing .set_attribute ('token',session .token )
+            logger .info (f"✅ Created session: {session .token }")
 
 
-        open_id =None 
-        if user_mapping_service :
-            open_id =user_mapping_service .get_open_id (user_id )
+            open_id =None 
+            if user_mapping_service :
+                open_id =user_mapping_service .get_open_id (user_id )
 
-        if not open_id :
-            open_id =config .feishu .open_id 
-            logger .warning (f"User {user_id } not in whitelist, using default open_id")
+            if not open_id :
+                open_id =config .feishu .open_id 
+                logger .warning (f"User {user_id } not in whitelist, using default open_id")
 
 
-        notification_text =f"""【Claude Code 任务通知】
+            notification_text =f"""【Claude Code 任务通知】
 事件: {event }
 任务ID: {task_id }
 会话: {tmux_session }
@@ -135,76 +165,90 @@ Token: {session .token }
 24小时内有效,回复 "{session .token }: 命令" 来执行命令
 """
 
-        success =notification_sender .send_notification (open_id ,notification_text )
+            success =await notification_sender .send_text_notification (open_id ,notification_text )
 
-        if success :
-            logger .info (f"✅ Notification sent to {open_id }")
-        else :
-            logger .error (f"❌ Failed to send notification to {open_id }")
+            if success :
+                logger .info (f"✅ Notification sent to {open_id }")
+            else :
+                logger .error (f"❌ Failed to send notification to {open_id }")
+
+            return {
+            "status":"success",
+            "token":session .token ,
+            "message":"Notification received and session created"
+            }
+
+        except Exception as e :
+            logger .error (f"Error handling notification: {e }",exc_info =True )
+            return JSONResponse (
+            status_code =500 ,
+            content ={"status":"error","message":str (e )}
+            )
+
+    @app .get ("/webhook/session/{token}")
+    async def get_session (token :str ):
+
+        session =session_manager .get_session (token )
+        if not session :
+            return JSONResponse (
+            status_code =404 ,
+            content ={"error":"Session not found"}
+            )
 
         return {
-        "status":"success",
         "token":session .token ,
-        "message":"Notification received and session created"
+        "user_id":session .user_id ,
+        "open_id":session .open_id ,
+        "tmux_session":session .tmux_session ,
+        "status":session .status ,
+        "created_at":session .created_at .isoformat (),
+        "expires_at":session .expires_at .isoformat ()if session .expires_at else None 
         }
 
-    except Exception as e :
-        logger .error (f"Error handling notification: {e }",exc_info =True )
-        return JSONResponse (
-        status_code =500 ,
-        content ={"status":"error","message":str (e )}
-        )
-
-
-@app .get ("/webhook/session/{token}")
-async def get_session (token :str ):
-
-    session =session_manager .get_session (token )
-    if not session :
-        return JSONResponse (
-        status_code =404 ,
-        content ={"error":"Session not found"}
-        )
-
-    return {
-    "token":session .token ,
-    "user_id":session .user_id ,
-    "open_id":session .open_id ,
-    "tmux_session":session .tmux_session ,
-    "status":session .status ,
-    "created_at":session .created_at .isoformat (),
-    "expires_at":session .expires_at .isoformat ()if session .expires_at else None 
-    }
-
-
-@app .get ("/webhook/stats")
-async def get_stats ():
-
-    sessions =session_manager .list_sessions ()
-    return {
-    "total_sessions":len (sessions ),
-    "active_sessions":len ([s for s in sessions if s .status =="active"]),
-    "sessions":[
-    {
-    "token":s .token ,
-    "user_id":s .user_id ,
-    "tmux_session":s .tmux_session ,
-    "status":s .status ,
-    "created_at":s .created_at .isoformat ()
-    }
-    for s in sessions 
-    ]
-    }
-
-
-@app .post ("/webhook/cleanup")
-async def cleanup_sessions ():
-
-    cleaned =session_manager .cleanup_expired_sessions ()
-    return {"cleaned_sessions":cleaned }
+    @app .get ("/webhook/stats")
+    async def get_stats ():
+
+        sessions =session_manager .list_sessions ()
+        return {
+        "total_sessions":len (sessions ),
+        "active_sessions":len ([s for s in sessions if s .status =="active"]),
+        "outbound":outbound_scheduler .stats (),
+        "tracing":tracing_stats (),
+        "watchdog":watchdog .stats ()if watchdog is not None else None ,
+        "sessions":[
+        {
+        "token":s .token ,
+        "user_id":s .user_id ,
+        "tmux_session":s .tmux_session ,
+        "status":s .status ,
+        "created_at":s .created_at .isoformat ()
+        }
+        for s in sessions 
+        ]
+        }
+
+    @app .get ("/metrics")
+    async def get_metrics ():
+
+        return Response (render_metrics (),headers ={"Content-Type":metrics .CONTENT_TYPE })
+
+    @app .post ("/webhook/cleanup")
+    async def cleanup_sessions ():
+
+        cleaned =session_manager .cleanup_expired_sessions ()
+        return {"cleaned_sessions":cleaned }
+
+    return app 
 
 
 if __name__ =="__main__":
+    try :
+        app =create_app ()
+    except ValueError as e :
+        logger .error (f"{e }!")
+        sys .exit (1 )
+    config =app .state .config 
+
     port =config .webhook .port 
     logger .info (f"Starting webhook service (flexible) on port {port }")
     logger .info (f"API docs: http://localhost:{port }/docs")
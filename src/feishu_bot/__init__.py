@@ -5,14 +5,18 @@
 __version__ ="0.1.0"
 __author__ ="Hongjun Li"
 
-from .import bot ,session ,command ,notification ,security ,config ,utils 
+from .utils .lazy import lazy_exports 
 
-__all__ =[
-'bot',
-'session',
-'command',
-'notification',
-'security',
-'config',
-'utils'
-]
+_EXPORTS ={
+'bot':'.bot',
+'session':'.session',
+'command':'.command',
+'notification':'.notification',
+'security':'.security',
+'config':'.config',
+'utils':'.utils'
+}
+
+__all__ =list (_EXPORTS )
+
+__getattr__ ,__dir__ =lazy_exports (__name__ ,_EXPORTS )
@@ -2,6 +2,34 @@
 Bot 模块
 """
 
-from .client import FeishuClient 
+from ..utils .lazy import lazy_exports 
 
-__all__ =['FeishuClient']
+_EXPORTS ={
+'FeishuClient':'.client',
+'AsyncFeishuClient':'.async_client',
+'SendResult':'.async_client',
+'TenantTokenManager':'.tenant_token',
+'TokenError':'.tenant_token',
+'OutboundScheduler':'.outbound',
+'BackgroundTaskRunner':'.tasks',
+'EventDeduplicator':'.dedup',
+'SharedDedupStore':'.dedup',
+'extract_event_id':'.dedup',
+'LongConnectionClient':'.long_connection',
+'LongConnectionError':'.long_connection',
+'Frame':'.long_connection',
+'TokenBucket':'.outbound',
+'PriorityLanes':'.outbound',
+'PRIORITY_WAITING':'.outbound',
+'PRIORITY_RESULT':'.outbound',
+'PRIORITY_INFO':'.outbound',
+'MessageRouter':'.router',
+'Route':'.router',
+'ROUTE_SLASH':'.router',
+'ROUTE_COMMAND':'.router',
+'ROUTE_DIRECT':'.router'
+}
+
+__all__ =list (_EXPORTS )
+
+__getattr__ ,__dir__ =lazy_exports (__name__ ,_EXPORTS )
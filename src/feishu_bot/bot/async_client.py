@@ -0,0 +1,228 @@
+"""
+异步飞书客户端 - 基于 httpx 连接池
+"""
+
+import time 
+import logging 
+from dataclasses import dataclass 
+from typing import Optional 
+
+import httpx 
+
+from .tenant_token import TenantTokenManager 
+from ..utils import jsoncodec ,metrics ,tracing 
+
+logger =logging .getLogger (__name__ )
+
+
+FEISHU_SEND_SECONDS =metrics .histogram (
+'feishu_bot_feishu_send_seconds',
+"Feishu send message latency including token fetch and one token retry",
+('msg_type',)
+)
+FEISHU_SEND_ERRORS =metrics .counter (
+'feishu_bot_feishu_send_errors_total',
+"Failed Feishu sends by business code (-1 for transport errors)",
+('msg_type','code')
+)
+
+
+DEFAULT_BASE_URL ="https://open.feishu.cn"
+MESSAGE_PATH ="/open-apis/im/v1/messages"
+
+
+TOKEN_INVALID_CODES ={99991661 ,99991663 ,99991664 }
+
+
+def _http2_available ()->bool :
+
+    try :
+        import h2 
+        return True 
+    except ImportError :
+        return False 
+
+
+@dataclass 
+class SendResult :
+
+    success :bool 
+    code :int =0 
+    msg :str =""
+    message_id :str =""
+    status_code :int =0 
+    retry_after :float =0.0 
+
+
+class AsyncFeishuClient :
+
+
+    def __init__ (
+    self ,
+    app_id :str ,
+    app_secret :str ,
+    base_url :str =DEFAULT_BASE_URL ,
+    http2 :bool =True ,
+    max_connections :int =100 ,
+    max_keepalive_connections :int =20 ,
+    keepalive_expiry :float =30.0 ,
+    timeout_seconds :float =10.0 ,
+    connect_timeout_seconds :float =5.0 ,
+    token_refresh_margin_seconds :float =300 ,
+    transport :Optional [httpx .AsyncBaseTransport ]=None 
+    ):
+        self .app_id =app_id 
+        self .app_secret =app_secret 
+        self .base_url =base_url .rstrip ('/')
+
+        if http2 and not _http2_available ():
+            logger .warning ("HTTP/2 requested but the 'h2' package is not installed, falling back to HTTP/1.1")
+            http2 =False 
+
+        self .http =httpx .AsyncClient (
+        base_url =self .base_url ,
+        http2 =http2 ,
+        limits =httpx .Limits (
+        max_connections =max_connections ,
+        max_keepalive_connections =max_keepalive_connections ,
+        keepalive_expiry =keepalive_expiry 
+        ),
+        timeout =httpx .Timeout (timeout_seconds ,connect =connect_timeout_seconds ),
+        transport =transport 
+        )
+
+        self .tokens =TenantTokenManager (
+        self .http ,
+        app_id ,
+        app_secret ,
+        refresh_margin_seconds =token_refresh_margin_seconds 
+        )
+
+        logger .info (f"Async Feishu client initialized: app_id={app_id }, base_url={self .base_url }, http2={http2 }")
+
+    @classmethod 
+    def from_config (cls ,feishu_config ,transport :Optional [httpx .AsyncBaseTransport ]=None )->'AsyncFeishuClient':
+
+        return cls (
+        feishu_config .app_id ,
+        feishu_config .app_secret ,
+        base_url =feishu_config .base_url ,
+        http2 =feishu_config .http2 ,
+        max_connections =feishu_config .max_connections ,
+        max_keepalive_connections =feishu_config .max_keepalive_connections ,
+        keepalive_expiry =feishu_config .keepalive_expiry ,
+        timeout_seconds =feishu_config .timeout_seconds ,
+        connect_timeout_seconds =feishu_config .connect_timeout_seconds ,
+        token_refresh_margin_seconds =feishu_config .token_refresh_margin_seconds ,
+        transport =transport 
+        )
+
+    async def start (self )->None :
+
+
+        try :
+            await self .tokens .refresh ()
+        except Exception as e :
+            logger .warning (f"Initial tenant_access_token fetch failed: {e }")
+        self .tokens .start ()
+
+    async def get_tenant_access_token (self )->str :
+
+        return await self .tokens .get ()
+
+    def invalidate_token (self ,token :Optional [str ]=None )->None :
+
+        self .tokens .invalidate (token )
+
+    async def send_message (
+    self ,
+    receive_id :str ,
+    msg_type :str ,
+    content :str ,
+    receive_id_type :str ="open_id"
+    )->SendResult :
+
+        with tracing .span ('feishu.send',tracing .KIND_CLIENT ,msg_type =msg_type ,receive_id =receive_id )as span :
+            result =await self ._send_message (receive_id ,msg_type ,content ,receive_id_type )
+            span .set_attributes ({'code':result .code ,'http.status_code':result .status_code })
+            if not result .success :
+                span .set_status (tracing .STATUS_ERROR ,result .msg )
+            return result 
+
+    async def _send_message (self ,receive_id :str ,msg_type :str ,content :str ,receive_id_type :str )->SendResult :
+
+        body ={'receive_id':receive_id ,'msg_type':msg_type ,'content':content }
+        started =time .perf_counter ()
+
+        try :
+            for attempt in range (2 ):
+                token =await self .get_tenant_access_token ()
+                response =await self .http .post (
+                MESSAGE_PATH ,
+                params ={'receive_id_type':receive_id_type },
+                content =jsoncodec .dumpb (body ),
+                headers ={'Authorization':f"Bearer {token }",'Content-Type':'application/json; charset=utf-8'}
+                )
+                result =self ._parse_send_response (response )
+
+
+                if result .code in TOKEN_INVALID_CODES and attempt ==0 :
+                    self .invalidate_token (token )
+                    continue 
+                break 
+        except Exception as e :
+            FEISHU_SEND_SECONDS .labels (msg_type ).observe (time .perf_counter ()-started )
+            FEISHU_SEND_ERRORS .labels (msg_type ,-1 ).inc ()
+            logger .error (f"Error sending {msg_type } message: {e }")
+            return SendResult (success =False ,code =-1 ,msg =str (e ))
+
+        FEISHU_SEND_SECONDS .labels (msg_type ).observe (time .perf_counter ()-started )
+        if not result .success :
+            FEISHU_SEND_ERRORS .labels (msg_type ,result .code ).inc ()
+            logger .error (f"Failed to send {msg_type } message: {result .code } - {result .msg }")
+        else :
+            logger .info (f"Message sent successfully to {receive_id }")
+        return result 
+
+    def _parse_send_response (self ,response :httpx .Response )->SendResult :
+
+        try :
+            data =jsoncodec .loads (response .content )
+        except ValueError :
+            data ={'code':-1 ,'msg':response .text [:200 ]}
+
+        code =data .get ('code',-1 )
+        try :
+            retry_after =float (response .headers .get ('x-ogw-ratelimit-reset')or 0 )
+        except ValueError :
+            retry_after =0.0 
+        return SendResult (
+        success =response .status_code ==200 and code ==0 ,
+        code =code ,
+        msg =data .get ('msg',''),
+        message_id =(data .get ('data')or {}).get ('message_id',''),
+        status_code =response .status_code ,
+        retry_after =retry_after 
+        )
+
+    async def send_text_message (self ,open_id :str ,text :str )->bool :
+
+        content =jsoncodec .dumps ({"text":text })
+        result =await self .send_message (open_id ,"text",content )
+        return result .success 
+
+    async def send_card (self ,open_id :str ,card_content :str )->bool :
+
+        result =await self .send_message (open_id ,"interactive",card_content )
+        return result .success 
+
+    async def aclose (self )->None :
+
+        await self .tokens .stop ()
+        await self .http .aclose ()
+
+    async def __aenter__ (self )->'AsyncFeishuClient':
+        return self 
+
+    async def __aexit__ (self ,exc_type ,exc ,tb )->None :
+        await self .aclose ()
@@ -3,13 +3,8 @@
 """
 
 import logging 
-import json 
-from lark_oapi import Client 
-from lark_oapi .api .im .v1 import (
-CreateMessageRequest ,
-CreateMessageRequestBody ,
-CreateMessageResponse 
-)
+
+from ..utils import jsoncodec 
 
 logger =logging .getLogger (__name__ )
 
@@ -18,6 +13,7 @@ class FeishuClient :
 
 
     def __init__ (self ,app_id :str ,app_secret :str ):
+        from lark_oapi import Client 
         self .app_id =app_id 
         self .app_secret =app_secret 
         self .client =Client .builder ().app_id (app_id ).app_secret (app_secret ).build ()
@@ -27,7 +23,9 @@ class FeishuClient :
 
         try :
 
-            content =json .dumps ({"text":text })
+            from lark_oapi .api .im .v1 import CreateMessageRequest ,CreateMessageRequestBody 
+
+            content =jsoncodec .dumps ({"text":text })
 
             request =CreateMessageRequest .builder ().receive_id_type ("open_id").request_body (
             CreateMessageRequestBody .builder ()
@@ -37,7 +35,7 @@ class FeishuClient :
             .build ()
             ).build ()
 
-            response :CreateMessageResponse =self .client .im .v1 .message .create (request )
+            response =self .client .im .v1 .message .create (request )
 
             if not response .success ():
                 logger .error (f"Failed to send message: {response .code } - {response .msg }")
@@ -53,6 +51,8 @@ class FeishuClient :
     def send_card (self ,open_id :str ,card_content :str )->bool :
 
         try :
+            from lark_oapi .api .im .v1 import CreateMessageRequest ,CreateMessageRequestBody 
+
             request =CreateMessageRequest .builder ().receive_id_type ("open_id").request_body (
             CreateMessageRequestBody .builder ()
             .receive_id (open_id )
@@ -0,0 +1,160 @@
+"""
+事件去重 - 过滤飞书重推的事件
+"""
+
+import os 
+import re 
+import time 
+import hashlib 
+import logging 
+from pathlib import Path 
+from collections import OrderedDict 
+from typing import Optional 
+
+logger =logging .getLogger (__name__ )
+
+
+_EVENT_ID =re .compile (rb'"event_id"\s*:\s*"([^"\\]{1,128})"')
+_EVENT_UUID =re .compile (rb'"uuid"\s*:\s*"([^"\\]{1,128})"')
+
+
+def extract_event_id (raw_body :bytes )->Optional [str ]:
+
+
+    match =_EVENT_ID .search (raw_body )or _EVENT_UUID .search (raw_body )
+    if match is None :
+        return None 
+    return match .group (1 ).decode ('utf-8','replace')
+
+
+class SharedDedupStore :
+
+
+    def __init__ (self ,directory :str ,ttl_seconds :float ,sweep_every :int =1000 ):
+        self .directory =Path (directory )
+        self .directory .mkdir (parents =True ,exist_ok =True )
+        self .ttl_seconds =ttl_seconds 
+        self .sweep_every =sweep_every 
+        self ._writes =0 
+
+    def _path (self ,key :str )->Path :
+
+        return self .directory /hashlib .sha1 (key .encode ('utf-8')).hexdigest ()
+
+    def add_if_absent (self ,key :str )->bool :
+
+        path =self ._path (key )
+        try :
+            fd =os .open (path ,os .O_CREAT |os .O_EXCL |os .O_WRONLY ,0o644 )
+        except FileExistsError :
+            try :
+                if time .time ()-path .stat ().st_mtime <self .ttl_seconds :
+                    return False 
+                os .utime (path )
+                return True 
+            except OSError :
+                return True 
+        os .close (fd )
+
+        self ._writes +=1 
+        if self .sweep_every and self ._writes %self .sweep_every ==0 :
+            self .sweep ()
+        return True 
+
+    def discard (self ,key :str )->None :
+
+        try :
+            self ._path (key ).unlink ()
+        except OSError :
+            pass 
+
+    def sweep (self )->int :
+
+        cutoff =time .time ()-self .ttl_seconds 
+        removed =0 
+        for entry in os .scandir (self .directory ):
+            try :
+                if entry .stat ().st_mtime <cutoff :
+                    os .unlink (entry .path )
+                    removed +=1 
+            except OSError :
+                continue 
+        return removed 
+
+
+class EventDeduplicator :
+
+
+    def __init__ (
+    self ,
+    max_entries :int =10000 ,
+    ttl_seconds :float =28800 ,
+    shared_store :Optional [SharedDedupStore ]=None 
+    ):
+        self .max_entries =max (1 ,max_entries )
+        self .ttl_seconds =ttl_seconds 
+        self .shared_store =shared_store 
+        self ._seen :OrderedDict =OrderedDict ()
+
+        self .checked =0 
+        self .duplicates =0 
+
+    @classmethod 
+    def from_config (cls ,events_config ,session_storage_file :str ="")->'EventDeduplicator':
+
+        shared_store =None 
+        if events_config .dedup_shared :
+            directory =Path (session_storage_file ).parent /'event_ids'
+            shared_store =SharedDedupStore (str (directory ),events_config .dedup_ttl_seconds )
+        return cls (
+        max_entries =events_config .dedup_max_entries ,
+        ttl_seconds =events_config .dedup_ttl_seconds ,
+        shared_store =shared_store 
+        )
+
+    def seen (self ,key :str )->bool :
+
+
+        now =time .monotonic ()
+        self .checked +=1 
+
+        expires_at =self ._seen .get (key )
+        if expires_at is not None and expires_at >now :
+            self .duplicates +=1 
+            return True 
+
+        self ._seen [key ]=now +self .ttl_seconds 
+        self ._seen .move_to_end (key )
+        self ._evict (now )
+
+        if self .shared_store is not None and not self .shared_store .add_if_absent (key ):
+            self .duplicates +=1 
+            return True 
+        return False 
+
+    def forget (self ,key :str )->None :
+
+
+        self ._seen .pop (key ,None )
+        if self .shared_store is not None :
+            self .shared_store .discard (key )
+
+    def _evict (self ,now :float )->None :
+
+
+        while self ._seen :
+            expires_at =next (iter (self ._seen .values ()))
+            if len (self ._seen )>self .max_entries or expires_at <=now :
+                self ._seen .popitem (last =False )
+            else :
+                break 
+
+    def stats (self )->dict :
+
+        return {
+        'entries':len (self ._seen ),
+        'max_entries':self .max_entries ,
+        'checked':self .checked ,
+        'duplicates':self .duplicates ,
+        'shared':self .shared_store is not None 
+        }
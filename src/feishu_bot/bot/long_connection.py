@@ -0,0 +1,427 @@
+"""
+长连接事件接收 - 通过飞书 WebSocket 长连接接收事件, 无需公网回调地址
+"""
+
+import time 
+import base64 
+import random 
+import asyncio 
+import logging 
+from dataclasses import dataclass ,field 
+from typing import Awaitable ,Callable ,Dict ,List ,Optional ,Tuple 
+from urllib .parse import urlparse ,parse_qs 
+
+import httpx 
+
+from ..utils import jsoncodec 
+
+logger =logging .getLogger (__name__ )
+
+
+ENDPOINT_PATH ="/callback/ws/endpoint"
+
+FRAME_CONTROL =0 
+FRAME_DATA =1 
+
+MESSAGE_EVENT ="event"
+MESSAGE_CARD ="card"
+MESSAGE_PING ="ping"
+MESSAGE_PONG ="pong"
+
+HEADER_TYPE ="type"
+HEADER_MESSAGE_ID ="message_id"
+HEADER_SUM ="sum"
+HEADER_SEQ ="seq"
+HEADER_TRACE_ID ="trace_id"
+HEADER_BIZ_RT ="biz_rt"
+HEADER_HANDSHAKE_STATUS ="handshake-status"
+HEADER_HANDSHAKE_MSG ="handshake-msg"
+
+
+FATAL_CODES ={403 ,514 ,1000040344 ,1000040350 }
+
+FRAGMENT_TTL_SECONDS =5 
+
+
+class LongConnectionError (Exception ):
+
+    def __init__ (self ,code :int ,msg :str ):
+        super ().__init__ (f"{code }: {msg }")
+        self .code =code 
+        self .fatal =code in FATAL_CODES 
+
+
+def _write_varint (out :bytearray ,value :int )->None :
+
+    value &=(1 <<64 )-1 
+    while value >=0x80 :
+        out .append ((value &0x7F )|0x80 )
+        value >>=7 
+    out .append (value )
+
+
+def _read_varint (data :bytes ,pos :int )->Tuple [int ,int ]:
+
+    result =0 
+    shift =0 
+    while True :
+        byte =data [pos ]
+        pos +=1 
+        result |=(byte &0x7F )<<shift 
+        if not byte &0x80 :
+            return result ,pos 
+        shift +=7 
+
+
+def _write_bytes (out :bytearray ,field_no :int ,value :bytes )->None :
+
+    _write_varint (out ,(field_no <<3 )|2 )
+    _write_varint (out ,len (value ))
+    out +=value 
+
+
+def _read_fields (data :bytes ):
+
+    pos =0 
+    while pos <len (data ):
+        key ,pos =_read_varint (data ,pos )
+        field_no ,wire_type =key >>3 ,key &7 
+        if wire_type ==0 :
+            value ,pos =_read_varint (data ,pos )
+        elif wire_type ==2 :
+            length ,pos =_read_varint (data ,pos )
+            value =data [pos :pos +length ]
+            pos +=length 
+        elif wire_type ==1 :
+            value =data [pos :pos +8 ]
+            pos +=8 
+        elif wire_type ==5 :
+            value =data [pos :pos +4 ]
+            pos +=4 
+        else :
+            raise ValueError (f"Unsupported wire type {wire_type }")
+        yield field_no ,value 
+
+
+@dataclass 
+class Frame :
+
+    seq_id :int =0 
+    log_id :int =0 
+    service :int =0 
+    method :int =FRAME_CONTROL 
+    headers :Dict [str ,str ]=field (default_factory =dict )
+    payload_encoding :str =""
+    payload_type :str =""
+    payload :bytes =b""
+    log_id_new :str =""
+
+    def encode (self )->bytes :
+
+        out =bytearray ()
+        for field_no ,value in ((1 ,self .seq_id ),(2 ,self .log_id ),(3 ,self .service ),(4 ,self .method )):
+            _write_varint (out ,field_no <<3 )
+            _write_varint (out ,value )
+        for key ,value in self .headers .items ():
+            header =bytearray ()
+            _write_bytes (header ,1 ,key .encode ('utf-8'))
+            _write_bytes (header ,2 ,value .encode ('utf-8'))
+            _write_bytes (out ,5 ,bytes (header ))
+        if self .payload_encoding :
+            _write_bytes (out ,6 ,self .payload_encoding .encode ('utf-8'))
+        if self .payload_type :
+            _write_bytes (out ,7 ,self .payload_type .encode ('utf-8'))
+        if self .payload :
+            _write_bytes (out ,8 ,self .payload )
+        if self .log_id_new :
+            _write_bytes (out ,9 ,self .log_id_new .encode ('utf-8'))
+        return bytes (out )
+
+    @classmethod 
+    def decode (cls ,data :bytes )->'Frame':
+
+        frame =cls ()
+        for field_no ,value in _read_fields (data ):
+            if field_no ==1 :
+                frame .seq_id =value 
+            elif field_no ==2 :
+                frame .log_id =value 
+            elif field_no ==3 :
+                frame .service =value 
+            elif field_no ==4 :
+                frame .method =value 
+            elif field_no ==5 :
+                header =dict (_read_fields (value ))
+                frame .headers [bytes (header .get (1 ,b'')).decode ('utf-8')]=bytes (header .get (2 ,b'')).decode ('utf-8')
+            elif field_no ==6 :
+                frame .payload_encoding =bytes (value ).decode ('utf-8')
+            elif field_no ==7 :
+                frame .payload_type =bytes (value ).decode ('utf-8')
+            elif field_no ==8 :
+                frame .payload =bytes (value )
+            elif field_no ==9 :
+                frame .log_id_new =bytes (value ).decode ('utf-8')
+        return frame 
+
+
+class LongConnectionClient :
+
+
+    def __init__ (
+    self ,
+    http :httpx .AsyncClient ,
+    app_id :str ,
+    app_secret :str ,
+    handler :Callable [[bytes ],Awaitable [Optional [dict ]]],
+    reconnect_base_seconds :float =1.0 ,
+    reconnect_max_seconds :float =60.0 ,
+    ping_interval_seconds :float =120.0 ,
+    connect :Optional [Callable ]=None 
+    ):
+        self .http =http 
+        self .app_id =app_id 
+        self .app_secret =app_secret 
+        self .handler =handler 
+        self .reconnect_base_seconds =reconnect_base_seconds 
+        self .reconnect_max_seconds =reconnect_max_seconds 
+        self .ping_interval_seconds =ping_interval_seconds 
+        self .reconnect_nonce_seconds =0.0 
+        self ._connect =connect 
+
+        self ._task :Optional [asyncio .Task ]=None 
+        self ._handlers :set =set ()
+        self ._fragments :Dict [str ,Tuple [float ,List [bytes ]]]={}
+        self ._service_id =0 
+        self .connected =False 
+
+        self .connects =0 
+        self .failures =0 
+        self .events =0 
+        self .errors =0 
+        self .last_error =""
+
+    @classmethod 
+    def from_config (
+    cls ,
+    feishu_client ,
+    events_config ,
+    handler :Callable [[bytes ],Awaitable [Optional [dict ]]]
+    )->'LongConnectionClient':
+
+        return cls (
+        feishu_client .http ,
+        feishu_client .app_id ,
+        feishu_client .app_secret ,
+        handler ,
+        reconnect_base_seconds =events_config .reconnect_base_seconds ,
+        reconnect_max_seconds =events_config .reconnect_max_seconds 
+        )
+
+    def start (self )->None :
+
+        if self ._task is None :
+            self ._task =asyncio .ensure_future (self ._run ())
+
+    async def stop (self )->None :
+
+        if self ._task is None :
+            return 
+        self ._task .cancel ()
+        await asyncio .gather (self ._task ,return_exceptions =True )
+        self ._task =None 
+
+        if self ._handlers :
+            await asyncio .wait (list (self ._handlers ),timeout =5 )
+        self .connected =False 
+
+    async def fetch_endpoint (self )->str :
+
+
+        response =await self .http .post (
+        ENDPOINT_PATH ,
+        json ={"AppID":self .app_id ,"AppSecret":self .app_secret },
+        headers ={"locale":"zh"}
+        )
+        if response .status_code !=200 :
+            raise LongConnectionError (response .status_code ,"endpoint request failed")
+
+        body =jsoncodec .loads (response .content )
+        code =body .get ('code',-1 )
+        if code !=0 :
+            raise LongConnectionError (code ,body .get ('msg',''))
+
+        data =body .get ('data')or {}
+        self ._configure (data .get ('ClientConfig')or {})
+        return data ['URL']
+
+    def _configure (self ,client_config :dict )->None :
+
+        if client_config .get ('PingInterval'):
+            self .ping_interval_seconds =client_config ['PingInterval']
+        if client_config .get ('ReconnectNonce')is not None :
+            self .reconnect_nonce_seconds =client_config ['ReconnectNonce']
+
+    def backoff (self ,attempt :int )->float :
+
+        delay =min (self .reconnect_max_seconds ,self .reconnect_base_seconds *(2 **attempt ))
+        return delay *random .uniform (0.5 ,1.0 )
+
+    async def _run (self )->None :
+
+
+        attempt =0 
+        while True :
+            try :
+                url =await self .fetch_endpoint ()
+                await self ._session (url )
+                attempt =0 
+                delay =random .uniform (0 ,self .reconnect_nonce_seconds )if self .reconnect_nonce_seconds else self .backoff (0 )
+                logger .warning (f"Long connection closed, reconnecting in {round (delay ,2 )}s")
+            except asyncio .CancelledError :
+                raise 
+            except LongConnectionError as e :
+                self .failures +=1 
+                self .last_error =str (e )
+                if e .fatal :
+                    logger .error (f"Long connection rejected, giving up: {e }")
+                    return 
+                delay =self .backoff (attempt )
+                attempt +=1 
+                logger .warning (f"Long connection failed ({e }), retrying in {round (delay ,2 )}s")
+            except Exception as e :
+                self .failures +=1 
+                self .last_error =str (e )
+                delay =self .backoff (attempt )
+                attempt +=1 
+                logger .warning (f"Long connection failed ({e }), retrying in {round (delay ,2 )}s")
+            finally :
+                self .connected =False 
+            await asyncio .sleep (delay )
+
+    async def _open (self ,url :str ):
+
+        if self ._connect is not None :
+            return await self ._connect (url )
+
+        import websockets 
+        try :
+            return await websockets .connect (url ,max_size =None )
+        except Exception as e :
+            response =getattr (e ,'response',None )
+            headers =getattr (response ,'headers',None )or getattr (e ,'headers',None )or {}
+            status =headers .get (HEADER_HANDSHAKE_STATUS )
+            if status is not None :
+                raise LongConnectionError (int (status ),headers .get (HEADER_HANDSHAKE_MSG ,''))
+            raise 
+
+    async def _session (self ,url :str )->None :
+
+        query =parse_qs (urlparse (url ).query )
+        self ._service_id =int ((query .get ('service_id')or ['0'])[0 ])
+        conn_id =(query .get ('device_id')or [''])[0 ]
+
+        ws =await self ._open (url )
+        self .connects +=1 
+        self .connected =True 
+        logger .info (f"Long connection established (conn_id={conn_id })")
+
+        pinger =asyncio .ensure_future (self ._ping_loop (ws ))
+        try :
+            async for message in ws :
+                if isinstance (message ,str ):
+                    message =message .encode ('utf-8')
+                frame =Frame .decode (message )
+                if frame .method ==FRAME_CONTROL :
+                    self ._handle_control (frame )
+                elif frame .method ==FRAME_DATA :
+                    task =asyncio .ensure_future (self ._handle_data (ws ,frame ))
+                    self ._handlers .add (task )
+                    task .add_done_callback (self ._handlers .discard )
+        finally :
+            pinger .cancel ()
+            await asyncio .gather (pinger ,return_exceptions =True )
+            await ws .close ()
+
+    async def _ping_loop (self ,ws )->None :
+
+        while True :
+            ping =Frame (service =self ._service_id ,method =FRAME_CONTROL ,headers ={HEADER_TYPE :MESSAGE_PING })
+            try :
+                await ws .send (ping .encode ())
+            except Exception as e :
+                logger .warning (f"Long connection ping failed: {e }")
+                return 
+            await asyncio .sleep (self .ping_interval_seconds )
+
+    def _handle_control (self ,frame :Frame )->None :
+
+        if frame .headers .get (HEADER_TYPE )==MESSAGE_PONG and frame .payload :
+            try :
+                self ._configure (jsoncodec .loads (frame .payload ))
+            except ValueError :
+                pass 
+
+    def _combine (self ,frame :Frame )->Optional [bytes ]:
+
+
+        message_id =frame .headers .get (HEADER_MESSAGE_ID ,'')
+        try :
+            total =int (frame .headers .get (HEADER_SUM ,'1')or 1 )
+            seq =int (frame .headers .get (HEADER_SEQ ,'0')or 0 )
+        except ValueError :
+            logger .warning (f"Dropping long connection fragment {message_id } with malformed sum/seq headers")
+            return None 
+        if total <=1 :
+            return frame .payload 
+
+        now =time .monotonic ()
+        for message_id in [k for k ,(created ,_ )in self ._fragments .items ()if now -created >FRAGMENT_TTL_SECONDS ]:
+            del self ._fragments [message_id ]
+
+        created ,parts =self ._fragments .setdefault (message_id ,(now ,[b'']*total ))
+        if not 0 <=seq <len (parts ):
+            logger .warning (f"Dropping long connection fragment {message_id }: seq {seq } out of range for sum {len (parts )}")
+            return None 
+        parts [seq ]=frame .payload 
+        if not all (parts ):
+            return None 
+        del self ._fragments [message_id ]
+        return b''.join (parts )
+
+    async def _handle_data (self ,ws ,frame :Frame )->None :
+
+        payload =self ._combine (frame )
+        if payload is None :
+            return 
+
+        message_type =frame .headers .get (HEADER_TYPE ,'')
+        response ={"code":200 ,"headers":{},"data":None }
+        started =time .monotonic ()
+        if message_type in (MESSAGE_EVENT ,MESSAGE_CARD ):
+            self .events +=1 
+            try :
+                result =await self .handler (payload )
+                if result is not None :
+                    response ["data"]=base64 .b64encode (jsoncodec .dumpb (result )).decode ('ascii')
+            except Exception as e :
+                self .errors +=1 
+                logger .error (f"Long connection event {frame .headers .get (HEADER_MESSAGE_ID )} failed: {e }")
+                response ["code"]=500 
+
+        frame .headers [HEADER_BIZ_RT ]=str (int ((time .monotonic ()-started )*1000 ))
+        frame .payload =jsoncodec .dumpb (response )
+        try :
+            await ws .send (frame .encode ())
+        except Exception as e :
+            logger .warning (f"Failed to acknowledge long connection event: {e }")
+
+    def stats (self )->dict :
+
+        return {
+        'connected':self .connected ,
+        'connects':self .connects ,
+        'failures':self .failures ,
+        'events':self .events ,
+        'errors':self .errors ,
+        'last_error':self .last_error 
+        }
@@ -0,0 +1,538 @@
+"""
+出站消息调度器 - 按飞书频控限制发送消息
+"""
+
+import time 
+import random 
+import asyncio 
+import logging 
+from collections import OrderedDict ,deque 
+from dataclasses import dataclass ,field 
+from typing import Any ,Callable ,Deque ,Dict ,List ,Optional ,Set ,Tuple 
+
+from .async_client import SendResult 
+from .tasks import QUEUE_DEPTH ,QUEUE_IN_FLIGHT ,QUEUE_WAIT_SECONDS 
+from ..utils import jsoncodec ,tracing 
+
+logger =logging .getLogger (__name__ )
+
+
+APP_RATE_LIMIT_CODES ={99991400 }
+USER_RATE_LIMIT_CODES ={230020 }
+RATE_LIMIT_CODES =APP_RATE_LIMIT_CODES |USER_RATE_LIMIT_CODES 
+
+LATENCY_WINDOW =1024 
+
+
+PRIORITY_WAITING ="waiting"
+PRIORITY_RESULT ="result"
+PRIORITY_INFO ="info"
+
+DEFAULT_LANE_WEIGHTS ={
+PRIORITY_WAITING :6 ,
+PRIORITY_RESULT :3 ,
+PRIORITY_INFO :1 ,
+}
+
+
+def _latency_summary (samples )->dict :
+
+    latencies =sorted (samples )
+
+    def _pct (p :float )->float :
+        if not latencies :
+            return 0.0 
+        return round (latencies [min (len (latencies )-1 ,int (len (latencies )*p ))],2 )
+
+    return {
+    'p50':_pct (0.50 ),
+    'p95':_pct (0.95 ),
+    'p99':_pct (0.99 ),
+    'max':round (latencies [-1 ],2 )if latencies else 0.0 
+    }
+
+
+class TokenBucket :
+
+
+    __slots__ =('max_rate','rate','capacity','tokens','updated','blocked_until')
+
+    def __init__ (self ,rate :float ,capacity :float ):
+        self .max_rate =rate 
+        self .rate =rate 
+        self .capacity =capacity 
+        self .tokens =capacity 
+        self .updated =time .monotonic ()
+        self .blocked_until =0.0 
+
+    def _refill (self ,now :float )->None :
+
+        if now >self .updated :
+            self .tokens =min (self .capacity ,self .tokens +(now -self .updated )*self .rate )
+            self .updated =now 
+
+    def delay (self ,now :float )->float :
+
+        self ._refill (now )
+        if self .blocked_until >now :
+            return self .blocked_until -now 
+        if self .tokens >=1 :
+            return 0.0 
+        return (1 -self .tokens )/self .rate 
+
+    def consume (self )->None :
+
+        self .tokens -=1 
+
+    def penalize (self ,retry_after :float ,now :float )->None :
+
+
+        self .rate =max (self .max_rate /8 ,self .rate /2 )
+        self .tokens =min (self .tokens ,0.0 )
+        self .blocked_until =max (self .blocked_until ,now +retry_after )
+
+    def recover (self )->None :
+
+        if self .rate <self .max_rate :
+            self .rate =min (self .max_rate ,self .rate +self .max_rate /10 )
+
+    def is_idle (self ,now :float )->bool :
+
+        self ._refill (now )
+        return self .tokens >=self .capacity and self .blocked_until <=now and self .rate >=self .max_rate 
+
+
+class PriorityLanes :
+
+
+    def __init__ (self ,weights :Dict [str ,int ]):
+        self .weights ={lane :max (1 ,int (weight ))for lane ,weight in weights .items ()}
+        self .lanes :Dict [str ,OrderedDict ]={lane :OrderedDict ()for lane in self .weights }
+        self ._sizes ={lane :0 for lane in self .weights }
+        self ._current ={lane :0 for lane in self .weights }
+        self ._size =0 
+
+    def __len__ (self )->int :
+
+        return self ._size 
+
+    def push (self ,lane :str ,key :str ,item ,front :bool =False )->None :
+
+        if lane not in self .lanes :
+            lane =min (self .weights ,key =self .weights .get )
+        queue =self .lanes [lane ].get (key )
+        if queue is None :
+            queue =self .lanes [lane ][key ]=deque ()
+        if front :
+            queue .appendleft (item )
+        else :
+            queue .append (item )
+        self ._sizes [lane ]+=1 
+        self ._size +=1 
+
+    def keys (self )->Set [str ]:
+
+        return {key for queues in self .lanes .values ()for key in queues }
+
+    def pop (self ,ready :Optional [Callable [[str ],bool ]]=None ):
+
+
+
+        candidates ={}
+        for lane ,queues in self .lanes .items ():
+            for key in queues :
+                if ready is None or ready (key ):
+                    candidates [lane ]=key 
+                    break 
+
+        if not candidates :
+            if self ._size ==0 :
+                raise IndexError ("pop from empty lanes")
+            return None 
+
+        best =None 
+        total =0 
+        for lane in candidates :
+            weight =self .weights [lane ]
+            self ._current [lane ]+=weight 
+            total +=weight 
+            if best is None or self ._current [lane ]>self ._current [best ]:
+                best =lane 
+        self ._current [best ]-=total 
+
+        queues =self .lanes [best ]
+        key =candidates [best ]
+        item =queues [key ].popleft ()
+        if queues [key ]:
+            queues .move_to_end (key )
+        else :
+            del queues [key ]
+        self ._sizes [best ]-=1 
+        self ._size -=1 
+        return best ,item 
+
+    def sizes (self )->Dict [str ,int ]:
+
+        return dict (self ._sizes )
+
+
+@dataclass 
+class OutboundMessage :
+
+    receive_id :str 
+    msg_type :str 
+    content :str 
+    receive_id_type :str ="open_id"
+    priority :str =PRIORITY_RESULT 
+    enqueued_at :float =field (default_factory =time .monotonic )
+    attempts :int =0 
+    future :Optional [asyncio .Future ]=None 
+    trace_parent :Any =None 
+
+
+class OutboundScheduler :
+
+
+    def __init__ (
+    self ,
+    client ,
+    app_rate :float =45 ,
+    app_burst :float =5 ,
+    user_rate :float =4.5 ,
+    user_burst :float =1 ,
+    workers :int =8 ,
+    max_retries :int =5 ,
+    base_backoff_seconds :float =0.5 ,
+    max_backoff_seconds :float =30 ,
+    queue_size :int =10000 ,
+    lane_weights :Optional [Dict [str ,int ]]=None 
+    ):
+        self .client =client 
+        self .user_rate =user_rate 
+        self .user_burst =user_burst 
+        self .workers =max (1 ,workers )
+        self .max_retries =max_retries 
+        self .base_backoff_seconds =base_backoff_seconds 
+        self .max_backoff_seconds =max_backoff_seconds 
+        self .queue_size =queue_size 
+
+        self .app_bucket =TokenBucket (app_rate ,app_burst )
+        self .user_buckets :Dict [str ,TokenBucket ]={}
+
+        self .lane_weights =dict (lane_weights or DEFAULT_LANE_WEIGHTS )
+        self ._lanes =PriorityLanes (self .lane_weights )
+        self ._cond :Optional [asyncio .Condition ]=None 
+        self ._unfinished =0 
+        self ._tasks :List [asyncio .Task ]=[]
+        self ._retrying =0 
+        self ._retry_handles :Dict [int ,Tuple [asyncio .TimerHandle ,OutboundMessage ]]={}
+        self ._stopping =False 
+        self ._in_flight =0 
+
+        self .queue_latency_ms :Deque [float ]=deque (maxlen =LATENCY_WINDOW )
+        self .lane_latency_ms :Dict [str ,Deque [float ]]={
+        lane :deque (maxlen =LATENCY_WINDOW )for lane in self .lane_weights 
+        }
+        self .sent =0 
+        self .failed =0 
+        self .retried =0 
+        self .rate_limited =0 
+
+    @classmethod 
+    def from_config (cls ,client ,outbound_config )->'OutboundScheduler':
+
+        return cls (
+        client ,
+        app_rate =outbound_config .app_rate ,
+        app_burst =outbound_config .app_burst ,
+        user_rate =outbound_config .user_rate ,
+        user_burst =outbound_config .user_burst ,
+        workers =outbound_config .workers ,
+        max_retries =outbound_config .max_retries ,
+        base_backoff_seconds =outbound_config .base_backoff_seconds ,
+        max_backoff_seconds =outbound_config .max_backoff_seconds ,
+        queue_size =outbound_config .queue_size ,
+        lane_weights =outbound_config .lane_weights 
+        )
+
+    def start (self )->None :
+
+        if self ._tasks :
+            return 
+        self ._stopping =False 
+        self ._cond =asyncio .Condition ()
+        self ._tasks =[asyncio .ensure_future (self ._worker ())for _ in range (self .workers )]
+        QUEUE_DEPTH .labels ('outbound').set_function (self ._lanes .__len__ )
+        QUEUE_IN_FLIGHT .labels ('outbound').set_function (lambda :self ._in_flight )
+        logger .info (f"Outbound scheduler started with {self .workers } workers, lane weights {self .lane_weights }")
+
+    async def stop (self ,timeout :float =5.0 )->None :
+
+
+        if not self ._tasks :
+            return 
+        try :
+            await asyncio .wait_for (self ._drained (),timeout )
+        except asyncio .TimeoutError :
+            logger .warning (
+            f"Outbound scheduler stopped with {len (self ._lanes )} messages pending "
+            f"and {len (self ._retry_handles )} retries scheduled"
+            )
+
+        self ._stopping =True 
+        for handle ,message in self ._retry_handles .values ():
+            handle .cancel ()
+            self ._retrying -=1 
+            self ._unfinished -=1 
+            self ._resolve (message ,SendResult (success =False ,code =-1 ,msg ="outbound scheduler stopped"))
+        self ._retry_handles .clear ()
+
+        for task in self ._tasks :
+            task .cancel ()
+        await asyncio .gather (*self ._tasks ,return_exceptions =True )
+        self ._tasks =[]
+
+        while len (self ._lanes ):
+            _ ,message =self ._lanes .pop ()
+            self ._unfinished -=1 
+            self ._resolve (message ,SendResult (success =False ,code =-1 ,msg ="outbound scheduler stopped"))
+
+    async def _drained (self )->None :
+
+        async with self ._cond :
+            await self ._cond .wait_for (lambda :self ._unfinished ==0 )
+
+    async def send_message (
+    self ,
+    receive_id :str ,
+    msg_type :str ,
+    content :str ,
+    receive_id_type :str ="open_id",
+    priority :str =PRIORITY_RESULT 
+    )->SendResult :
+
+        self .start ()
+        message =OutboundMessage (receive_id ,msg_type ,content ,receive_id_type ,priority )
+        message .future =asyncio .get_running_loop ().create_future ()
+        message .trace_parent =tracing .current_span ()
+
+        async with self ._cond :
+            await self ._cond .wait_for (lambda :len (self ._lanes )<self .queue_size )
+            self ._push (message )
+        return await message .future 
+
+    async def send_text_message (self ,open_id :str ,text :str ,priority :str =PRIORITY_RESULT )->bool :
+
+        result =await self .send_message (open_id ,"text",jsoncodec .dumps ({"text":text }),priority =priority )
+        return result .success 
+
+    async def send_card (self ,open_id :str ,card_content :str ,priority :str =PRIORITY_RESULT )->bool :
+
+        result =await self .send_message (open_id ,"interactive",card_content ,priority =priority )
+        return result .success 
+
+    def _push (self ,message :OutboundMessage ,front :bool =False )->None :
+
+
+        self ._lanes .push (message .priority ,message .receive_id ,message ,front )
+        self ._unfinished +=1 
+        self ._cond .notify_all ()
+
+    def _fire_retry (self ,message :OutboundMessage )->None :
+
+        if self ._retry_handles .pop (id (message ),None )is not None :
+            asyncio .ensure_future (self ._requeue (message ))
+
+    async def _requeue (self ,message :OutboundMessage )->None :
+
+        async with self ._cond :
+            self ._retrying -=1 
+            self ._unfinished -=1 
+            if self ._stopping :
+                self ._resolve (message ,SendResult (success =False ,code =-1 ,msg ="outbound scheduler stopped"))
+                self ._cond .notify_all ()
+                return 
+            self ._push (message ,front =True )
+
+    async def _pop (self )->OutboundMessage :
+
+
+
+
+        async with self ._cond :
+            while True :
+                await self ._cond .wait_for (lambda :len (self ._lanes )>0 )
+                now =time .monotonic ()
+                delay =self .app_bucket .delay (now )
+                if delay <=0 :
+                    popped =self ._lanes .pop (lambda receive_id :self ._user_bucket (receive_id ).delay (now )<=0 )
+                    if popped is not None :
+                        break 
+                    delay =min (self ._user_bucket (receive_id ).delay (now )for receive_id in self ._lanes .keys ())
+                try :
+                    await asyncio .wait_for (self ._cond .wait (),delay )
+                except asyncio .TimeoutError :
+                    pass 
+
+            lane ,message =popped 
+            self .app_bucket .consume ()
+            self ._user_bucket (message .receive_id ).consume ()
+            self ._cond .notify_all ()
+
+        if message .attempts ==0 :
+            latency =(time .monotonic ()-message .enqueued_at )*1000 
+            self .queue_latency_ms .append (latency )
+            self .lane_latency_ms .setdefault (lane ,deque (maxlen =LATENCY_WINDOW )).append (latency )
+            QUEUE_WAIT_SECONDS .labels ('outbound').observe (latency /1000 )
+        return message 
+
+    async def _task_done (self )->None :
+
+        async with self ._cond :
+            self ._unfinished -=1 
+            self ._cond .notify_all ()
+
+    def _user_bucket (self ,receive_id :str )->TokenBucket :
+
+        bucket =self .user_buckets .get (receive_id )
+        if bucket is None :
+            if len (self .user_buckets )>=LATENCY_WINDOW :
+                self ._prune_user_buckets ()
+            bucket =TokenBucket (self .user_rate ,self .user_burst )
+            self .user_buckets [receive_id ]=bucket 
+        return bucket 
+
+    def _prune_user_buckets (self )->None :
+
+        now =time .monotonic ()
+        for receive_id in [k for k ,b in self .user_buckets .items ()if b .is_idle (now )]:
+            del self .user_buckets [receive_id ]
+
+    async def _worker (self )->None :
+
+        while True :
+            message =await self ._pop ()
+            try :
+                with tracing .span (
+                'outbound.dispatch',
+                tracing .KIND_CONSUMER ,
+                parent =message .trace_parent ,
+                priority =message .priority ,
+                attempt =message .attempts +1 ,
+                queue_wait_ms =round ((time .monotonic ()-message .enqueued_at )*1000 ,3 )
+                ):
+                    await self ._dispatch (message )
+            except asyncio .CancelledError :
+                if not message .future .done ():
+                    message .future .cancel ()
+                raise 
+            except Exception as e :
+                logger .error (f"Outbound worker error: {e }",exc_info =True )
+                if not message .future .done ():
+                    self ._resolve (message ,SendResult (success =False ,code =-1 ,msg =str (e )))
+            finally :
+                await self ._task_done ()
+
+    async def _dispatch (self ,message :OutboundMessage )->None :
+
+        message .attempts +=1 
+        self ._in_flight +=1 
+        try :
+            result =await self .client .send_message (
+            message .receive_id ,
+            message .msg_type ,
+            message .content ,
+            message .receive_id_type 
+            )
+        finally :
+            self ._in_flight -=1 
+
+        if result .success :
+            self .sent +=1 
+            self .app_bucket .recover ()
+            self ._user_bucket (message .receive_id ).recover ()
+            self ._resolve (message ,result )
+            return 
+
+        if self ._is_rate_limited (result ):
+            self .rate_limited +=1 
+            self ._penalize (message .receive_id ,result )
+
+        if self ._is_retryable (result )and message .attempts <=self .max_retries :
+            self .retried +=1 
+            self ._schedule_retry (message ,result )
+            return 
+
+        self .failed +=1 
+        self ._resolve (message ,result )
+
+    def _resolve (self ,message :OutboundMessage ,result :SendResult )->None :
+
+
+        if not message .future .done ():
+            message .future .set_result (result )
+
+    def _is_rate_limited (self ,result :SendResult )->bool :
+
+        return result .status_code ==429 or result .code in RATE_LIMIT_CODES 
+
+    def _is_retryable (self ,result :SendResult )->bool :
+
+
+        return (
+        self ._is_rate_limited (result )
+        or result .code ==-1 
+        or result .status_code >=500 
+        )
+
+    def _penalize (self ,receive_id :str ,result :SendResult )->None :
+
+        now =time .monotonic ()
+        retry_after =result .retry_after or self .base_backoff_seconds 
+        if result .code in USER_RATE_LIMIT_CODES :
+            self ._user_bucket (receive_id ).penalize (retry_after ,now )
+        else :
+            self .app_bucket .penalize (retry_after ,now )
+        logger .warning (
+        f"Rate limited by Feishu (code={result .code }), "
+        f"app rate now {round (self .app_bucket .rate ,2 )}/s, retry after {retry_after }s"
+        )
+
+    def _backoff (self ,attempts :int ,retry_after :float =0.0 )->float :
+
+
+        ceiling =min (self .max_backoff_seconds ,self .base_backoff_seconds *(2 **(attempts -1 )))
+        return max (retry_after ,random .uniform (0 ,ceiling ))
+
+    def _schedule_retry (self ,message :OutboundMessage ,result :SendResult )->None :
+
+        delay =self ._backoff (message .attempts ,result .retry_after )
+        logger .info (f"Retrying message to {message .receive_id } in {round (delay ,2 )}s (attempt {message .attempts })")
+
+        self ._retrying +=1 
+        self ._unfinished +=1 
+        handle =asyncio .get_running_loop ().call_later (delay ,self ._fire_retry ,message )
+        self ._retry_handles [id (message )]=(handle ,message )
+
+    def stats (self )->dict :
+
+        return {
+        'queued':len (self ._lanes ),
+        'retrying':self ._retrying ,
+        'in_flight':self ._in_flight ,
+        'sent':self .sent ,
+        'failed':self .failed ,
+        'retried':self .retried ,
+        'rate_limited':self .rate_limited ,
+        'app_rate':round (self .app_bucket .rate ,2 ),
+        'user_buckets':len (self .user_buckets ),
+        'queue_latency_ms':_latency_summary (self .queue_latency_ms ),
+        'lanes':{
+        lane :{
+        'weight':self ._lanes .weights .get (lane ,0 ),
+        'queued':queued ,
+        'queue_latency_ms':_latency_summary (self .lane_latency_ms .get (lane ,()))
+        }
+        for lane ,queued in self ._lanes .sizes ().items ()
+        }
+        }
@@ -0,0 +1,55 @@
+"""
+消息路由
+"""
+
+from dataclasses import dataclass 
+from typing import Awaitable ,Callable ,Dict ,Optional 
+
+from ..command .parser import CommandParser 
+
+
+ROUTE_SLASH ="slash"
+ROUTE_COMMAND ="command"
+ROUTE_DIRECT ="direct"
+
+
+@dataclass 
+class Route :
+
+    kind :str 
+    text :str 
+    name :str =""
+    action :str =""
+    handler :Optional [Callable [...,Awaitable ]]=None 
+    token :str =""
+    command :str =""
+
+
+class MessageRouter :
+
+
+    def __init__ (self ,parser :CommandParser ):
+        self .parser =parser 
+        self .slash_commands :Dict [str ,tuple ]={}
+
+    def register (self ,name :str ,handler :Callable [...,Awaitable ],action :str ="")->None :
+
+        self .slash_commands [name ]=(handler ,action )
+
+    def route (self ,text :str )->Route :
+
+
+        if text [:1 ]=='/':
+            name =text .split (None ,1 )[0 ]
+            entry =self .slash_commands .get (name )
+            if entry is not None :
+                handler ,action =entry 
+                return Route (kind =ROUTE_SLASH ,text =text ,name =name ,action =action ,handler =handler )
+
+
+        parsed =self .parser .parse_remote_command (text )
+        if parsed is not None :
+            token ,command =parsed 
+            return Route (kind =ROUTE_COMMAND ,text =text ,token =token ,command =command )
+
+        return Route (kind =ROUTE_DIRECT ,text =text )
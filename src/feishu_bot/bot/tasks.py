@@ -0,0 +1,157 @@
+"""
+后台任务执行器 - 事件先确认再处理, 并发受限, 关闭时排空
+"""
+
+import time 
+import asyncio 
+import contextvars 
+import logging 
+from collections import deque 
+from typing import Any ,Awaitable ,Callable ,Deque ,List ,Optional ,Set 
+
+from ..utils import metrics 
+
+logger =logging .getLogger (__name__ )
+
+
+QUEUE_DEPTH =metrics .gauge (
+'feishu_bot_queue_depth',
+"Items waiting in an in-process queue",
+('queue',)
+)
+QUEUE_IN_FLIGHT =metrics .gauge (
+'feishu_bot_queue_in_flight',
+"Items taken from an in-process queue and still being processed",
+('queue',)
+)
+QUEUE_WAIT_SECONDS =metrics .histogram (
+'feishu_bot_queue_wait_seconds',
+"Time an item waited in an in-process queue before a worker picked it up",
+('queue',)
+)
+TASKS_TOTAL =metrics .counter (
+'feishu_bot_background_tasks_total',
+"Background tasks by outcome",
+('outcome',)
+)
+
+
+class BackgroundTaskRunner :
+
+
+    def __init__ (self ,max_concurrency :int =8 ,queue_size :int =1000 ):
+        self .max_concurrency =max (1 ,max_concurrency )
+        self .queue_size =queue_size 
+
+        self ._queue :Optional [asyncio .Queue ]=None 
+        self ._workers :List [asyncio .Task ]=[]
+        self ._running :Set [asyncio .Task ]=set ()
+        self ._accepting =False 
+
+        self .submitted =0 
+        self .completed =0 
+        self .failed =0 
+        self .rejected =0 
+        self .wait_ms :Deque [float ]=deque (maxlen =1024 )
+
+    @classmethod 
+    def from_config (cls ,events_config )->'BackgroundTaskRunner':
+
+        return cls (
+        max_concurrency =events_config .max_concurrency ,
+        queue_size =events_config .queue_size 
+        )
+
+    def start (self )->None :
+
+        if self ._workers :
+            return 
+        self ._queue =asyncio .Queue (maxsize =self .queue_size )
+        self ._workers =[asyncio .ensure_future (self ._worker ())for _ in range (self .max_concurrency )]
+        self ._accepting =True 
+        QUEUE_DEPTH .labels ('events').set_function (self ._queue .qsize )
+        QUEUE_IN_FLIGHT .labels ('events').set_function (self ._running .__len__ )
+        logger .info (f"Background task runner started with concurrency {self .max_concurrency }")
+
+    def submit (self ,fn :Callable [...,Awaitable [Any ]],*args ,name :str ="")->bool :
+
+
+        if self ._queue is None :
+            self .start ()
+        if not self ._accepting :
+            self .rejected +=1 
+            TASKS_TOTAL .labels ('rejected').inc ()
+            logger .warning (f"Background runner is shutting down, rejecting {name or fn }")
+            return False 
+        try :
+            self ._queue .put_nowait ((
+            fn ,args ,name or getattr (fn ,'__name__','task'),time .monotonic (),contextvars .copy_context ()
+            ))
+        except asyncio .QueueFull :
+            self .rejected +=1 
+            TASKS_TOTAL .labels ('rejected').inc ()
+            logger .warning (f"Background queue full ({self .queue_size }), rejecting {name or fn }")
+            return False 
+        self .submitted +=1 
+        return True 
+
+    async def _worker (self )->None :
+
+        while True :
+            fn ,args ,name ,enqueued_at ,context =await self ._queue .get ()
+            waited =time .monotonic ()-enqueued_at 
+            self .wait_ms .append (waited *1000 )
+            QUEUE_WAIT_SECONDS .labels ('events').observe (waited )
+            task =context .run (asyncio .ensure_future ,fn (*args ))
+            self ._running .add (task )
+            try :
+                await task 
+                self .completed +=1 
+                TASKS_TOTAL .labels ('completed').inc ()
+            except asyncio .CancelledError :
+                task .cancel ()
+                raise 
+            except Exception as e :
+                self .failed +=1 
+                TASKS_TOTAL .labels ('failed').inc ()
+                logger .error (f"Background task {name } failed: {e }",exc_info =True )
+            finally :
+                self ._running .discard (task )
+                self ._queue .task_done ()
+
+    async def stop (self ,timeout :float =30.0 )->None :
+
+
+        if not self ._workers :
+            return 
+        self ._accepting =False 
+
+        pending =self ._queue .qsize ()+len (self ._running )
+        if pending :
+            logger .info (f"Draining {pending } background tasks (timeout {timeout }s)")
+        try :
+            await asyncio .wait_for (self ._queue .join (),timeout )
+        except asyncio .TimeoutError :
+            logger .warning (
+            f"Background drain timed out, cancelling {len (self ._running )} running "
+            f"and dropping {self ._queue .qsize ()} queued tasks"
+            )
+
+        for worker in self ._workers :
+            worker .cancel ()
+        await asyncio .gather (*self ._workers ,return_exceptions =True )
+        self ._workers =[]
+
+    def stats (self )->dict :
+
+        waits =sorted (self .wait_ms )
+        return {
+        'queued':self ._queue .qsize ()if self ._queue is not None else 0 ,
+        'running':len (self ._running ),
+        'max_concurrency':self .max_concurrency ,
+        'submitted':self .submitted ,
+        'completed':self .completed ,
+        'failed':self .failed ,
+        'rejected':self .rejected ,
+        'wait_p95_ms':round (waits [min (len (waits )-1 ,int (len (waits )*0.95 ))],2 )if waits else 0.0 
+        }
@@ -0,0 +1,145 @@
+"""
+tenant_access_token 管理 - 缓存、后台提前刷新、并发刷新合并
+"""
+
+import time 
+import asyncio 
+import logging 
+from typing import Optional 
+
+import httpx 
+
+logger =logging .getLogger (__name__ )
+
+
+TOKEN_PATH ="/open-apis/auth/v3/tenant_access_token/internal"
+
+
+class TokenError (RuntimeError ):
+
+    pass 
+
+
+class TenantTokenManager :
+
+
+    def __init__ (
+    self ,
+    http :httpx .AsyncClient ,
+    app_id :str ,
+    app_secret :str ,
+    refresh_margin_seconds :float =300 ,
+    retry_seconds :float =5 ,
+    max_retry_seconds :float =60 
+    ):
+        self .http =http 
+        self .app_id =app_id 
+        self .app_secret =app_secret 
+        self .refresh_margin_seconds =refresh_margin_seconds 
+        self .retry_seconds =retry_seconds 
+        self .max_retry_seconds =max_retry_seconds 
+
+        self ._token =""
+        self ._expires_at =0.0 
+        self ._inflight :Optional [asyncio .Future ]=None 
+        self ._refresher :Optional [asyncio .Task ]=None 
+        self .refresh_count =0 
+
+    @property 
+    def token (self )->str :
+
+        return self ._token 
+
+    @property 
+    def expires_in (self )->float :
+
+        return max (0.0 ,self ._expires_at -time .monotonic ())
+
+    def is_valid (self )->bool :
+
+        return bool (self ._token )and time .monotonic ()<self ._expires_at 
+
+    async def get (self )->str :
+
+
+        if self .is_valid ():
+            return self ._token 
+        return await self .refresh ()
+
+    async def refresh (self )->str :
+
+
+        if self ._inflight is None :
+            self ._inflight =asyncio .ensure_future (self ._fetch ())
+            self ._inflight .add_done_callback (self ._clear_inflight )
+        return await asyncio .shield (self ._inflight )
+
+    def _clear_inflight (self ,future :asyncio .Future )->None :
+
+        if self ._inflight is future :
+            self ._inflight =None 
+
+        if not future .cancelled ():
+            future .exception ()
+
+    async def _fetch (self )->str :
+
+        response =await self .http .post (
+        TOKEN_PATH ,
+        json ={'app_id':self .app_id ,'app_secret':self .app_secret }
+        )
+        data =response .json ()
+        if data .get ('code',-1 )!=0 :
+            raise TokenError (f"Failed to get tenant_access_token: {data .get ('code')} - {data .get ('msg')}")
+
+        expire =data .get ('expire',7200 )
+        self ._token =data ['tenant_access_token']
+        self ._expires_at =time .monotonic ()+expire 
+        self .refresh_count +=1 
+        logger .info (f"Tenant access token refreshed, expires in {expire }s")
+        return self ._token 
+
+    def invalidate (self ,token :Optional [str ]=None )->None :
+
+
+        if token is None or token ==self ._token :
+            self ._token =""
+            self ._expires_at =0.0 
+
+    def start (self )->None :
+
+        if self ._refresher is None or self ._refresher .done ():
+            self ._refresher =asyncio .ensure_future (self ._refresh_loop ())
+
+    async def stop (self )->None :
+
+        if self ._refresher is not None :
+            self ._refresher .cancel ()
+            try :
+                await self ._refresher 
+            except asyncio .CancelledError :
+                pass 
+            self ._refresher =None 
+
+    def _next_refresh_delay (self )->float :
+
+
+        if not self ._token :
+            return 0.0 
+        remaining =self ._expires_at -time .monotonic ()
+        return max (1.0 ,remaining -self .refresh_margin_seconds ,min (remaining /2 ,self .refresh_margin_seconds ))
+
+    async def _refresh_loop (self )->None :
+
+        backoff =self .retry_seconds 
+        while True :
+            await asyncio .sleep (self ._next_refresh_delay ())
+            try :
+                await self .refresh ()
+                backoff =self .retry_seconds 
+            except asyncio .CancelledError :
+                raise 
+            except Exception as e :
+                logger .warning (f"Background token refresh failed, retrying in {backoff }s: {e }")
+                await asyncio .sleep (backoff )
+                backoff =min (backoff *2 ,self .max_retry_seconds )
@@ -2,19 +2,26 @@
 Command 执行模块
 """
 
-from .parser import CommandParser 
-from .validator import CommandValidator 
-from .executor import TmuxCommandExecutor ,CommandResult 
-from .windows_executor import WindowsClaudeCodeExecutor ,WindowsDirectMessageExecutor 
-from .claude_cli_executor import ClaudeCliExecutor ,ClaudeCliDirectExecutor 
+from ..utils .lazy import lazy_exports 
 
-__all__ =[
-'CommandParser',
-'CommandValidator',
-'TmuxCommandExecutor',
-'WindowsClaudeCodeExecutor',
-'WindowsDirectMessageExecutor',
-'ClaudeCliExecutor',
-'ClaudeCliDirectExecutor',
-'CommandResult'
-]
+_EXPORTS ={
+'CommandParser':'.parser',
+'CommandValidator':'.validator',
+'TmuxCommandExecutor':'.executor',
+'WindowsClaudeCodeExecutor':'.windows_executor',
+'WindowsDirectMessageExecutor':'.windows_executor',
+'ClaudeCliExecutor':'.claude_cli_executor',
+'ClaudeCliDirectExecutor':'.claude_cli_executor',
+'CommandResult':'.executor',
+'ResourceLimits':'.resources',
+'ProcessUsage':'.resources',
+'UsageLedger':'.usage',
+'UserUsage':'.usage',
+'CliProbe':'.cli_probe',
+'probe_claude_cli':'.cli_probe',
+'aprobe_claude_cli':'.cli_probe'
+}
+
+__all__ =list (_EXPORTS )
+
+__getattr__ ,__dir__ =lazy_exports (__name__ ,_EXPORTS )
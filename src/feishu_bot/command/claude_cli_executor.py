@@ -7,70 +7,122 @@ Claude CLI 执行器 - 真正的远程自动化执行
 - 支持继续对话
 """
 
-import subprocess 
 import logging 
 import json 
 from typing import Optional 
-from dataclasses import dataclass 
 from datetime import datetime 
 from pathlib import Path 
 
+from .executor import CommandResult 
+from .resources import ResourceLimits ,ProcessRun ,run_with_limits 
+from .cli_probe import CliProbe ,probe_claude_cli ,DEFAULT_CACHE_TTL_SECONDS 
+from ..utils import metrics ,tracing 
+
 logger =logging .getLogger (__name__ )
 
 
-@dataclass 
-class CommandResult :
+CLAUDE_TIMEOUT_SECONDS =120 
+
+
+EXECUTOR_IN_FLIGHT =metrics .gauge (
+'feishu_bot_executor_in_flight',
+"Claude CLI processes currently running",
+('executor',)
+)
+EXECUTOR_SPAWN_SECONDS =metrics .histogram (
+'feishu_bot_executor_spawn_seconds',
+"Time to start the Claude CLI process",
+('executor',),
+metrics .FAST_BUCKETS 
+)
+EXECUTOR_RUN_SECONDS =metrics .histogram (
+'feishu_bot_executor_run_seconds',
+"Claude CLI run time from spawn to exit",
+('executor','outcome')
+)
+CLAUDE_TIMEOUTS =metrics .counter (
+'feishu_bot_claude_timeouts_total',
+"Claude CLI runs killed after the execution timeout",
+('executor',)
+)
+
+
+def run_claude (executor :str ,prompt :str ,limits :ResourceLimits ,working_dir :str )->ProcessRun :
 
-    token :str 
-    command :str 
-    success :bool 
-    method :str 
-    output :str =""
-    error :str =""
-    exec_time_ms :int =0 
-    timestamp :datetime =None 
 
-    def __post_init__ (self ):
-        if self .timestamp is None :
-            self .timestamp =datetime .now ()
+    escaped_prompt =prompt .replace ('"','\\"')
+    in_flight =EXECUTOR_IN_FLIGHT .labels (executor )
+    with tracing .span ('claude.run',executor =executor ,working_dir =working_dir )as span :
+        in_flight .inc ()
+        try :
+            result =run_with_limits (
+            f'claude -p "{escaped_prompt }"',
+            limits =limits ,
+            timeout =CLAUDE_TIMEOUT_SECONDS ,
+            cwd =working_dir ,
+            shell =True 
+            )
+        finally :
+            in_flight .dec ()
+
+        if span .recording :
+            spawned_ns =span .start_ns +int (result .spawn_ms *1e6 )
+            tracing .record_span ('claude.spawn',span .start_ns ,spawned_ns )
+            tracing .record_span ('claude.wait',spawned_ns ,spawned_ns +int (result .run_ms *1e6 ))
+            span .set_attributes ({
+            'exit_code':result .returncode ,
+            'timed_out':result .timed_out ,
+            'spawn_ms':round (result .spawn_ms ,3 ),
+            'run_ms':round (result .run_ms ,3 )
+            })
+
+    outcome ='timeout'if result .timed_out else ('ok'if result .returncode ==0 else 'error')
+    EXECUTOR_SPAWN_SECONDS .labels (executor ).observe (result .spawn_ms /1000 )
+    EXECUTOR_RUN_SECONDS .labels (executor ,outcome ).observe (result .run_ms /1000 )
+    if result .timed_out :
+        CLAUDE_TIMEOUTS .labels (executor ).inc ()
+    return result 
 
 
 class ClaudeCliExecutor :
 
 
-    def __init__ (self ,session_manager ):
+    def __init__ (self ,session_manager ,limits :Optional [ResourceLimits ]=None ,usage_ledger =None ,validator =None ):
         self .session_manager =session_manager 
         from .parser import CommandParser 
         from .validator import CommandValidator 
         self .parser =CommandParser ()
-        self .validator =CommandValidator ()
-        self ._check_claude_cli ()
+        self .validator =validator or CommandValidator ()
+        self .limits =limits or ResourceLimits ()
+        self .usage_ledger =usage_ledger 
+        self .cli :Optional [CliProbe ]=None 
 
-    def _check_claude_cli (self ):
+    def check_cli (self ,cache_file :Optional [str ]=None ,ttl_seconds :float =DEFAULT_CACHE_TTL_SECONDS )->CliProbe :
 
-        try :
-            result =subprocess .run (
-            'claude --version',
-            capture_output =True ,
-            text =True ,
-            encoding ='utf-8',
-            errors ='ignore',
-            timeout =5 ,
-            shell =True 
-            )
-            if result .returncode ==0 :
-                logger .info (f"Claude CLI found: {result .stdout .strip ()}")
-            else :
-                logger .warning ("Claude CLI not found or not working")
-        except Exception as e :
-            logger .error (f"Failed to check Claude CLI: {e }")
+
+        self .cli =probe_claude_cli (cache_file ,ttl_seconds )
+        if self .cli .available :
+            logger .info (f"Claude CLI found: {self .cli .version }{' (cached)'if self .cli .cached else ''}")
+        else :
+            logger .warning (f"Claude CLI not found or not working: {self .cli .error }")
+        return self .cli 
 
     def execute_command (self ,token :str ,command :str ,user_id :str )->CommandResult :
 
+        timings ={}
+        with tracing .span ('executor.execute_command',executor ='command',token =token )as span :
+            result =self ._execute_command (token ,command ,user_id ,timings )
+            span .set_attribute ('success',result .success )
+        result .timings =timings 
+        return result 
+
+    def _execute_command (self ,token :str ,command :str ,user_id :str ,timings :dict )->CommandResult :
+
         start_time =datetime .now ()
 
 
-        session =self .session_manager .validate_session (token )
+        with tracing .timed (timings ,'session','executor.validate_session'):
+            session =self .session_manager .validate_session (token )
         if session is None :
             return CommandResult (
             token =token ,
@@ -82,7 +134,9 @@ class ClaudeCliExecutor :
             )
 
 
-        if not self .validator .validate_command (command ):
+        with tracing .timed (timings ,'validate','executor.validate_command'):
+            allowed =self .validator .validate_command (command )
+        if not allowed :
             return CommandResult (
             token =token ,
             command =command ,
@@ -93,39 +147,55 @@ class ClaudeCliExecutor :
             )
 
 
+        if self .usage_ledger is not None :
+            with tracing .timed (timings ,'quota','executor.check_quota'):
+                quota_error =self .usage_ledger .check_quota (user_id )
+            if quota_error :
+                return CommandResult (
+                token =token ,
+                command =command ,
+                success =False ,
+                method ="failed",
+                error =f"Usage quota exceeded: {quota_error }",
+                exec_time_ms =self ._calc_exec_time (start_time )
+                )
+
         working_dir =session .working_dir 
         if working_dir =="{{cwd}}"or not working_dir :
             working_dir =str (Path .cwd ())
 
 
-        result =self ._execute_with_claude_cli (command ,working_dir )
+        result =self ._execute_with_claude_cli (command ,working_dir ,timings )
         result .token =token 
         result .command =command 
         result .exec_time_ms =self ._calc_exec_time (start_time )
 
 
-        self .session_manager .update_session (token )
+        with tracing .timed (timings ,'session_update','executor.update_session'):
+            self .session_manager .update_session (token )
+
+        if self .usage_ledger is not None :
+            with tracing .timed (timings ,'usage_record','executor.record_usage'):
+                self .usage_ledger .record (user_id ,result )
 
         logger .info (f"Command executed via Claude CLI: token={token }, success={result .success }")
         return result 
 
-    def _execute_with_claude_cli (self ,command :str ,working_dir :str )->CommandResult :
+    def _execute_with_claude_cli (self ,command :str ,working_dir :str ,timings :dict )->CommandResult :
 
         try :
+            result =run_claude ('command',command ,self .limits ,working_dir )
+            timings ['spawn']=round (result .spawn_ms ,3 )
+            timings ['run']=round (result .run_ms ,3 )
 
-            escaped_command =command .replace ('"','\\"')
-
-
-            result =subprocess .run (
-            f'claude -p "{escaped_command }"',
-            capture_output =True ,
-            text =True ,
-            encoding ='utf-8',
-            errors ='ignore',
-            timeout =120 ,
-            cwd =working_dir ,
-            shell =True 
-            )
+            if result .timed_out :
+                return CommandResult (
+                token ="",
+                command =command ,
+                success =False ,
+                method ="failed",
+                error =f"Command execution timed out ({CLAUDE_TIMEOUT_SECONDS }s limit)"
+                ).apply_usage (result .usage )
 
             if result .returncode ==0 :
                 output =result .stdout .strip ()
@@ -135,7 +205,7 @@ class ClaudeCliExecutor :
                 success =True ,
                 method ="claude_cli",
                 output =output if output else "Command executed successfully"
-                )
+                ).apply_usage (result .usage )
             else :
                 error =result .stderr .strip ()
                 return CommandResult (
@@ -144,16 +214,8 @@ class ClaudeCliExecutor :
                 success =False ,
                 method ="failed",
                 error =f"Claude CLI error: {error }"
-                )
+                ).apply_usage (result .usage )
 
-        except subprocess .TimeoutExpired :
-            return CommandResult (
-            token ="",
-            command =command ,
-            success =False ,
-            method ="failed",
-            error ="Command execution timed out (120s limit)"
-            )
         except Exception as e :
             logger .error (f"Failed to execute with Claude CLI: {e }")
             return CommandResult (
@@ -173,15 +235,27 @@ class ClaudeCliExecutor :
 class ClaudeCliDirectExecutor :
 
 
-    def __init__ (self ,session_manager ):
+    def __init__ (self ,session_manager ,limits :Optional [ResourceLimits ]=None ,usage_ledger =None ):
         self .session_manager =session_manager 
+        self .limits =limits or ResourceLimits ()
+        self .usage_ledger =usage_ledger 
 
     def send_message (self ,open_id :str ,message :str )->CommandResult :
 
+        timings ={}
+        with tracing .span ('executor.send_message',executor ='direct')as span :
+            result =self ._send_message (open_id ,message ,timings )
+            span .set_attribute ('success',result .success )
+        result .timings =timings 
+        return result 
+
+    def _send_message (self ,open_id :str ,message :str ,timings :dict )->CommandResult :
+
         start_time =datetime .now ()
 
 
-        session =self .session_manager .get_user_active_session (open_id )
+        with tracing .timed (timings ,'session','executor.find_session'):
+            session =self .session_manager .get_user_active_session (open_id )
 
         if not session :
             return CommandResult (
@@ -194,33 +268,48 @@ class ClaudeCliDirectExecutor :
             )
 
 
+        tracing .set_attribute ('token',session .token )
+        if self .usage_ledger is not None :
+            with tracing .timed (timings ,'quota','executor.check_quota'):
+                quota_error =self .usage_ledger .check_quota (session .user_id )
+            if quota_error :
+                return CommandResult (
+                token =session .token ,
+                command =message ,
+                success =False ,
+                method ="failed",
+                error =f"⛔ 用量已超出限制\n\n{quota_error }",
+                exec_time_ms =self ._calc_exec_time (start_time )
+                )
+
+
         working_dir =session .working_dir 
         if working_dir =="{{cwd}}"or not working_dir :
             working_dir =str (Path .cwd ())
 
 
         try :
+            result =run_claude ('direct',message ,self .limits ,working_dir )
+            timings ['spawn']=round (result .spawn_ms ,3 )
+            timings ['run']=round (result .run_ms ,3 )
 
-            escaped_message =message .replace ('"','\\"')
 
-            result =subprocess .run (
-            f'claude -p "{escaped_message }"',
-            capture_output =True ,
-            text =True ,
-            encoding ='utf-8',
-            errors ='ignore',
-            timeout =120 ,
-            cwd =working_dir ,
-            shell =True 
-            )
+            with tracing .timed (timings ,'session_update','executor.update_session'):
+                self .session_manager .update_session (session .token )
 
-
-            self .session_manager .update_session (session .token )
-
-            if result .returncode ==0 :
+            if result .timed_out :
+                command_result =CommandResult (
+                token =session .token ,
+                command =message ,
+                success =False ,
+                method ="failed",
+                error =f"⏱️ 执行超时({CLAUDE_TIMEOUT_SECONDS }秒)\n\n任务可能太复杂,请简化后重试",
+                exec_time_ms =self ._calc_exec_time (start_time )
+                )
+            elif result .returncode ==0 :
                 output =result .stdout .strip ()
 
-                return CommandResult (
+                command_result =CommandResult (
                 token =session .token ,
                 command =message ,
                 success =True ,
@@ -235,7 +324,7 @@ class ClaudeCliDirectExecutor :
                 )
             else :
                 error =result .stderr .strip ()
-                return CommandResult (
+                command_result =CommandResult (
                 token =session .token ,
                 command =message ,
                 success =False ,
@@ -244,15 +333,12 @@ class ClaudeCliDirectExecutor :
                 exec_time_ms =self ._calc_exec_time (start_time )
                 )
 
-        except subprocess .TimeoutExpired :
-            return CommandResult (
-            token =session .token ,
-            command =message ,
-            success =False ,
-            method ="failed",
-            error ="⏱️ 执行超时(120秒)\n\n任务可能太复杂,请简化后重试",
-            exec_time_ms =self ._calc_exec_time (start_time )
-            )
+            command_result .apply_usage (result .usage )
+            if self .usage_ledger is not None :
+                with tracing .timed (timings ,'usage_record','executor.record_usage'):
+                    self .usage_ledger .record (session .user_id ,command_result )
+            return command_result 
+
         except Exception as e :
             logger .error (f"Failed to send message via Claude CLI: {e }")
             return CommandResult (
@@ -0,0 +1,153 @@
+"""
+Claude CLI 探测 - 缓存 `claude --version` 的结果
+
+探测结果按 CLI 可执行文件路径与修改时间缓存:
+- 进程内缓存, 同一进程内多次创建应用只探测一次
+- 可选的磁盘缓存文件, 多个 worker / 重启后在有效期内直接复用, 不再启动子进程
+CLI 升级 (可执行文件修改时间变化) 或缓存过期后重新探测
+- 探测失败 (超时 / 非零退出) 只在进程内缓存 30 秒, 不写入磁盘缓存
+"""
+
+import os 
+import time 
+import shutil 
+import logging 
+import subprocess 
+import threading 
+from dataclasses import dataclass ,asdict 
+from pathlib import Path 
+from typing import Dict ,Optional ,Tuple 
+
+from ..utils import jsoncodec 
+
+logger =logging .getLogger (__name__ )
+
+
+CLI_COMMAND ="claude"
+PROBE_TIMEOUT_SECONDS =5 
+DEFAULT_CACHE_TTL_SECONDS =86400 
+FAILURE_CACHE_TTL_SECONDS =30 
+
+_cache :Dict [Tuple [str ,float ],'CliProbe']={}
+_cache_lock =threading .Lock ()
+
+
+@dataclass 
+class CliProbe :
+
+
+    available :bool 
+    version :str =""
+    path :str =""
+    mtime :float =0.0 
+    checked_at :float =0.0 
+    error :str =""
+    cached :bool =False 
+
+
+def _locate ()->Tuple [str ,float ]:
+
+    path =shutil .which (CLI_COMMAND )or ""
+    if not path :
+        return "",0.0 
+    try :
+        return path ,os .stat (path ).st_mtime 
+    except OSError :
+        return path ,0.0 
+
+
+def _read_cache_file (cache_file :Optional [str ],path :str ,mtime :float ,ttl_seconds :float )->Optional [CliProbe ]:
+
+
+    if not cache_file :
+        return None 
+    try :
+        data =jsoncodec .loads (Path (cache_file ).read_bytes ())
+        probe =CliProbe (**data )
+    except (OSError ,ValueError ,TypeError ):
+        return None 
+
+    if probe .path !=path or probe .mtime !=mtime :
+        return None 
+    if time .time ()-probe .checked_at >ttl_seconds :
+        return None 
+    probe .cached =True 
+    return probe 
+
+
+def _write_cache_file (cache_file :Optional [str ],probe :CliProbe )->None :
+
+
+    if not cache_file :
+        return 
+    target =Path (cache_file )
+    temp =target .with_name (f"{target .name }.{os .getpid ()}.tmp")
+    try :
+        target .parent .mkdir (parents =True ,exist_ok =True )
+        data =asdict (probe )
+        data .pop ('cached')
+        temp .write_bytes (jsoncodec .dumpb (data ))
+        os .replace (temp ,target )
+    except OSError as e :
+        logger .debug (f"Failed to write Claude CLI probe cache: {e }")
+
+
+def _run_probe (path :str ,mtime :float )->CliProbe :
+
+    try :
+        result =subprocess .run (
+        f'{CLI_COMMAND } --version',
+        capture_output =True ,
+        text =True ,
+        encoding ='utf-8',
+        errors ='ignore',
+        timeout =PROBE_TIMEOUT_SECONDS ,
+        shell =True 
+        )
+    except Exception as e :
+        return CliProbe (available =False ,path =path ,mtime =mtime ,checked_at =time .time (),error =str (e ))
+
+    if result .returncode !=0 :
+        return CliProbe (available =False ,path =path ,mtime =mtime ,checked_at =time .time (),
+        error =(result .stderr or result .stdout ).strip ()[:200 ])
+    return CliProbe (available =True ,version =result .stdout .strip (),path =path ,mtime =mtime ,checked_at =time .time ())
+
+
+def _ttl (probe :CliProbe ,ttl_seconds :float )->float :
+
+
+    if probe .available :
+        return ttl_seconds 
+    return min (ttl_seconds ,FAILURE_CACHE_TTL_SECONDS )
+
+
+def probe_claude_cli (cache_file :Optional [str ]=None ,ttl_seconds :float =DEFAULT_CACHE_TTL_SECONDS )->CliProbe :
+
+
+    path ,mtime =_locate ()
+    if not path :
+        return CliProbe (available =False ,checked_at =time .time (),error =f"{CLI_COMMAND } not found on PATH")
+
+    key =(path ,mtime )
+    with _cache_lock :
+        probe =_cache .get (key )
+        if probe is None or time .time ()-probe .checked_at >_ttl (probe ,ttl_seconds ):
+            probe =_read_cache_file (cache_file ,path ,mtime ,ttl_seconds )
+            if probe is None :
+                probe =_run_probe (path ,mtime )
+                if probe .available :
+                    _write_cache_file (cache_file ,probe )
+            _cache [key ]=probe 
+    return probe 
+
+
+async def aprobe_claude_cli (cache_file :Optional [str ]=None ,ttl_seconds :float =DEFAULT_CACHE_TTL_SECONDS )->CliProbe :
+
+    import asyncio 
+    return await asyncio .to_thread (probe_claude_cli ,cache_file ,ttl_seconds )
+
+
+def clear_probe_cache ()->None :
+
+    with _cache_lock :
+        _cache .clear ()
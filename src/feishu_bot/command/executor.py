@@ -8,6 +8,8 @@ from typing import Optional
 from dataclasses import dataclass 
 from datetime import datetime 
 
+from .resources import ResourceLimits ,ProcessUsage ,run_with_limits 
+
 logger =logging .getLogger (__name__ )
 
 
@@ -22,21 +24,44 @@ class CommandResult :
     error :str =""
     exec_time_ms :int =0 
     timestamp :datetime =None 
+    cpu_user_ms :int =0 
+    cpu_sys_ms :int =0 
+    peak_rss_kb :int =0 
+    output_bytes :int =0 
+    exit_code :Optional [int ]=None 
+    exit_signal :Optional [int ]=None 
+    timed_out :bool =False 
+    timings :dict =None 
 
     def __post_init__ (self ):
         if self .timestamp is None :
             self .timestamp =datetime .now ()
+        if self .timings is None :
+            self .timings ={}
+
+    def apply_usage (self ,usage :ProcessUsage )->'CommandResult':
+
+        self .cpu_user_ms =usage .cpu_user_ms 
+        self .cpu_sys_ms =usage .cpu_sys_ms 
+        self .peak_rss_kb =usage .peak_rss_kb 
+        self .output_bytes =usage .output_bytes 
+        self .exit_code =usage .exit_code 
+        self .exit_signal =usage .exit_signal 
+        self .timed_out =usage .timed_out 
+        return self 
 
 
 class TmuxCommandExecutor :
 
 
-    def __init__ (self ,session_manager ):
+    def __init__ (self ,session_manager ,limits :Optional [ResourceLimits ]=None ,usage_ledger =None ,validator =None ):
         self .session_manager =session_manager 
         from .parser import CommandParser 
         from .validator import CommandValidator 
         self .parser =CommandParser ()
-        self .validator =CommandValidator ()
+        self .validator =validator or CommandValidator ()
+        self .limits =limits or ResourceLimits ()
+        self .usage_ledger =usage_ledger 
 
     def execute_command (self ,token :str ,command :str ,user_id :str )->CommandResult :
 
@@ -66,6 +91,19 @@ class TmuxCommandExecutor :
             )
 
 
+        if self .usage_ledger is not None :
+            quota_error =self .usage_ledger .check_quota (user_id )
+            if quota_error :
+                return CommandResult (
+                token =token ,
+                command =command ,
+                success =False ,
+                method ="failed",
+                error =f"Usage quota exceeded: {quota_error }",
+                exec_time_ms =self ._calc_exec_time (start_time )
+                )
+
+
         result =self ._execute_in_tmux (session .tmux_session ,command )
         result .token =token 
         result .command =command 
@@ -74,32 +112,36 @@ class TmuxCommandExecutor :
 
         self .session_manager .update_session (token )
 
+        if self .usage_ledger is not None :
+            self .usage_ledger .record (user_id ,result )
+
         logger .info (f"Command executed: token={token }, success={result .success }")
         return result 
 
     def _execute_in_tmux (self ,session_name :str ,command :str )->CommandResult :
 
-        if not self ._tmux_session_exists (session_name ):
+        usage =ProcessUsage ()
+
+        if not self ._tmux_session_exists (session_name ,usage ):
             return CommandResult (
             token ="",
             command =command ,
             success =False ,
             method ="failed",
             error =f"Tmux session '{session_name }' does not exist"
-            )
+            ).apply_usage (usage )
 
         try :
 
-            result =subprocess .run (
+            result =self ._run (
             ["tmux","send-keys","-t",session_name ,command ,"Enter"],
-            capture_output =True ,
-            text =True ,
             timeout =30 
             )
+            usage .add (result .usage )
 
             if result .returncode ==0 :
 
-                output =self ._capture_tmux_output (session_name )
+                output =self ._capture_tmux_output (session_name ,usage =usage )
 
                 return CommandResult (
                 token ="",
@@ -107,9 +149,9 @@ class TmuxCommandExecutor :
                 success =True ,
                 method ="tmux",
                 output =output if output else "命令已发送到 tmux 会话"
-                )
+                ).apply_usage (usage )
             else :
-                return self ._fallback_execution (session_name ,command )
+                return self ._fallback_execution (session_name ,command ,usage )
         except Exception as e :
             return CommandResult (
             token ="",
@@ -117,18 +159,18 @@ class TmuxCommandExecutor :
             success =False ,
             method ="failed",
             error =str (e )
-            )
+            ).apply_usage (usage )
 
-    def _capture_tmux_output (self ,session_name :str ,lines :int =10 )->str :
+    def _capture_tmux_output (self ,session_name :str ,lines :int =10 ,usage :Optional [ProcessUsage ]=None )->str :
 
         try :
 
-            result =subprocess .run (
+            result =self ._run (
             ["tmux","capture-pane","-t",session_name ,"-p","-S",f"-{lines }"],
-            capture_output =True ,
-            text =True ,
             timeout =5 
             )
+            if usage is not None :
+                usage .add (result .usage )
 
             if result .returncode ==0 and result .stdout :
                 output =result .stdout .strip ()
@@ -141,15 +183,16 @@ class TmuxCommandExecutor :
 
         return ""
 
-    def _fallback_execution (self ,session_name :str ,command :str )->CommandResult :
+    def _fallback_execution (self ,session_name :str ,command :str ,usage :Optional [ProcessUsage ]=None )->CommandResult :
+
+        usage =usage or ProcessUsage ()
 
         try :
-            result =subprocess .run (
+            result =self ._run (
             ["tmux","send","-t",session_name ,command ,"C-m"],
-            capture_output =True ,
-            text =True ,
             timeout =30 
             )
+            usage .add (result .usage )
 
             if result .returncode ==0 :
                 return CommandResult (
@@ -158,7 +201,7 @@ class TmuxCommandExecutor :
                 success =True ,
                 method ="fallback",
                 output ="Command sent using alternative method"
-                )
+                ).apply_usage (usage )
         except Exception :
             pass 
 
@@ -168,20 +211,28 @@ class TmuxCommandExecutor :
         success =False ,
         method ="failed",
         error ="All execution methods failed"
-        )
+        ).apply_usage (usage )
 
-    def _tmux_session_exists (self ,session_name :str )->bool :
+    def _tmux_session_exists (self ,session_name :str ,usage :Optional [ProcessUsage ]=None )->bool :
 
         try :
-            result =subprocess .run (
+            result =self ._run (
             ["tmux","has-session","-t",session_name ],
-            capture_output =True ,
             timeout =10 
             )
+            if usage is not None :
+                usage .add (result .usage )
             return result .returncode ==0 
         except Exception :
             return False 
 
+    def _run (self ,args :list ,timeout :int ):
+
+        result =run_with_limits (args ,limits =self .limits ,timeout =timeout )
+        if result .timed_out :
+            raise subprocess .TimeoutExpired (args ,timeout )
+        return result 
+
     def _calc_exec_time (self ,start_time :datetime )->int :
 
         delta =datetime .now ()-start_time 
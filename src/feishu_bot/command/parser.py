@@ -2,26 +2,40 @@
 命令解析器
 """
 
+import re 
 from typing import Optional ,Tuple 
 
+from ..session .token import TOKEN_CHARSET 
+
 
 class CommandParser :
 
 
-    @staticmethod 
-    def parse_remote_command (message :str )->Optional [Tuple [str ,str ]]:
+    def __init__ (self ,token_length :int =8 ,charset :str =TOKEN_CHARSET ):
+        self .token_length =token_length 
+        self .charset =charset 
 
-        if ':'not in message :
-            return None 
 
-        parts =message .split (':',1 )
-        if len (parts )!=2 :
+        self .token_pattern =re .compile (
+        rf'\s*([{re .escape (charset )}]{{{token_length }}})\s*:\s*(\S.*)',
+        re .DOTALL 
+        )
+
+    @classmethod 
+    def for_generator (cls ,generator )->'CommandParser':
+
+        return cls (generator .length ,generator .charset )
+
+    def parse_remote_command (self ,message :str )->Optional [Tuple [str ,str ]]:
+
+        match =self .token_pattern .fullmatch (message )
+        if match is None :
             return None 
 
-        token =parts [0 ].strip ()
-        command =parts [1 ].strip ()
+        token =match .group (1 )
+        command =match .group (2 ).strip ()
 
-        if not token or not command :
+        if not command :
             return None 
 
         return (token ,command )
@@ -0,0 +1,322 @@
+"""
+子进程资源限制与资源统计
+"""
+
+import os 
+import sys 
+import time 
+import signal 
+import logging 
+import selectors 
+import subprocess 
+from dataclasses import dataclass 
+from typing import List ,Optional ,Union 
+
+try :
+    import resource 
+except ImportError :
+
+    resource =None 
+
+logger =logging .getLogger (__name__ )
+
+
+IS_POSIX =os .name =='posix'
+
+
+@dataclass 
+class ResourceLimits :
+
+
+    cpu_seconds :int =0 
+    memory_mb :int =0 
+    max_processes :int =0 
+    max_open_files :int =0 
+    max_file_size_mb :int =0 
+    new_process_group :bool =True 
+
+    @classmethod 
+    def from_config (cls ,execution_config )->'ResourceLimits':
+
+        if execution_config is None :
+            return cls ()
+        return cls (
+        cpu_seconds =execution_config .cpu_seconds ,
+        memory_mb =execution_config .memory_mb ,
+        max_processes =execution_config .max_processes ,
+        max_open_files =execution_config .max_open_files ,
+        max_file_size_mb =execution_config .max_file_size_mb ,
+        new_process_group =execution_config .new_process_group 
+        )
+
+    def rlimits (self )->list :
+
+        if resource is None :
+            return []
+
+        limits =[]
+        if self .cpu_seconds >0 :
+
+            limits .append ((resource .RLIMIT_CPU ,self .cpu_seconds ,self .cpu_seconds +1 ))
+        if self .memory_mb >0 :
+            memory_bytes =self .memory_mb *1024 *1024 
+            limits .append ((resource .RLIMIT_AS ,memory_bytes ,memory_bytes ))
+        if self .max_processes >0 and hasattr (resource ,'RLIMIT_NPROC'):
+            limits .append ((resource .RLIMIT_NPROC ,self .max_processes ,self .max_processes ))
+        if self .max_open_files >0 :
+            limits .append ((resource .RLIMIT_NOFILE ,self .max_open_files ,self .max_open_files ))
+        if self .max_file_size_mb >0 :
+            file_bytes =self .max_file_size_mb *1024 *1024 
+            limits .append ((resource .RLIMIT_FSIZE ,file_bytes ,file_bytes ))
+        return limits 
+
+
+@dataclass 
+class ProcessUsage :
+
+    cpu_user_ms :int =0 
+    cpu_sys_ms :int =0 
+    peak_rss_kb :int =0 
+    output_bytes :int =0 
+    exit_code :Optional [int ]=None 
+    exit_signal :Optional [int ]=None 
+    timed_out :bool =False 
+
+    def add (self ,other :'ProcessUsage')->'ProcessUsage':
+
+
+        self .cpu_user_ms +=other .cpu_user_ms 
+        self .cpu_sys_ms +=other .cpu_sys_ms 
+        self .peak_rss_kb =max (self .peak_rss_kb ,other .peak_rss_kb )
+        self .output_bytes +=other .output_bytes 
+        self .exit_code =other .exit_code 
+        self .exit_signal =other .exit_signal 
+        self .timed_out =self .timed_out or other .timed_out 
+        return self 
+
+
+@dataclass 
+class ProcessRun :
+
+    returncode :Optional [int ]
+    stdout :str 
+    stderr :str 
+    usage :ProcessUsage 
+    spawn_ms :float =0.0 
+    run_ms :float =0.0 
+
+    @property 
+    def timed_out (self )->bool :
+        return self .usage .timed_out 
+
+
+READ_CHUNK =65536 
+
+POLL_INTERVAL =0.1 
+
+
+def _make_preexec (rlimits :list ):
+
+
+    def apply ()->None :
+        for limit ,soft ,hard in rlimits :
+            try :
+                resource .setrlimit (limit ,(soft ,hard ))
+            except (ValueError ,OSError ):
+                pass 
+
+    return apply 
+
+
+def _apply_limits (pid :int ,rlimits :list )->None :
+
+    for limit ,soft ,hard in rlimits :
+        try :
+            resource .prlimit (pid ,limit ,(soft ,hard ))
+        except (ValueError ,OSError )as e :
+            logger .debug (f"Failed to apply rlimit {limit } to {pid }: {e }")
+
+
+def _reap (process :subprocess .Popen ,block :bool ):
+
+    try :
+        pid ,status ,rusage =os .wait4 (process .pid ,0 if block else os .WNOHANG )
+    except ChildProcessError :
+        process .returncode =0 
+        return True ,None 
+    if pid !=process .pid :
+        return False ,None 
+    process .returncode =os .waitstatus_to_exitcode (status )
+    return True ,rusage 
+
+
+def _communicate (process :subprocess .Popen ,timeout :Optional [float ],chunks :dict ):
+
+
+    deadline =None if timeout is None else time .monotonic ()+timeout 
+    exited ,rusage =False ,None 
+
+    with selectors .DefaultSelector ()as selector :
+        for pipe in (process .stdout ,process .stderr ):
+            if not pipe .closed :
+                selector .register (pipe ,selectors .EVENT_READ )
+        while selector .get_map ():
+            if not exited :
+                exited ,rusage =_reap (process ,False )
+            remaining =None if deadline is None else deadline -time .monotonic ()
+            if not exited and remaining is not None and remaining <=0 :
+                raise subprocess .TimeoutExpired (process .args ,timeout )
+
+            if exited :
+                wait =0 
+            elif remaining is None :
+                wait =POLL_INTERVAL 
+            else :
+                wait =min (POLL_INTERVAL ,remaining )
+            ready =selector .select (wait )
+            if exited and not ready :
+                break 
+            for key ,_ in ready :
+                data =os .read (key .fd ,READ_CHUNK )
+                if data :
+                    chunks .setdefault (key .fileobj ,[]).append (data )
+                else :
+                    selector .unregister (key .fileobj )
+                    key .fileobj .close ()
+
+        for key in list (selector .get_map ().values ()):
+            key .fileobj .close ()
+
+    if exited :
+        return rusage 
+
+    while True :
+        exited ,rusage =_reap (process ,deadline is None )
+        if exited :
+            return rusage 
+        if time .monotonic ()>=deadline :
+            raise subprocess .TimeoutExpired (process .args ,timeout )
+        time .sleep (0.005 )
+
+
+def _kill_process_tree (process :subprocess .Popen ,new_group :bool )->None :
+
+    try :
+        if IS_POSIX and new_group :
+            os .killpg (process .pid ,signal .SIGKILL )
+        elif not IS_POSIX :
+            subprocess .run (
+            ['taskkill','/F','/T','/PID',str (process .pid )],
+            capture_output =True ,
+            timeout =10 
+            )
+        else :
+            process .kill ()
+    except (ProcessLookupError ,PermissionError ):
+        pass 
+    except Exception as e :
+        logger .debug (f"Failed to kill process tree {process .pid }: {e }")
+        process .kill ()
+
+
+def _exit_signal (returncode :Optional [int ],shell :bool )->Optional [int ]:
+
+    if returncode is None :
+        return None 
+    if returncode <0 :
+        return -returncode 
+
+    if shell and IS_POSIX and 128 <returncode <128 +65 :
+        return returncode -128 
+    return None 
+
+
+def run_with_limits (
+args :Union [str ,List [str ]],
+limits :Optional [ResourceLimits ]=None ,
+timeout :Optional [float ]=None ,
+cwd :Optional [str ]=None ,
+shell :bool =False ,
+encoding :str ='utf-8',
+env :Optional [dict ]=None 
+)->ProcessRun :
+
+    limits =limits or ResourceLimits ()
+
+    popen_kwargs ={
+    'stdout':subprocess .PIPE ,
+    'stderr':subprocess .PIPE ,
+    'cwd':cwd ,
+    'shell':shell ,
+    'env':env 
+    }
+
+    rusage =None 
+    rlimits =[]
+    if IS_POSIX :
+        popen_kwargs ['start_new_session']=True 
+        rlimits =limits .rlimits ()
+        if rlimits and not hasattr (resource ,'prlimit'):
+            popen_kwargs ['preexec_fn']=_make_preexec (rlimits )
+    elif limits .new_process_group :
+        popen_kwargs ['creationflags']=subprocess .CREATE_NEW_PROCESS_GROUP 
+
+    spawn_started =time .perf_counter ()
+    process =subprocess .Popen (args ,**popen_kwargs )
+    if rlimits and 'preexec_fn'not in popen_kwargs :
+        _apply_limits (process .pid ,rlimits )
+    spawned =time .perf_counter ()
+
+    timed_out =False 
+    try :
+        if IS_POSIX :
+            chunks :dict ={}
+            try :
+                rusage =_communicate (process ,timeout ,chunks )
+            except subprocess .TimeoutExpired :
+                timed_out =True 
+                _kill_process_tree (process ,IS_POSIX or limits .new_process_group )
+                rusage =_communicate (process ,None ,chunks )
+            stdout =b''.join (chunks .get (process .stdout ,()))
+            stderr =b''.join (chunks .get (process .stderr ,()))
+        else :
+            try :
+                stdout ,stderr =process .communicate (timeout =timeout )
+            except subprocess .TimeoutExpired :
+                timed_out =True 
+                _kill_process_tree (process ,IS_POSIX or limits .new_process_group )
+                stdout ,stderr =process .communicate ()
+    except BaseException :
+        _kill_process_tree (process ,IS_POSIX or limits .new_process_group )
+        if process .returncode is None :
+            process .wait ()
+        raise 
+
+    finished =time .perf_counter ()
+    stdout =stdout or b''
+    stderr =stderr or b''
+
+    usage =ProcessUsage (
+    output_bytes =len (stdout )+len (stderr ),
+    exit_code =process .returncode ,
+    exit_signal =_exit_signal (process .returncode ,shell ),
+    timed_out =timed_out 
+    )
+
+    if rusage is not None :
+        usage .cpu_user_ms =int (rusage .ru_utime *1000 )
+        usage .cpu_sys_ms =int (rusage .ru_stime *1000 )
+
+        if sys .platform =='darwin':
+            usage .peak_rss_kb =int (rusage .ru_maxrss /1024 )
+        else :
+            usage .peak_rss_kb =int (rusage .ru_maxrss )
+
+    return ProcessRun (
+    returncode =process .returncode ,
+    stdout =stdout .decode (encoding ,errors ='ignore'),
+    stderr =stderr .decode (encoding ,errors ='ignore'),
+    usage =usage ,
+    spawn_ms =(spawned -spawn_started )*1000 ,
+    run_ms =(finished -spawned )*1000 
+    )
@@ -0,0 +1,195 @@
+"""
+用户资源用量账本
+"""
+
+import time 
+import logging 
+import threading 
+from dataclasses import dataclass ,field ,asdict 
+from datetime import datetime ,timedelta 
+from pathlib import Path 
+from typing import Dict ,List ,Optional 
+
+from ..utils import jsoncodec 
+from ..session .storage import PERSIST_SECONDS 
+
+logger =logging .getLogger (__name__ )
+
+
+@dataclass 
+class UserUsage :
+
+    user_id :str 
+    executions :int =0 
+    failures :int =0 
+    timeouts :int =0 
+    signaled :int =0 
+    cpu_user_ms :int =0 
+    cpu_sys_ms :int =0 
+    wall_ms :int =0 
+    output_bytes :int =0 
+    peak_rss_kb :int =0 
+    window_start :datetime =field (default_factory =datetime .now )
+
+    @property 
+    def cpu_ms (self )->int :
+        return self .cpu_user_ms +self .cpu_sys_ms 
+
+    def to_dict (self )->dict :
+
+        data =asdict (self )
+        data ['window_start']=self .window_start .isoformat ()
+        data ['cpu_ms']=self .cpu_ms 
+        return data 
+
+    @classmethod 
+    def from_dict (cls ,data :dict )->'UserUsage':
+
+        data =dict (data )
+        data .pop ('cpu_ms',None )
+        if isinstance (data .get ('window_start'),str ):
+            data ['window_start']=datetime .fromisoformat (data ['window_start'])
+        return cls (**data )
+
+
+class UsageLedger :
+
+
+    def __init__ (
+    self ,
+    window_hours :int =24 ,
+    max_cpu_seconds :int =0 ,
+    max_executions :int =0 ,
+    max_output_mb :int =0 ,
+    storage_file :str =""
+    ):
+        self .window =timedelta (hours =window_hours )
+        self .max_cpu_seconds =max_cpu_seconds 
+        self .max_executions =max_executions 
+        self .max_output_mb =max_output_mb 
+        self .storage_file =Path (storage_file )if storage_file else None 
+        self .usage :Dict [str ,UserUsage ]={}
+        self .lock =threading .Lock ()
+
+        self ._load ()
+
+    @classmethod 
+    def from_config (cls ,execution_config )->'UsageLedger':
+
+        return cls (
+        window_hours =execution_config .usage_window_hours ,
+        max_cpu_seconds =execution_config .max_cpu_seconds_per_user ,
+        max_executions =execution_config .max_executions_per_user ,
+        max_output_mb =execution_config .max_output_mb_per_user ,
+        storage_file =execution_config .usage_storage_file 
+        )
+
+    def record (self ,user_id :str ,result )->UserUsage :
+
+        with self .lock :
+            usage =self ._current (user_id )
+
+            usage .executions +=1 
+            if not result .success :
+                usage .failures +=1 
+            if result .timed_out :
+                usage .timeouts +=1 
+            if result .exit_signal :
+                usage .signaled +=1 
+            usage .cpu_user_ms +=result .cpu_user_ms 
+            usage .cpu_sys_ms +=result .cpu_sys_ms 
+            usage .wall_ms +=result .exec_time_ms 
+            usage .output_bytes +=result .output_bytes 
+            usage .peak_rss_kb =max (usage .peak_rss_kb ,result .peak_rss_kb )
+
+            self ._save ()
+
+        logger .debug (
+        f"Usage recorded: user={user_id }, cpu={result .cpu_user_ms +result .cpu_sys_ms }ms, "
+        f"rss={result .peak_rss_kb }KB, output={result .output_bytes }B"
+        )
+        return usage 
+
+    def check_quota (self ,user_id :str )->Optional [str ]:
+
+        with self .lock :
+            usage =self ._current (user_id )
+
+            if self .max_executions >0 and usage .executions >=self .max_executions :
+                return f"执行次数已达上限 ({usage .executions }/{self .max_executions })"
+
+            if self .max_cpu_seconds >0 and usage .cpu_ms >=self .max_cpu_seconds *1000 :
+                return f"CPU 时间已达上限 ({usage .cpu_ms //1000 }s/{self .max_cpu_seconds }s)"
+
+            max_output_bytes =self .max_output_mb *1024 *1024 
+            if max_output_bytes >0 and usage .output_bytes >=max_output_bytes :
+                return f"输出量已达上限 ({usage .output_bytes //1024 }KB/{self .max_output_mb }MB)"
+
+            return None 
+
+    def get_usage (self ,user_id :str )->Optional [UserUsage ]:
+
+        with self .lock :
+            usage =self .usage .get (user_id )
+            if usage is None or self ._window_expired (usage ):
+                return None 
+            return usage 
+
+    def top_users (self ,limit :int =10 ,key :str ='cpu_ms')->List [UserUsage ]:
+
+        with self .lock :
+            active =[u for u in self .usage .values ()if not self ._window_expired (u )]
+        active .sort (key =lambda u :getattr (u ,key ),reverse =True )
+        return active [:limit ]
+
+    def snapshot (self )->dict :
+
+        return {
+        'window_hours':self .window .total_seconds ()/3600 ,
+        'users':[u .to_dict ()for u in self .top_users (limit =len (self .usage ))]
+        }
+
+    def _current (self ,user_id :str )->UserUsage :
+
+
+        usage =self .usage .get (user_id )
+        if usage is None or self ._window_expired (usage ):
+            usage =UserUsage (user_id =user_id )
+            self .usage [user_id ]=usage 
+        return usage 
+
+    def _window_expired (self ,usage :UserUsage )->bool :
+
+        return datetime .now ()-usage .window_start >=self .window 
+
+    def _load (self )->None :
+
+        if self .storage_file is None or not self .storage_file .exists ():
+            return 
+
+        started =time .perf_counter ()
+        try :
+            data =jsoncodec .loads (self .storage_file .read_bytes ())
+            for user_id ,usage_data in data .get ('users',{}).items ():
+                self .usage [user_id ]=UserUsage .from_dict (usage_data )
+            PERSIST_SECONDS .labels ('usage','load').observe (time .perf_counter ()-started )
+            logger .info (f"Loaded usage ledger for {len (self .usage )} users")
+        except Exception as e :
+            logger .error (f"Failed to load usage ledger from {self .storage_file }: {e }")
+
+    def _save (self )->None :
+
+        if self .storage_file is None :
+            return 
+
+        started =time .perf_counter ()
+        try :
+            self .storage_file .parent .mkdir (parents =True ,exist_ok =True )
+            data ={
+            'users':{user_id :u .to_dict ()for user_id ,u in self .usage .items ()},
+            'updated_at':datetime .now ().isoformat ()
+            }
+            self .storage_file .write_bytes (jsoncodec .dumpb (data ))
+            PERSIST_SECONDS .labels ('usage','save').observe (time .perf_counter ()-started )
+        except Exception as e :
+            logger .error (f"Failed to save usage ledger: {e }")
@@ -2,11 +2,169 @@
 命令验证器
 """
 
+import re 
 import logging 
+from functools import lru_cache 
+from typing import Dict ,Iterable ,List ,Match ,Optional ,Pattern ,Tuple 
 
 logger =logging .getLogger (__name__ )
 
 
+REGEX_PREFIX ="re:"
+
+_STRIP_CHARS =str .maketrans ('','','\'"`\\')
+_WHITESPACE =re .compile (r'\s+')
+_ARG_BOUNDARY =' ;&|)'
+
+KIND_ALLOW ="allow"
+KIND_DENY ="deny"
+
+
+def normalize_command (command :str )->str :
+
+
+    text =command .translate (_STRIP_CHARS )
+    return _WHITESPACE .sub (' ',text ).strip ().lower ()
+
+
+def _literal_key (literal :str )->str :
+
+    return literal .replace (' ','')
+
+
+def _embeddable (body :str )->bool :
+
+    try :
+        re .compile (f"(?:{body })")
+    except re .error :
+        return False 
+    return True 
+
+
+def _trie_pattern (node :dict )->str :
+
+    is_end =''in node 
+    branches =[]
+    for char in sorted (k for k in node if k ):
+
+        head =' ?'if char ==' 'else re .escape (char )
+        branches .append (head +_trie_pattern (node [char ]))
+
+    if not branches :
+        return ''
+    if len (branches )==1 and not is_end :
+        return branches [0 ]
+
+    pattern ='(?:'+'|'.join (branches )+')'
+    return pattern +'?'if is_end else pattern 
+
+
+class CompiledRules :
+
+    def __init__ (self ,deny_rules :Tuple [str ,...],allow_rules :Tuple [str ,...],strict :bool =False ):
+        self .literals :Dict [str ,str ]={}
+        self .regex_rules :Dict [str ,str ]={}
+        self .deny :List [Tuple [Pattern ,Optional [str ]]]=[]
+        self .allow :List [Pattern ]=[]
+
+        for kind ,rules in ((KIND_DENY ,deny_rules ),(KIND_ALLOW ,allow_rules )):
+            trie :dict ={}
+            combined =[]
+
+            for rule in rules :
+                if not rule or not str (rule ).strip ():
+                    continue 
+                rule =str (rule )
+
+                if rule .startswith (REGEX_PREFIX ):
+                    body =rule [len (REGEX_PREFIX ):]
+                    try :
+                        compiled =re .compile (body ,re .IGNORECASE )
+                    except re .error as e :
+                        if strict :
+                            raise 
+                        logger .warning (f"Skipping invalid {kind } rule {rule }: {e }")
+                        continue 
+
+
+                    if compiled .groups or not _embeddable (body ):
+                        if kind ==KIND_DENY :
+                            self .deny .append ((compiled ,rule ))
+                        else :
+                            self .allow .append (compiled )
+                        continue 
+
+                    group =f"_rule_{len (self .regex_rules )}"
+                    self .regex_rules [group ]=rule 
+                    combined .append (f"(?P<{group }>{body })")
+                    continue 
+
+                literal =normalize_command (rule )
+                if kind ==KIND_DENY :
+                    self .literals [_literal_key (literal )]=rule 
+
+                node =trie 
+                for char in literal :
+                    node =node .setdefault (char ,{})
+                node ['']={}
+
+            parts =[]
+            if trie :
+                parts .append (f"(?P<_literal>{_trie_pattern (trie )})")
+            if kind ==KIND_DENY :
+                if parts :
+                    self .deny .insert (0 ,(re .compile (parts [0 ],re .IGNORECASE ),None ))
+                if combined :
+                    self .deny .insert (1 if parts else 0 ,(re .compile ('|'.join (combined ),re .IGNORECASE ),None ))
+            else :
+                parts .extend (combined )
+                if parts :
+                    self .allow .insert (0 ,re .compile ('|'.join (parts ),re .IGNORECASE ))
+
+    def _rule_name (self ,match :Match ,rule :Optional [str ])->str :
+
+        if rule is not None :
+            return rule 
+        if match .lastgroup =='_literal':
+            return self .literals .get (_literal_key (match .group ()),match .group ())
+        return self .regex_rules [match .lastgroup ]
+
+    def _allowed_spans (self ,normalized :str )->List [Tuple [int ,int ]]:
+
+
+        return [
+        match .span ()
+        for pattern in self .allow 
+        for match in pattern .finditer (normalized )
+        if match .end ()==len (normalized )or normalized [match .end ()]in _ARG_BOUNDARY 
+        ]
+
+    def first_violation (self ,normalized :str )->Optional [str ]:
+
+        spans =None 
+        for pattern ,rule in self .deny :
+            pos =0 
+            while True :
+                match =pattern .search (normalized ,pos )
+                if match is None :
+                    break 
+
+
+                if spans is None :
+                    spans =self ._allowed_spans (normalized )
+                start ,end =match .span ()
+                if not any (a <=start and end <=b for a ,b in spans ):
+                    return self ._rule_name (match ,rule )
+                pos =start +1 
+        return None 
+
+
+@lru_cache (maxsize =32 )
+def compile_rules (deny_rules :Tuple [str ,...],allow_rules :Tuple [str ,...]=(),strict :bool =False )->CompiledRules :
+
+    return CompiledRules (deny_rules ,allow_rules ,strict )
+
+
 class CommandValidator :
 
 
@@ -17,23 +175,75 @@ class CommandValidator :
     "dd if=/dev/zero",
     "> /dev/sda",
     "fork bomb",
-    ":(){ :|:& };:"
+    ":(){ :|:& };:",
+    r"re::\s*\(\s*\)\s*\{.*:\s*\|\s*:.*&.*\}",
+    r"re:\brm (?:-\S+ )*-(?:[a-z]*r[a-z]*|-recursive) (?:\S+ )*(?:/|/\*|~|~/)(?=$|[ ;&|)])"
     ]
 
-    def validate_command (self ,command :str )->bool :
+    def __init__ (
+    self ,
+    dangerous_commands :Optional [Iterable [str ]]=None ,
+    allowed_commands :Optional [Iterable [str ]]=None ,
+    max_command_length :int =1000 ,
+    policy =None ,
+    user_mapping_service =None 
+    ):
+        deny =list (self .DANGEROUS_COMMANDS )
+        for rule in dangerous_commands or []:
+            if rule not in deny :
+                deny .append (rule )
+
+        self .max_command_length =max_command_length 
+        self .rules =compile_rules (tuple (deny ),tuple (allowed_commands or ()))
+        self .policy_engine =policy 
+        self .user_mapping_service =user_mapping_service 
+
+    @property 
+    def policy (self ):
+
+
+        if self .user_mapping_service is not None :
+            return self .user_mapping_service .policy 
+        return self .policy_engine 
+
+    @classmethod 
+    def from_config (cls ,security_config ,policy =None ,user_mapping_service =None )->'CommandValidator':
+
+        return cls (
+        dangerous_commands =security_config .dangerous_commands ,
+        allowed_commands =security_config .allowed_commands ,
+        max_command_length =security_config .max_command_length ,
+        policy =policy ,
+        user_mapping_service =user_mapping_service 
+        )
+
+    def check_command (self ,command :str )->Optional [str ]:
 
         if not command or not command .strip ():
-            return False 
+            return "empty command"
 
-        command_lower =command .lower ()
-        for dangerous in self .DANGEROUS_COMMANDS :
-            if dangerous in command_lower :
-                logger .warning (f"Blocked dangerous command: {command }")
-                return False 
+        if self .max_command_length >0 and len (command )>self .max_command_length :
+            return f"command too long ({len (command )} > {self .max_command_length })"
+
+        rule =self .rules .first_violation (normalize_command (command ))
+        if rule is not None :
+            return f"matched dangerous rule '{rule }'"
+
+        return None 
+
+    def validate_command (self ,command :str )->bool :
+
+        reason =self .check_command (command )
+        if reason is not None :
+            logger .warning (f"Blocked command ({reason }): {command }")
+            return False 
 
         return True 
 
     def validate_user (self ,user_id :str )->bool :
 
+        if self .policy is None :
+            return True 
 
-        return True 
+        from ..security .policy import ACTION_COMMAND 
+        return self .policy .authorize_user (user_id ,ACTION_COMMAND ).allowed 
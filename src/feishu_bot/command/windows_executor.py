@@ -12,28 +12,12 @@ import json
 import logging 
 import subprocess 
 from typing import Optional 
-from dataclasses import dataclass 
 from datetime import datetime 
 from pathlib import Path 
 
-logger =logging .getLogger (__name__ )
-
-
-@dataclass 
-class CommandResult :
+from .executor import CommandResult 
 
-    token :str 
-    command :str 
-    success :bool 
-    method :str 
-    output :str =""
-    error :str =""
-    exec_time_ms :int =0 
-    timestamp :datetime =None 
-
-    def __post_init__ (self ):
-        if self .timestamp is None :
-            self .timestamp =datetime .now ()
+logger =logging .getLogger (__name__ )
 
 
 class WindowsClaudeCodeExecutor :
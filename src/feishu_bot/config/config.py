@@ -19,6 +19,14 @@ class FeishuConfig :
 
     app_id :str 
     app_secret :str 
+    base_url :str ="https://open.feishu.cn"
+    http2 :bool =True 
+    max_connections :int =100 
+    max_keepalive_connections :int =20 
+    keepalive_expiry :float =30.0 
+    timeout_seconds :float =10.0 
+    connect_timeout_seconds :float =5.0 
+    token_refresh_margin_seconds :float =300 
 
 
 @dataclass 
@@ -43,6 +51,15 @@ class LoggingConfig :
     level :str ="INFO"
     file :str ="data/logs/app.log"
     format :str ="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    json :bool =False 
+    console :bool =True 
+    rotation :str ="size"
+    max_bytes :int =10485760 
+    backup_count :int =5 
+    when :str ="midnight"
+    queue_size :int =10000 
+    levels :dict =None 
+    sampling :dict =None 
 
 
 @dataclass 
@@ -60,6 +77,121 @@ class SecurityConfig :
     whitelist_file :str ="configs/security/whitelist.yaml"
     max_command_length :int =1000 
     dangerous_commands :list =None 
+    allowed_commands :list =None 
+
+
+@dataclass 
+class ExecutionConfig :
+
+
+    cpu_seconds :int =0 
+    memory_mb :int =0 
+    max_processes :int =0 
+    max_open_files :int =0 
+    max_file_size_mb :int =0 
+    new_process_group :bool =True 
+
+
+    usage_window_hours :int =24 
+    max_cpu_seconds_per_user :int =0 
+    max_executions_per_user :int =0 
+    max_output_mb_per_user :int =0 
+    usage_storage_file :str ="data/usage.json"
+
+
+    cli_probe_cache_file :str ="data/claude_cli.json"
+    cli_probe_ttl_seconds :int =86400 
+
+
+@dataclass 
+class OutboundConfig :
+
+
+    app_rate :float =45 
+    app_burst :float =5 
+    user_rate :float =4.5 
+    user_burst :float =1 
+    workers :int =8 
+    max_retries :int =5 
+    base_backoff_seconds :float =0.5 
+    max_backoff_seconds :float =30 
+    queue_size :int =10000 
+    lane_weights :dict =None 
+
+
+@dataclass 
+class OutboxConfig :
+
+    enabled :bool =True 
+    storage_file :str ="data/outbox.jsonl"
+    retry_seconds :float =5 
+    max_retry_seconds :float =300 
+    max_age_hours :float =24 
+    max_in_flight :int =32 
+    compact_threshold :int =1000 
+    fsync :bool =True 
+
+
+@dataclass 
+class CoalescingConfig :
+
+    enabled :bool =True 
+    window_seconds :float =5 
+    max_batch :int =20 
+
+
+@dataclass 
+class EventsConfig :
+
+
+    max_concurrency :int =8 
+    queue_size :int =1000 
+    drain_timeout_seconds :float =30 
+    dedup_enabled :bool =True 
+    dedup_max_entries :int =10000 
+    dedup_ttl_seconds :float =28800 
+    dedup_shared :bool =False 
+    mode :str ="webhook"
+    reconnect_base_seconds :float =1 
+    reconnect_max_seconds :float =60 
+
+
+@dataclass 
+class TracingConfig :
+
+
+    enabled :bool =False 
+    exporter :str ="file"
+    file :str ="data/logs/traces.jsonl"
+    endpoint :str ="http://127.0.0.1:4318"
+    timeout_seconds :float =5 
+    service_name :str ="feishu-bot"
+    sample_rate :float =1.0 
+    queue_size :int =4096 
+    batch_size :int =256 
+    flush_interval_seconds :float =2 
+
+
+@dataclass 
+class WatchdogConfig :
+
+
+    enabled :bool =True 
+    interval_ms :float =100 
+    threshold_ms :float =500 
+    stack_limit :int =30 
+
+
+@dataclass 
+class DebugConfig :
+
+
+    enabled :bool =False 
+    allow_local :bool =True 
+    token :str =""
+    profile_max_seconds :float =60 
+    profile_interval_ms :float =10 
+    tracemalloc_frames :int =10 
 
 
 class Config :
@@ -72,6 +204,14 @@ class Config :
         self .logging :LoggingConfig =LoggingConfig ()
         self .cards :CardsConfig =CardsConfig ()
         self .security :SecurityConfig =SecurityConfig ()
+        self .execution :ExecutionConfig =ExecutionConfig ()
+        self .outbound :OutboundConfig =OutboundConfig ()
+        self .outbox :OutboxConfig =OutboxConfig ()
+        self .coalescing :CoalescingConfig =CoalescingConfig ()
+        self .events :EventsConfig =EventsConfig ()
+        self .tracing :TracingConfig =TracingConfig ()
+        self .watchdog :WatchdogConfig =WatchdogConfig ()
+        self .debug :DebugConfig =DebugConfig ()
 
     @classmethod 
     def load_from_file (cls ,config_path :str ="configs/config.yaml")->'Config':
@@ -85,9 +225,11 @@ class Config :
 
 
             if 'feishu'in data :
+                feishu_data =dict (data ['feishu'])
                 config .feishu =FeishuConfig (
-                app_id =cls ._resolve_env (data ['feishu'].get ('app_id','')),
-                app_secret =cls ._resolve_env (data ['feishu'].get ('app_secret',''))
+                app_id =cls ._resolve_env (feishu_data .pop ('app_id','')),
+                app_secret =cls ._resolve_env (feishu_data .pop ('app_secret','')),
+                **feishu_data 
                 )
 
             if 'webhook'in data :
@@ -105,6 +247,35 @@ class Config :
             if 'security'in data :
                 config .security =SecurityConfig (**data ['security'])
 
+            if 'execution'in data :
+                config .execution =ExecutionConfig (**data ['execution'])
+
+            if 'outbound'in data :
+                config .outbound =OutboundConfig (**data ['outbound'])
+
+            if 'outbox'in data :
+                config .outbox =OutboxConfig (**data ['outbox'])
+
+            if 'coalescing'in data :
+                config .coalescing =CoalescingConfig (**data ['coalescing'])
+
+            if 'events'in data :
+                config .events =EventsConfig (**data ['events'])
+
+            if 'tracing'in data :
+                config .tracing =TracingConfig (**data ['tracing'])
+
+            if 'watchdog'in data :
+                config .watchdog =WatchdogConfig (**data ['watchdog'])
+
+            if 'debug'in data :
+                debug_data =dict (data ['debug'])
+                token =cls ._resolve_env (debug_data .pop ('token',''))
+                config .debug =DebugConfig (
+                token =""if token .startswith ('${')else token ,
+                **debug_data 
+                )
+
 
         config ._load_from_env ()
 
@@ -116,13 +287,25 @@ class Config :
         app_id =os .getenv ('FEISHU_APP_ID')
         app_secret =os .getenv ('FEISHU_APP_SECRET')
         if app_id and app_secret :
-            self .feishu =FeishuConfig (app_id =app_id ,app_secret =app_secret )
+
+            if self .feishu is not None :
+                self .feishu .app_id =app_id 
+                self .feishu .app_secret =app_secret 
+            else :
+                self .feishu =FeishuConfig (app_id =app_id ,app_secret =app_secret )
+
+        if os .getenv ('FEISHU_BASE_URL')and self .feishu is not None :
+            self .feishu .base_url =os .getenv ('FEISHU_BASE_URL')
 
 
         if os .getenv ('WEBHOOK_PORT'):
             self .webhook .port =int (os .getenv ('WEBHOOK_PORT'))
 
 
+        if os .getenv ('FEISHU_EVENT_MODE'):
+            self .events .mode =os .getenv ('FEISHU_EVENT_MODE')
+
+
         if os .getenv ('SESSION_STORAGE_FILE'):
             self .session .storage_file =os .getenv ('SESSION_STORAGE_FILE')
 
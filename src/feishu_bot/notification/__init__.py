@@ -2,18 +2,33 @@
 Notification 通知模块
 """
 
-from .types import WebhookRequest ,WebhookResponse ,TaskNotification 
-from .types import TYPE_COMPLETED ,TYPE_WAITING ,TYPE_ERROR 
-from .sender import NotificationSender 
-from .webhook import WebhookHandler 
+from ..utils .lazy import lazy_exports 
 
-__all__ =[
-'WebhookRequest',
-'WebhookResponse',
-'TaskNotification',
-'TYPE_COMPLETED',
-'TYPE_WAITING',
-'TYPE_ERROR',
-'NotificationSender',
-'WebhookHandler',
-]
\ No newline at end of file
+_EXPORTS ={
+'WebhookRequest':'.types',
+'WebhookResponse':'.types',
+'TaskNotification':'.types',
+'TYPE_COMPLETED':'.constants',
+'TYPE_WAITING':'.constants',
+'TYPE_ERROR':'.constants',
+'NotificationSender':'.sender',
+'WebhookHandler':'.webhook',
+'NotificationOutbox':'.outbox',
+'OutboxEntry':'.outbox',
+'NotificationCoalescer':'.coalescer',
+'CardRenderer':'.cards',
+'CardTemplate':'.cards',
+'compile_template':'.cards',
+'parse_card_action':'.cards',
+'CARD_TASK_COMPLETED':'.cards',
+'CARD_TASK_WAITING':'.cards',
+'CARD_COMMAND_RESULT':'.cards',
+'CARD_ACTION_CONTINUE':'.cards',
+'CARD_ACTION_GIT_STATUS':'.cards',
+'CARD_ACTION_VIEW_MORE':'.cards',
+'CARD_ACTION_COMMANDS':'.cards'
+}
+
+__all__ =list (_EXPORTS )
+
+__getattr__ ,__dir__ =lazy_exports (__name__ ,_EXPORTS )
@@ -0,0 +1,152 @@
+"""
+卡片渲染 - 使用飞书卡片模板 ID 和模板变量发送通知
+"""
+
+import logging 
+from functools import lru_cache 
+from typing import Any ,Dict ,Optional ,Tuple 
+
+from ..utils import jsoncodec 
+
+logger =logging .getLogger (__name__ )
+
+
+CARD_TASK_COMPLETED ="task_completed"
+CARD_TASK_WAITING ="task_waiting"
+CARD_COMMAND_RESULT ="command_result"
+
+
+CARD_ACTION_CONTINUE ="continue"
+CARD_ACTION_GIT_STATUS ="git_status"
+CARD_ACTION_VIEW_MORE ="view_more"
+
+CARD_ACTION_COMMANDS ={
+CARD_ACTION_CONTINUE :"continue",
+CARD_ACTION_GIT_STATUS :"git status",
+}
+
+
+
+CARD_SCHEMAS :Dict [str ,Tuple [Tuple [str ,str ,Any ,int ],...]]={
+CARD_TASK_COMPLETED :(
+('token','token','',0 ),
+('project_name','project_name','Unknown',100 ),
+('description','description','Task completed',500 ),
+('working_dir','working_dir','N/A',200 ),
+('task_output','task_output','',1000 ),
+),
+CARD_TASK_WAITING :(
+('token','token','',0 ),
+('project_name','project_name','Unknown',100 ),
+('description','description','Waiting for input',500 ),
+('working_dir','working_dir','N/A',200 ),
+),
+CARD_COMMAND_RESULT :(
+('token','token','N/A',0 ),
+('command','command','N/A',200 ),
+('status','status','',0 ),
+('method','method','N/A',0 ),
+('output','output','',1000 ),
+('error','error','',500 ),
+('exec_time_ms','exec_time_ms',0 ,0 ),
+),
+}
+
+TRUNCATED_SUFFIX ="\n... (输出过长, 已截断)"
+VIEW_MORE_SUFFIX ="\n... (输出过长，点击「查看更多」获取完整内容)"
+
+
+VIEW_MORE_KINDS =frozenset ({CARD_COMMAND_RESULT })
+
+
+class CardTemplate :
+
+
+    __slots__ =('kind','template_id','fields','suffix')
+
+    def __init__ (self ,kind :str ,template_id :str ,fields :Tuple [Tuple [str ,str ,Any ,int ],...]):
+        self .kind =kind 
+        self .template_id =template_id 
+        self .fields =fields 
+        self .suffix =VIEW_MORE_SUFFIX if kind in VIEW_MORE_KINDS else TRUNCATED_SUFFIX 
+
+    def variables (self ,data :dict )->Dict [str ,Any ]:
+
+        variables ={}
+        for name ,key ,default ,max_length in self .fields :
+            value =data .get (key )
+            if value is None or value =='':
+                value =default 
+            if max_length and isinstance (value ,str )and len (value )>max_length :
+                value =value [:max_length ]+self .suffix 
+            variables [name ]=value 
+        return variables 
+
+    def render (self ,data :dict )->str :
+
+        return jsoncodec .dumps ({
+        'type':'template',
+        'data':{
+        'template_id':self .template_id ,
+        'template_variable':self .variables (data )
+        }
+        })
+
+
+@lru_cache (maxsize =32 )
+def compile_template (kind :str ,template_id :str )->CardTemplate :
+
+    if kind not in CARD_SCHEMAS :
+        raise ValueError (f"Unknown card kind: {kind }")
+    return CardTemplate (kind ,template_id ,CARD_SCHEMAS [kind ])
+
+
+class CardRenderer :
+
+
+    def __init__ (self ,template_ids :Optional [Dict [str ,str ]]=None ):
+        self .templates :Dict [str ,CardTemplate ]={
+        kind :compile_template (kind ,template_id )
+        for kind ,template_id in (template_ids or {}).items ()
+        if template_id 
+        }
+
+    @classmethod 
+    def from_config (cls ,cards_config )->'CardRenderer':
+
+        return cls ({
+        CARD_TASK_COMPLETED :cards_config .task_completed_card_id ,
+        CARD_TASK_WAITING :cards_config .task_waiting_card_id ,
+        CARD_COMMAND_RESULT :cards_config .command_result_card_id ,
+        })
+
+    def has (self ,kind :str )->bool :
+
+        return kind in self .templates 
+
+    def render (self ,kind :str ,data :dict )->Optional [str ]:
+
+        template =self .templates .get (kind )
+        if template is None :
+            return None 
+        try :
+            return template .render (data )
+        except Exception as e :
+            logger .error (f"Failed to render {kind } card: {e }")
+            return None 
+
+
+def parse_card_action (event :dict )->Tuple [str ,str ,str ]:
+
+
+    operator =event .get ('operator')or {}
+    open_id =operator .get ('open_id','')
+
+    value =(event .get ('action')or {}).get ('value')or {}
+    if isinstance (value ,str ):
+        try :
+            value =jsoncodec .loads (value )
+        except ValueError :
+            value ={}
+
+    return open_id ,value .get ('action',''),value .get ('token','')
@@ -0,0 +1,148 @@
+"""
+通知合并 - 同一用户短时间内的完成/错误通知合并为一条摘要
+"""
+
+import asyncio 
+import logging 
+from typing import Awaitable ,Callable ,Dict ,List ,Optional 
+
+from .outbox import OutboxEntry ,release_slot 
+from .constants import TYPE_WAITING ,TYPE_ERROR 
+from ..utils import jsoncodec 
+
+logger =logging .getLogger (__name__ )
+
+
+class _Batch :
+
+
+    __slots__ =('entries','futures','timer')
+
+    def __init__ (self ):
+        self .entries :List [OutboxEntry ]=[]
+        self .futures :List [asyncio .Future ]=[]
+        self .timer :Optional [asyncio .TimerHandle ]=None 
+
+
+class NotificationCoalescer :
+
+
+    def __init__ (
+    self ,
+    deliver :Callable [[OutboxEntry ],Awaitable [bool ]],
+    window_seconds :float =5 ,
+    max_batch :int =20 
+    ):
+        self .deliver_entry =deliver 
+        self .window_seconds =window_seconds 
+        self .max_batch =max (1 ,max_batch )
+        self ._batches :Dict [str ,_Batch ]={}
+
+        self .received =0 
+        self .sent =0 
+        self .digests =0 
+
+    @classmethod 
+    def from_config (cls ,coalescing_config ,deliver :Callable [[OutboxEntry ],Awaitable [bool ]])->'NotificationCoalescer':
+
+        return cls (
+        deliver ,
+        window_seconds =coalescing_config .window_seconds ,
+        max_batch =coalescing_config .max_batch 
+        )
+
+    async def deliver (self ,entry :OutboxEntry )->bool :
+
+
+        self .received +=1 
+        if entry .kind ==TYPE_WAITING or self .window_seconds <=0 :
+            self .sent +=1 
+            return await self .deliver_entry (entry )
+
+        batch =self ._batches .get (entry .open_id )
+        if batch is None :
+            batch =_Batch ()
+            self ._batches [entry .open_id ]=batch 
+            batch .timer =asyncio .get_running_loop ().call_later (
+            self .window_seconds ,self ._flush_soon ,entry .open_id 
+            )
+
+        future =asyncio .get_running_loop ().create_future ()
+        batch .entries .append (entry )
+        batch .futures .append (future )
+
+        if len (batch .entries )>=self .max_batch :
+            self ._flush_soon (entry .open_id )
+
+        release_slot ()
+        return await asyncio .shield (future )
+
+    def _flush_soon (self ,open_id :str )->None :
+
+        batch =self ._batches .pop (open_id ,None )
+        if batch is None :
+            return 
+        if batch .timer is not None :
+            batch .timer .cancel ()
+        asyncio .ensure_future (self ._flush (batch ))
+
+    async def _flush (self ,batch :_Batch )->None :
+
+        if len (batch .entries )==1 :
+            entry =batch .entries [0 ]
+        else :
+            entry =self ._digest_entry (batch .entries )
+            self .digests +=1 
+            logger .info (f"Coalesced {len (batch .entries )} notifications for {entry .open_id } into one digest")
+
+        self .sent +=1 
+        try :
+            ok =await self .deliver_entry (entry )
+        except Exception as e :
+            logger .error (f"Failed to deliver coalesced notification: {e }")
+            ok =False 
+
+        for future in batch .futures :
+            if not future .done ():
+                future .set_result (ok )
+
+    def _digest_entry (self ,entries :List [OutboxEntry ])->OutboxEntry :
+
+        first =entries [0 ]
+        return OutboxEntry (
+        id =f"digest-{first .id }",
+        open_id =first .open_id ,
+        msg_type ="text",
+        content =jsoncodec .dumps ({"text":self .render_digest (entries )}),
+        kind =first .kind ,
+        meta ={'tokens':[e .meta .get ('token','')for e in entries ]}
+        )
+
+    @staticmethod 
+    def render_digest (entries :List [OutboxEntry ])->str :
+
+        lines =[f"📦 {len (entries )} 个任务有新进展\n"]
+        for entry in entries :
+            icon ="❌"if entry .kind ==TYPE_ERROR else "✅"
+            token =entry .meta .get ('token','N/A')
+            project =entry .meta .get ('project_name')or 'Unknown'
+            description =entry .meta .get ('description','')
+            line =f"{icon } {token } · {project }"
+            if description :
+                line +=f" - {description [:60 ]}"
+            lines .append (line )
+
+        lines .append ("")
+        lines .append ("使用方法: 发送 \"<令牌>: <你的命令>\" 继续对应任务")
+        lines .append ("令牌有效期: 24小时")
+        return '\n'.join (lines )
+
+    def stats (self )->dict :
+
+        return {
+        'received':self .received ,
+        'sent':self .sent ,
+        'digests':self .digests ,
+        'saved_calls':self .received -self .sent ,
+        'open_batches':len (self ._batches )
+        }
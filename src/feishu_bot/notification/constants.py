@@ -0,0 +1,7 @@
+"""
+Notification 通知类型常量 (不依赖 pydantic, 供发送端直接导入)
+"""
+
+TYPE_COMPLETED ="completed"
+TYPE_WAITING ="waiting"
+TYPE_ERROR ="error"
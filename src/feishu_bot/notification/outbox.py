@@ -0,0 +1,318 @@
+"""
+通知发件箱 - 落盘后异步投递, 至少一次语义, 重启后继续投递
+"""
+
+import os 
+import time 
+import uuid 
+import asyncio 
+import logging 
+import threading 
+import contextvars 
+from pathlib import Path 
+from dataclasses import dataclass ,field ,asdict 
+from typing import Awaitable ,Callable ,Dict ,Optional ,Set 
+
+from ..utils import jsoncodec 
+
+logger =logging .getLogger (__name__ )
+
+
+OP_PUT ="put"
+OP_ACK ="ack"
+OP_DROP ="drop"
+
+
+_SLOT :contextvars .ContextVar =contextvars .ContextVar ('outbox_slot',default =None )
+
+
+def release_slot ()->None :
+
+
+    slot =_SLOT .get ()
+    if slot is not None :
+        slot .release ()
+
+
+class _Slot :
+
+
+    __slots__ =('semaphore','held')
+
+    def __init__ (self ,semaphore :asyncio .Semaphore ):
+        self .semaphore =semaphore 
+        self .held =True 
+
+    def release (self )->None :
+
+        if self .held :
+            self .held =False 
+            self .semaphore .release ()
+
+
+@dataclass 
+class OutboxEntry :
+
+    id :str 
+    open_id :str 
+    msg_type :str 
+    content :str 
+    kind :str =""
+    meta :dict =field (default_factory =dict )
+    created_at :float =field (default_factory =time .time )
+    attempts :int =0 
+
+    def to_record (self )->dict :
+
+        record =asdict (self )
+        record .pop ('attempts')
+        record ['op']=OP_PUT 
+        return record 
+
+    @classmethod 
+    def from_record (cls ,record :dict )->'OutboxEntry':
+
+        return cls (
+        id =record ['id'],
+        open_id =record ['open_id'],
+        msg_type =record ['msg_type'],
+        content =record ['content'],
+        kind =record .get ('kind',''),
+        meta =record .get ('meta')or {},
+        created_at =record .get ('created_at',time .time ())
+        )
+
+
+class OutboxJournal :
+
+
+    def __init__ (self ,file_path :str ,fsync :bool =True ):
+        self .file_path =Path (file_path )
+        self .file_path .parent .mkdir (parents =True ,exist_ok =True )
+        self .fsync =fsync 
+        self .lock =threading .Lock ()
+
+    def load (self )->Dict [str ,OutboxEntry ]:
+
+        entries :Dict [str ,OutboxEntry ]={}
+        if not self .file_path .exists ():
+            return entries 
+
+        with open (self .file_path ,'rb')as f :
+            for line_no ,line in enumerate (f ,1 ):
+                line =line .strip ()
+                if not line :
+                    continue 
+                try :
+                    record =jsoncodec .loads (line )
+                except ValueError :
+
+                    logger .warning (f"Skipping corrupt outbox record at {self .file_path }:{line_no }")
+                    continue 
+
+                if record .get ('op')==OP_PUT :
+                    entries [record ['id']]=OutboxEntry .from_record (record )
+                else :
+                    entries .pop (record .get ('id'),None )
+        return entries 
+
+    def append (self ,record :dict ,sync :bool =False )->None :
+
+        line =jsoncodec .dumpb (record )+b'\n'
+        with self .lock :
+            with open (self .file_path ,'ab')as f :
+                f .write (line )
+                f .flush ()
+                if sync and self .fsync :
+                    os .fsync (f .fileno ())
+
+    def compact (self ,entries :Dict [str ,OutboxEntry ])->None :
+
+
+        tmp_path =self .file_path .with_suffix (self .file_path .suffix +'.tmp')
+        with self .lock :
+            snapshot =list (entries .values ())
+            with open (tmp_path ,'wb')as f :
+                for entry in snapshot :
+                    f .write (jsoncodec .dumpb (entry .to_record ())+b'\n')
+                f .flush ()
+                if self .fsync :
+                    os .fsync (f .fileno ())
+            os .replace (tmp_path ,self .file_path )
+
+
+class NotificationOutbox :
+
+
+    def __init__ (
+    self ,
+    storage_file :str ,
+    deliver :Callable [[OutboxEntry ],Awaitable [bool ]],
+    retry_seconds :float =5 ,
+    max_retry_seconds :float =300 ,
+    max_age_hours :float =24 ,
+    max_in_flight :int =32 ,
+    compact_threshold :int =1000 ,
+    fsync :bool =True 
+    ):
+        self .journal =OutboxJournal (storage_file ,fsync )
+        self .deliver =deliver 
+        self .retry_seconds =retry_seconds 
+        self .max_retry_seconds =max_retry_seconds 
+        self .max_age_seconds =max_age_hours *3600 
+        self .max_in_flight =max (1 ,max_in_flight )
+        self .compact_threshold =compact_threshold 
+
+        self .entries :Dict [str ,OutboxEntry ]=self .journal .load ()
+        if self .entries :
+            logger .info (f"Recovered {len (self .entries )} undelivered notifications from {storage_file }")
+
+        self ._queue :Optional [asyncio .Queue ]=None 
+        self ._runner :Optional [asyncio .Task ]=None 
+        self ._in_flight :Set [asyncio .Task ]=set ()
+        self ._semaphore :Optional [asyncio .Semaphore ]=None 
+        self ._acks_since_compact =0 
+
+        self .delivered =0 
+        self .retried =0 
+        self .dropped =0 
+
+    @classmethod 
+    def from_config (cls ,outbox_config ,deliver :Callable [[OutboxEntry ],Awaitable [bool ]])->'NotificationOutbox':
+
+        return cls (
+        outbox_config .storage_file ,
+        deliver ,
+        retry_seconds =outbox_config .retry_seconds ,
+        max_retry_seconds =outbox_config .max_retry_seconds ,
+        max_age_hours =outbox_config .max_age_hours ,
+        max_in_flight =outbox_config .max_in_flight ,
+        compact_threshold =outbox_config .compact_threshold ,
+        fsync =outbox_config .fsync 
+        )
+
+    async def enqueue (
+    self ,
+    open_id :str ,
+    msg_type :str ,
+    content :str ,
+    kind :str ="",
+    meta :Optional [dict ]=None 
+    )->OutboxEntry :
+
+
+        entry =OutboxEntry (
+        id =uuid .uuid4 ().hex ,
+        open_id =open_id ,
+        msg_type =msg_type ,
+        content =content ,
+        kind =kind ,
+        meta =meta or {}
+        )
+        self .entries [entry .id ]=entry 
+        try :
+            await asyncio .to_thread (self .journal .append ,entry .to_record (),True )
+        except BaseException :
+            self .entries .pop (entry .id ,None )
+            raise 
+
+        if self ._queue is not None :
+            self ._queue .put_nowait (entry )
+        return entry 
+
+    def start (self )->None :
+
+        if self ._runner is not None :
+            return 
+        self ._queue =asyncio .Queue ()
+        self ._semaphore =asyncio .Semaphore (self .max_in_flight )
+        for entry in sorted (self .entries .values (),key =lambda e :e .created_at ):
+            self ._queue .put_nowait (entry )
+        self ._runner =asyncio .ensure_future (self ._run ())
+        logger .info (f"Notification outbox started with {len (self .entries )} pending")
+
+    async def stop (self ,timeout :float =5.0 )->None :
+
+
+        if self ._runner is None :
+            return 
+
+        if self ._in_flight :
+            await asyncio .wait (list (self ._in_flight ),timeout =timeout )
+
+        self ._runner .cancel ()
+        for task in list (self ._in_flight ):
+            task .cancel ()
+        await asyncio .gather (self ._runner ,*self ._in_flight ,return_exceptions =True )
+        self ._runner =None 
+
+        if self .entries :
+            logger .info (f"Notification outbox stopped with {len (self .entries )} pending, will resume on restart")
+
+    async def _run (self )->None :
+
+        while True :
+            entry =await self ._queue .get ()
+            if entry .id not in self .entries :
+                continue 
+            await self ._semaphore .acquire ()
+            slot =_Slot (self ._semaphore )
+            task =asyncio .ensure_future (self ._deliver (entry ,slot ))
+            self ._in_flight .add (task )
+            task .add_done_callback (lambda task ,slot =slot :self ._on_done (task ,slot ))
+
+    def _on_done (self ,task :asyncio .Task ,slot :_Slot )->None :
+
+        self ._in_flight .discard (task )
+        slot .release ()
+
+    async def _deliver (self ,entry :OutboxEntry ,slot :Optional [_Slot ]=None )->None :
+
+        _SLOT .set (slot )
+        entry .attempts +=1 
+        try :
+            ok =await self .deliver (entry )
+        except asyncio .CancelledError :
+            raise 
+        except Exception as e :
+            logger .error (f"Outbox delivery error for {entry .id }: {e }")
+            ok =False 
+
+        if ok :
+            self .delivered +=1 
+            await self ._finish (entry ,OP_ACK )
+            return 
+
+        if time .time ()-entry .created_at >self .max_age_seconds :
+            logger .error (f"Dropping notification {entry .id } for {entry .open_id } after {entry .attempts } attempts")
+            self .dropped +=1 
+            await self ._finish (entry ,OP_DROP )
+            return 
+
+        self .retried +=1 
+        delay =min (self .max_retry_seconds ,self .retry_seconds *(2 **(entry .attempts -1 )))
+        logger .warning (f"Notification {entry .id } not delivered, retrying in {delay }s (attempt {entry .attempts })")
+        asyncio .get_running_loop ().call_later (delay ,self ._queue .put_nowait ,entry )
+
+    async def _finish (self ,entry :OutboxEntry ,op :str )->None :
+
+
+        self .entries .pop (entry .id ,None )
+        await asyncio .to_thread (self .journal .append ,{'op':op ,'id':entry .id })
+
+        self ._acks_since_compact +=1 
+        if self .compact_threshold >0 and self ._acks_since_compact >=self .compact_threshold :
+            self ._acks_since_compact =0 
+            await asyncio .to_thread (self .journal .compact ,self .entries )
+
+    def stats (self )->dict :
+
+        oldest =min ((e .created_at for e in self .entries .values ()),default =None )
+        return {
+        'pending':len (self .entries ),
+        'in_flight':len (self ._in_flight ),
+        'delivered':self .delivered ,
+        'retried':self .retried ,
+        'dropped':self .dropped ,
+        'oldest_pending_age_s':round (time .time ()-oldest ,1 )if oldest is not None else 0.0 
+        }
@@ -3,7 +3,12 @@
 """
 
 import logging 
-from typing import Optional 
+from typing import Optional ,Tuple 
+
+from ..bot .outbound import PRIORITY_WAITING ,PRIORITY_RESULT ,PRIORITY_INFO 
+from ..utils import jsoncodec 
+from .constants import TYPE_WAITING 
+from .cards import CardRenderer ,CARD_TASK_COMPLETED ,CARD_TASK_WAITING ,CARD_COMMAND_RESULT 
 
 logger =logging .getLogger (__name__ )
 
@@ -11,51 +16,110 @@ logger =logging .getLogger (__name__ )
 class NotificationSender :
 
 
-    def __init__ (self ,feishu_client ):
+    def __init__ (self ,feishu_client ,card_renderer :Optional [CardRenderer ]=None ):
 
         self .feishu_client =feishu_client 
+        self .card_renderer =card_renderer or CardRenderer ()
+
+    async def _send (self ,open_id :str ,card_kind :str ,data :dict ,text :str ,priority :str )->bool :
+
+
+        card =self .card_renderer .render (card_kind ,data )
+        if card is not None :
+            if await self .feishu_client .send_card (open_id ,card ,priority =priority ):
+                return True 
+            logger .warning (f"Failed to send {card_kind } card, falling back to text")
+        return await self .feishu_client .send_text_message (open_id ,text ,priority =priority )
 
-    def send_task_completed_notification (self ,notification :dict )->bool :
+    async def send_task_completed_notification (self ,notification :dict )->bool :
 
         try :
             message =self ._format_completed_message (notification )
-            return self .feishu_client .send_text_message (
+            return await self ._send (
             notification ['open_id'],
-            message 
+            CARD_TASK_COMPLETED ,
+            notification ,
+            message ,
+            PRIORITY_INFO 
             )
         except Exception as e :
             logger .error (f"Failed to send completed notification: {e }")
             return False 
 
-    def send_task_waiting_notification (self ,notification :dict )->bool :
+    async def send_task_waiting_notification (self ,notification :dict )->bool :
 
         try :
             message =self ._format_waiting_message (notification )
-            return self .feishu_client .send_text_message (
+            return await self ._send (
             notification ['open_id'],
-            message 
+            CARD_TASK_WAITING ,
+            notification ,
+            message ,
+            PRIORITY_WAITING 
             )
         except Exception as e :
             logger .error (f"Failed to send waiting notification: {e }")
             return False 
 
-    def send_command_result_notification (self ,open_id :str ,result :dict )->bool :
+    async def send_command_result_notification (self ,open_id :str ,result :dict )->bool :
 
         try :
             message =self ._format_result_message (result )
-            return self .feishu_client .send_text_message (open_id ,message )
+            data =dict (result ,status ="✅ 成功"if result .get ('success')else "❌ 失败")
+            return await self ._send (open_id ,CARD_COMMAND_RESULT ,data ,message ,PRIORITY_RESULT )
         except Exception as e :
             logger .error (f"Failed to send result notification: {e }")
             return False 
 
-    def send_text_notification (self ,open_id :str ,text :str )->bool :
+    async def send_text_notification (self ,open_id :str ,text :str ,priority :str =PRIORITY_INFO )->bool :
 
         try :
-            return self .feishu_client .send_text_message (open_id ,text )
+            return await self .feishu_client .send_text_message (open_id ,text ,priority =priority )
         except Exception as e :
             logger .error (f"Failed to send text notification: {e }")
             return False 
 
+    def render_notification (self ,notification :dict )->str :
+
+        if notification .get ('type')==TYPE_WAITING :
+            return self ._format_waiting_message (notification )
+        return self ._format_completed_message (notification )
+
+    def render_message (self ,notification :dict )->Tuple [str ,str ,str ]:
+
+
+        text =self .render_notification (notification )
+        text_content =jsoncodec .dumps ({"text":text })
+
+        kind =CARD_TASK_WAITING if notification .get ('type')==TYPE_WAITING else CARD_TASK_COMPLETED 
+        card =self .card_renderer .render (kind ,notification )
+        if card is None :
+            return "text",text_content ,""
+        return "interactive",card ,text_content 
+
+    async def deliver (self ,entry )->bool :
+
+        priority =self .priority_for (entry .kind )
+        result =await self .feishu_client .send_message (
+        entry .open_id ,
+        entry .msg_type ,
+        entry .content ,
+        priority =priority 
+        )
+
+        fallback =entry .meta .get ('fallback_content')
+        if not result .success and entry .msg_type =="interactive"and fallback :
+            logger .warning (f"Failed to send card ({result .code }), falling back to text")
+            result =await self .feishu_client .send_message (entry .open_id ,"text",fallback ,priority =priority )
+        return result .success 
+
+    @staticmethod 
+    def priority_for (notification_type :str )->str :
+
+        if notification_type ==TYPE_WAITING :
+            return PRIORITY_WAITING 
+        return PRIORITY_INFO 
+
     def _format_completed_message (self ,notification :dict )->str :
 
 
@@ -6,6 +6,8 @@ from pydantic import BaseModel ,Field
 from typing import Optional 
 from datetime import datetime 
 
+from .constants import TYPE_COMPLETED ,TYPE_WAITING ,TYPE_ERROR 
+
 
 class WebhookRequest (BaseModel ):
 
@@ -40,8 +42,3 @@ class TaskNotification (BaseModel ):
     task_output :str =""
     timestamp :datetime =Field (default_factory =datetime .now )
 
-
-
-TYPE_COMPLETED ="completed"
-TYPE_WAITING ="waiting"
-TYPE_ERROR ="error"
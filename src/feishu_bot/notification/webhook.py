@@ -7,6 +7,7 @@ from datetime import datetime
 from typing import Optional 
 
 from ..session import SessionManager ,STATUS_ACTIVE ,STATUS_COMPLETED ,STATUS_WAITING 
+from ..utils import tracing 
 from .types import WebhookRequest ,WebhookResponse ,TYPE_COMPLETED ,TYPE_WAITING ,TYPE_ERROR 
 
 logger =logging .getLogger (__name__ )
@@ -15,12 +16,13 @@ logger =logging .getLogger (__name__ )
 class WebhookHandler :
 
 
-    def __init__ (self ,session_manager :SessionManager ,notification_sender ,user_mapping_service =None ):
+    def __init__ (self ,session_manager :SessionManager ,notification_sender ,user_mapping_service =None ,outbox =None ):
         self .session_manager =session_manager 
         self .notification_sender =notification_sender 
         self .user_mapping_service =user_mapping_service 
+        self .outbox =outbox 
 
-    def handle_notification (self ,req :WebhookRequest )->WebhookResponse :
+    async def handle_notification (self ,req :WebhookRequest )->WebhookResponse :
 
         logger .info (f"Received notification: type={req .type }, project={req .project_name }, user={req .user_id }")
 
@@ -49,6 +51,7 @@ class WebhookHandler :
             description =req .description ,
             status =self ._map_notification_to_status (req .type )
             )
+            tracing .set_attribute ('token',session .token )
         except Exception as e :
             logger .error (f"Failed to create session: {e }")
             return WebhookResponse (
@@ -58,7 +61,7 @@ class WebhookHandler :
 
 
         try :
-            self ._send_notification (session ,req )
+            await self ._send_notification (session ,req )
         except Exception as e :
             logger .error (f"Failed to send notification: {e }")
 
@@ -70,10 +73,15 @@ class WebhookHandler :
 
         logger .info (f"Successfully processed notification, token: {session .token }")
 
+        if self .outbox is not None :
+            message =f"Notification queued with token {session .token }"
+        else :
+            message =f"Notification sent successfully with token {session .token }"
+
         return WebhookResponse (
         success =True ,
         token =session .token ,
-        message =f"Notification sent successfully with token {session .token }"
+        message =message 
         )
 
     def _validate_request (self ,req :WebhookRequest )->bool :
@@ -110,7 +118,7 @@ class WebhookHandler :
         }
         return mapping .get (notification_type ,STATUS_ACTIVE )
 
-    def _send_notification (self ,session ,req :WebhookRequest ):
+    async def _send_notification (self ,session ,req :WebhookRequest ):
 
         notification_data ={
         'type':req .type ,
@@ -126,12 +134,31 @@ class WebhookHandler :
         }
 
 
+        if self .outbox is not None :
+            msg_type ,content ,fallback_content =self .notification_sender .render_message (notification_data )
+            meta ={
+            'token':session .token ,
+            'project_name':req .project_name ,
+            'description':req .description 
+            }
+            if fallback_content :
+                meta ['fallback_content']=fallback_content 
+            await self .outbox .enqueue (
+            session .open_id ,
+            msg_type ,
+            content ,
+            kind =req .type ,
+            meta =meta 
+            )
+            return 
+
+
         if req .type ==TYPE_COMPLETED :
-            self .notification_sender .send_task_completed_notification (notification_data )
+            await self .notification_sender .send_task_completed_notification (notification_data )
         elif req .type ==TYPE_WAITING :
-            self .notification_sender .send_task_waiting_notification (notification_data )
+            await self .notification_sender .send_task_waiting_notification (notification_data )
         elif req .type ==TYPE_ERROR :
-            self .notification_sender .send_task_completed_notification (notification_data )
+            await self .notification_sender .send_task_completed_notification (notification_data )
 
     def get_session_info (self ,token :str ):
 
@@ -153,5 +180,6 @@ class WebhookHandler :
         'total_sessions':len (all_sessions ),
         'active_sessions':sum (1 for s in all_sessions if s .status ==STATUS_ACTIVE ),
         'status_counts':status_counts ,
+        'outbox':self .outbox .stats ()if self .outbox is not None else None ,
         'timestamp':datetime .now ().isoformat ()
         }
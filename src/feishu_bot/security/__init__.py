@@ -2,6 +2,19 @@
 Security 安全模块
 """
 
-from .user_mapping import UserMappingService 
+from ..utils .lazy import lazy_exports 
 
-__all__ =['UserMappingService']
\ No newline at end of file
+_EXPORTS ={
+'UserMappingService':'.user_mapping',
+'PolicyEngine':'.policy',
+'PolicyDecision':'.policy',
+'UserPolicy':'.policy',
+'ACTION_COMMAND':'.policy',
+'ACTION_DIRECT_MESSAGE':'.policy',
+'ACTION_SESSIONS':'.policy',
+'ACTION_HELP':'.policy'
+}
+
+__all__ =list (_EXPORTS )
+
+__getattr__ ,__dir__ =lazy_exports (__name__ ,_EXPORTS )
@@ -0,0 +1,191 @@
+"""
+用户权限策略
+"""
+
+import re 
+import logging 
+from dataclasses import dataclass 
+from typing import Dict ,FrozenSet ,Iterable ,Optional 
+
+from ..command .validator import CompiledRules ,compile_rules ,normalize_command 
+
+logger =logging .getLogger (__name__ )
+
+
+PERMISSION_COMMAND_EXECUTE ="command_execute"
+PERMISSION_SESSION_MANAGE ="session_manage"
+
+ACTION_COMMAND ="command"
+ACTION_DIRECT_MESSAGE ="direct_message"
+ACTION_SESSIONS ="sessions"
+ACTION_HELP ="help"
+
+
+ACTION_PERMISSIONS ={
+ACTION_COMMAND :PERMISSION_COMMAND_EXECUTE ,
+ACTION_DIRECT_MESSAGE :PERMISSION_COMMAND_EXECUTE ,
+ACTION_SESSIONS :PERMISSION_SESSION_MANAGE ,
+ACTION_HELP :None ,
+}
+
+ALL_ACTIONS =frozenset (ACTION_PERMISSIONS )
+
+
+@dataclass (frozen =True )
+class PolicyDecision :
+
+    allowed :bool 
+    reason :str =""
+
+
+ALLOW =PolicyDecision (True )
+DENY_UNKNOWN_USER =PolicyDecision (False ,"用户不在白名单中")
+
+
+class UserPolicy :
+
+
+    __slots__ =('user_id','open_id','is_admin','actions','rules','max_sessions','_denied')
+
+    def __init__ (
+    self ,
+    user_id :str ,
+    open_id :str ,
+    is_admin :bool ,
+    actions :FrozenSet [str ],
+    rules :Optional [CompiledRules ]=None ,
+    max_sessions :int =5 
+    ):
+        self .user_id =user_id 
+        self .open_id =open_id 
+        self .is_admin =is_admin 
+        self .actions =actions 
+        self .rules =rules 
+        self .max_sessions =max_sessions 
+
+
+        self ._denied ={
+        action :PolicyDecision (False ,f"缺少权限: {permission }")
+        for action ,permission in ACTION_PERMISSIONS .items ()
+        if action not in actions 
+        }
+
+    def authorize (self ,action :str ,command :Optional [str ]=None )->PolicyDecision :
+
+        if action not in self .actions :
+            return self ._denied .get (action )or PolicyDecision (False ,f"未知操作: {action }")
+
+        if command and self .rules is not None :
+            rule =self .rules .first_violation (normalize_command (command ))
+            if rule is not None :
+                return PolicyDecision (False ,f"命令被用户规则拒绝: {rule }")
+
+        return ALLOW 
+
+
+class PolicyEngine :
+
+
+    def __init__ (
+    self ,
+    by_open_id :Optional [Dict [str ,UserPolicy ]]=None ,
+    by_user_id :Optional [Dict [str ,UserPolicy ]]=None ,
+    open_access :bool =False 
+    ):
+        self .by_open_id =by_open_id or {}
+        self .by_user_id =by_user_id or {}
+        self .open_access =open_access 
+
+    @classmethod 
+    def open (cls )->'PolicyEngine':
+
+        return cls (open_access =True )
+
+    @classmethod 
+    def closed (cls )->'PolicyEngine':
+
+        return cls ()
+
+    @classmethod 
+    def compile (cls ,users :Dict [str ,dict ],admin_users :Iterable [str ])->'PolicyEngine':
+
+        admins =set (admin_users or [])
+
+
+        if not users and not admins :
+            logger .warning ("Whitelist is empty, policy engine runs in open-access mode")
+            return cls .open ()
+
+        by_open_id :Dict [str ,UserPolicy ]={}
+        by_user_id :Dict [str ,UserPolicy ]={}
+
+        for user_id ,user in users .items ():
+            policy =cls ._compile_user (user ,user ['open_id']in admins )
+            by_open_id [policy .open_id ]=policy 
+            by_user_id [user_id ]=policy 
+
+
+        for open_id in admins :
+            if open_id not in by_open_id :
+                by_open_id [open_id ]=UserPolicy (
+                user_id ="",
+                open_id =open_id ,
+                is_admin =True ,
+                actions =ALL_ACTIONS 
+                )
+
+        logger .info (f"Compiled policies for {len (by_open_id )} users ({len (admins )} admins)")
+        return cls (by_open_id ,by_user_id )
+
+    @staticmethod 
+    def _compile_user (user :dict ,is_admin :bool )->UserPolicy :
+
+        if is_admin :
+            actions =ALL_ACTIONS 
+        else :
+            permissions =set (user .get ('permissions')or [])
+            actions =frozenset (
+            action for action ,permission in ACTION_PERMISSIONS .items ()
+            if permission is None or permission in permissions 
+            )
+
+        rules =None 
+        command_rules =user .get ('command_rules')or {}
+        deny =tuple (command_rules .get ('deny')or ())
+        allow =tuple (command_rules .get ('allow')or ())
+        if deny and not is_admin :
+            try :
+                rules =compile_rules (deny ,allow ,strict =True )
+            except re .error as e :
+                logger .error (f"Invalid command_rules for user {user ['user_id']}, command execution disabled: {e }")
+                actions =frozenset (
+                action for action in actions 
+                if ACTION_PERMISSIONS [action ]!=PERMISSION_COMMAND_EXECUTE 
+                )
+
+        return UserPolicy (
+        user_id =user ['user_id'],
+        open_id =user ['open_id'],
+        is_admin =is_admin ,
+        actions =actions ,
+        rules =rules ,
+        max_sessions =user .get ('max_sessions',5 )
+        )
+
+    def authorize (self ,open_id :str ,action :str ,command :Optional [str ]=None )->PolicyDecision :
+
+        policy =self .by_open_id .get (open_id )
+        if policy is None :
+            return ALLOW if self .open_access else DENY_UNKNOWN_USER 
+        return policy .authorize (action ,command )
+
+    def authorize_user (self ,user_id :str ,action :str ,command :Optional [str ]=None )->PolicyDecision :
+
+        policy =self .by_user_id .get (user_id )
+        if policy is None :
+            return ALLOW if self .open_access else DENY_UNKNOWN_USER 
+        return policy .authorize (action ,command )
+
+    def get_policy (self ,open_id :str )->Optional [UserPolicy ]:
+
+        return self .by_open_id .get (open_id )
@@ -7,6 +7,8 @@ import logging
 from pathlib import Path 
 from typing import Dict ,Optional ,List 
 
+from .policy import PolicyEngine 
+
 logger =logging .getLogger (__name__ )
 
 
@@ -18,41 +20,58 @@ class UserMappingService :
         self .users :Dict [str ,dict ]={}
         self .admin_users :List [str ]=[]
         self .global_limits :dict ={}
-        self ._load_whitelist ()
+        self .policy :PolicyEngine =PolicyEngine .closed ()
+        try :
+            self ._load_whitelist ()
+        except Exception as e :
+            logger .error (f"Failed to load whitelist, denying all users: {e }")
 
     def _load_whitelist (self ):
 
         if not self .whitelist_path .exists ():
             logger .warning (f"Whitelist file not found: {self .whitelist_path }")
+            self .policy =PolicyEngine .open ()
             return 
 
-        try :
-            with open (self .whitelist_path ,'r',encoding ='utf-8')as f :
-                data =yaml .safe_load (f )or {}
+        with open (self .whitelist_path ,'r',encoding ='utf-8')as f :
+            data =yaml .safe_load (f )or {}
 
 
-            for user in data .get ('allowed_users',[]):
-                user_id =user .get ('user_id')
-                open_id =user .get ('open_id')
-                if user_id and open_id :
-                    self .users [user_id ]={
-                    'user_id':user_id ,
-                    'open_id':open_id ,
-                    'name':user .get ('name',''),
-                    'permissions':user .get ('permissions',[]),
-                    'max_sessions':user .get ('max_sessions',5 )
-                    }
+        users :Dict [str ,dict ]={}
+        for user in data .get ('allowed_users',[]):
+            user_id =user .get ('user_id')
+            open_id =user .get ('open_id')
+            if user_id and open_id :
+                users [user_id ]={
+                'user_id':user_id ,
+                'open_id':open_id ,
+                'name':user .get ('name',''),
+                'permissions':user .get ('permissions',[]),
+                'max_sessions':user .get ('max_sessions',5 ),
+                'command_rules':user .get ('command_rules',{})
+                }
 
 
-            self .admin_users =data .get ('admin_users',[])
+        admin_users =data .get ('admin_users',[])
 
 
-            self .global_limits =data .get ('global_limits',{})
+        global_limits =data .get ('global_limits',{})
 
-            logger .info (f"Loaded {len (self .users )} users from whitelist")
 
+        policy =PolicyEngine .compile (users ,admin_users )
+
+        self .users =users 
+        self .admin_users =admin_users 
+        self .global_limits =global_limits 
+        self .policy =policy 
+        logger .info (f"Loaded {len (self .users )} users from whitelist")
+
+    def reload (self )->None :
+
+        try :
+            self ._load_whitelist ()
         except Exception as e :
-            logger .error (f"Failed to load whitelist: {e }")
+            logger .error (f"Failed to reload whitelist, keeping the previous policy: {e }")
 
     def resolve_open_id (self ,user_id :str ,open_id :str )->Optional [str ]:
 
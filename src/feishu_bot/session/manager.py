@@ -2,35 +2,82 @@
 Session 管理器
 """
 
+import time 
 import logging 
 import threading 
+from contextlib import contextmanager 
 from datetime import datetime ,timedelta 
 from typing import Dict ,List ,Optional 
 
 from .types import Session ,SessionConfig ,STATUS_ACTIVE 
 from .storage import FileStorage 
 from .token import TokenGenerator ,generate_unique_token 
+from ..utils import metrics ,tracing 
 
 logger =logging .getLogger (__name__ )
 
 
+SESSION_OPERATION_SECONDS =metrics .histogram (
+'feishu_bot_session_operation_seconds',
+"Time spent holding the session lock, including persistence",
+('op',)
+)
+SESSION_LOCK_WAIT_SECONDS =metrics .histogram (
+'feishu_bot_session_lock_wait_seconds',
+"Time spent waiting to acquire the session lock",
+('op',),
+metrics .FAST_BUCKETS 
+)
+SESSIONS_STORED =metrics .gauge (
+'feishu_bot_sessions_stored',
+"Sessions held in memory, including expired ones awaiting cleanup"
+)
+
+
 class SessionManager :
 
 
-    def __init__ (self ,storage_path :str ,config :SessionConfig ):
+    def __init__ (self ,storage_path :str ,config :SessionConfig ,autostart :bool =True ):
         self .storage =FileStorage (storage_path )
         self .config =config 
         self .generator =TokenGenerator (config .token_length )
         self .sessions :Dict [str ,Session ]={}
         self .lock =threading .RLock ()
+        self ._scheduler =None 
+
+        if autostart :
+            self .start ()
+
+    def start (self )->None :
 
 
         self ._load_sessions ()
+        SESSIONS_STORED .set_function (lambda :len (self .sessions ))
 
 
-        if config .cleanup_interval_minutes >0 :
+        if self .config .cleanup_interval_minutes >0 and self ._scheduler is None :
             self ._start_cleanup_scheduler ()
 
+    def stop (self )->None :
+
+        if self ._scheduler is not None :
+            self ._scheduler .shutdown (wait =False )
+            self ._scheduler =None 
+
+    @contextmanager 
+    def _locked (self ,op :str ):
+
+        with tracing .span (f"session.{op }")as span :
+            requested =time .perf_counter ()
+            with self .lock :
+                acquired =time .perf_counter ()
+                SESSION_LOCK_WAIT_SECONDS .labels (op ).observe (acquired -requested )
+                span .set_attribute ('lock_wait_ms',round ((acquired -requested )*1000 ,3 ))
+                try :
+                    yield 
+                finally :
+                    SESSION_OPERATION_SECONDS .labels (op ).observe (time .perf_counter ()-acquired )
+
     def _load_sessions (self )->None :
 
         try :
@@ -57,7 +104,7 @@ class SessionManager :
     status :str =STATUS_ACTIVE 
     )->Session :
 
-        with self .lock :
+        with self ._locked ('create'):
 
             existing_tokens =set (self .sessions .keys ())
             token =generate_unique_token (self .generator ,existing_tokens )
@@ -90,7 +137,7 @@ class SessionManager :
 
     def get_session (self ,token :str )->Optional [Session ]:
 
-        with self .lock :
+        with self ._locked ('get'):
             session =self .sessions .get (token )
             if session is None :
                 return None 
@@ -109,7 +156,7 @@ class SessionManager :
     description :Optional [str ]=None 
     )->Optional [Session ]:
 
-        with self .lock :
+        with self ._locked ('update'):
             session =self .sessions .get (token )
             if session is None or session .is_expired ():
                 return None 
@@ -130,7 +177,7 @@ class SessionManager :
 
     def delete_session (self ,token :str )->bool :
 
-        with self .lock :
+        with self ._locked ('delete'):
             if token not in self .sessions :
                 return False 
 
@@ -142,7 +189,7 @@ class SessionManager :
 
     def list_sessions (self ,user_id :Optional [str ]=None )->List [Session ]:
 
-        with self .lock :
+        with self ._locked ('list'):
             sessions =[]
             for session in self .sessions .values ():
 
@@ -159,7 +206,7 @@ class SessionManager :
 
     def cleanup_expired_sessions (self )->int :
 
-        with self .lock :
+        with self ._locked ('cleanup'):
             tokens_to_delete =[]
             for token ,session in self .sessions .items ():
                 if session .is_expired ():
@@ -185,7 +232,7 @@ class SessionManager :
 
     def get_user_active_session (self ,open_id :str )->Optional [Session ]:
 
-        with self .lock :
+        with self ._locked ('user_active'):
             user_sessions =[]
 
             for session in self .sessions .values ():
@@ -214,4 +261,5 @@ class SessionManager :
         minutes =self .config .cleanup_interval_minutes 
         )
         scheduler .start ()
+        self ._scheduler =scheduler 
         logger .info (f"Started cleanup scheduler: interval={self .config .cleanup_interval_minutes }min")
@@ -2,17 +2,25 @@
 Session 文件存储
 """
 
-import json 
+import time 
 import logging 
 from pathlib import Path 
 from typing import Dict 
 from datetime import datetime 
 
 from .types import Session 
+from ..utils import jsoncodec ,metrics ,tracing 
 
 logger =logging .getLogger (__name__ )
 
 
+PERSIST_SECONDS =metrics .histogram (
+'feishu_bot_persist_duration_seconds',
+"Time to serialize and write, or read and parse, a JSON store file",
+('store','op')
+)
+
+
 class FileStorage :
 
 
@@ -25,14 +33,16 @@ class FileStorage :
         if not self .file_path .exists ():
             return {}
 
+        started =time .perf_counter ()
         try :
-            data =json .loads (self .file_path .read_text (encoding ='utf-8'))
+            data =jsoncodec .loads (self .file_path .read_bytes ())
             sessions ={}
             for token ,sess_data in data .get ('sessions',{}).items ():
                 try :
                     sessions [token ]=Session .from_dict (sess_data )
                 except Exception as e :
                     logger .error (f"Failed to load session {token }: {e }")
+            PERSIST_SECONDS .labels ('sessions','load').observe (time .perf_counter ()-started )
             return sessions 
         except Exception as e :
             logger .error (f"Failed to load sessions from {self .file_path }: {e }")
@@ -40,11 +50,11 @@ class FileStorage :
 
     def save (self ,sessions :Dict [str ,Session ])->None :
 
-        data ={
-        'sessions':{token :sess .to_dict ()for token ,sess in sessions .items ()},
-        'updated_at':datetime .now ().isoformat ()
-        }
-        self .file_path .write_text (
-        json .dumps (data ,indent =2 ,ensure_ascii =False ),
-        encoding ='utf-8'
-        )
+        started =time .perf_counter ()
+        with tracing .span ('session.persist',sessions =len (sessions )):
+            data ={
+            'sessions':{token :sess .to_dict ()for token ,sess in sessions .items ()},
+            'updated_at':datetime .now ().isoformat ()
+            }
+            self .file_path .write_bytes (jsoncodec .dumpb (data ))
+        PERSIST_SECONDS .labels ('sessions','save').observe (time .perf_counter ()-started )
@@ -6,13 +6,16 @@ import random
 from typing import Set 
 
 
+TOKEN_CHARSET ="ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+
+
 class TokenGenerator :
 
 
     def __init__ (self ,length :int =8 ):
         self .length =length 
 
-        self .charset ="ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+        self .charset =TOKEN_CHARSET 
 
     def generate (self )->str :
 
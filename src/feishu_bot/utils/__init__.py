@@ -0,0 +1,30 @@
+"""
+工具模块
+"""
+
+from .lazy import lazy_exports 
+
+_EXPORTS ={
+'jsoncodec':'.jsoncodec',
+'metrics':'.metrics',
+'render_metrics':'.metrics',
+'MetricsMiddleware':'.metrics',
+'parse_relaxed':'.relaxed_json',
+'RelaxedJSONError':'.relaxed_json',
+'setup_logging':'.logging_setup',
+'logging_stats':'.logging_setup',
+'payload_logger':'.logging_setup',
+'log_payload':'.logging_setup',
+'tracing':'.tracing',
+'setup_tracing':'.tracing',
+'shutdown_tracing':'.tracing',
+'tracing_stats':'.tracing',
+'TracingMiddleware':'.tracing',
+'create_debug_router':'.debug_api',
+'create_access_check':'.debug_api',
+'LoopWatchdog':'.watchdog'
+}
+
+__all__ =list (_EXPORTS )
+
+__getattr__ ,__dir__ =lazy_exports (__name__ ,_EXPORTS )
@@ -0,0 +1,120 @@
+"""
+诊断接口 - 在线服务的采样分析、内存快照对比与栈转储 (默认关闭)
+
+访问控制:
+- 来自本机回环地址的请求直接放行 (allow_local), 适合 SSH 登录后在服务器上 curl
+- 远程请求需同时携带 X-Debug-Token (与 debug.token 一致) 和 X-Open-Id (白名单中的管理员)
+- 未配置 token 时只接受本机请求; 经反向代理转发时来源地址也是本机, 应关闭 allow_local
+- 同一访问检查也用于机器人服务的 /usage (包含所有用户的 open_id 与资源用量), 不随 debug.enabled 开关
+"""
+
+import hmac 
+import asyncio 
+import logging 
+from typing import Optional 
+
+from fastapi import APIRouter ,Depends ,HTTPException ,Request 
+from fastapi .responses import PlainTextResponse ,Response 
+
+from .profiling import TracemallocTracker ,sample_stacks ,render_collapsed ,render_flamegraph ,dump_threads ,dump_tasks 
+
+logger =logging .getLogger (__name__ )
+
+
+LOOPBACK_HOSTS ={'127.0.0.1','::1','localhost'}
+
+
+def create_access_check (debug_config ,user_mapping_service =None ):
+
+
+    async def require_access (request :Request )->str :
+
+        client =request .client .host if request .client else ""
+        if debug_config .allow_local and client in LOOPBACK_HOSTS :
+            return "local"
+
+        token =request .headers .get ('x-debug-token','')
+        open_id =request .headers .get ('x-open-id','')
+        if (
+        debug_config .token 
+        and hmac .compare_digest (token .encode (),debug_config .token .encode ())
+        and user_mapping_service is not None 
+        and user_mapping_service .is_admin (open_id )
+        ):
+            return open_id 
+
+        logger .warning (f"Denied debug access from {client } (open_id={open_id or '-'})")
+        raise HTTPException (status_code =403 ,detail ="debug endpoints require local access or an admin token")
+
+    return require_access 
+
+
+def create_debug_router (debug_config ,user_mapping_service =None ,service :str ="")->APIRouter :
+
+
+    tracker =TracemallocTracker ()
+    profile_lock =asyncio .Lock ()
+    require_access =create_access_check (debug_config ,user_mapping_service )
+    router =APIRouter (prefix ="/debug",dependencies =[Depends (require_access )])
+
+    @router .get ("/profile")
+    async def profile (
+    seconds :float =10 ,
+    interval_ms :Optional [float ]=None ,
+    format :str ="collapsed",
+    idle :bool =False 
+    ):
+
+        if format not in ("collapsed","svg"):
+            raise HTTPException (status_code =400 ,detail ="format must be collapsed or svg")
+        seconds =min (max (seconds ,0.1 ),debug_config .profile_max_seconds )
+        interval =max (interval_ms or debug_config .profile_interval_ms ,1 )/1000 
+        if profile_lock .locked ():
+            raise HTTPException (status_code =409 ,detail ="a profile is already running")
+
+        async with profile_lock :
+            logger .info (f"Profiling {service or 'service'} for {seconds }s at {interval *1000 }ms")
+            stacks ,samples =await asyncio .to_thread (sample_stacks ,seconds ,interval ,idle )
+
+        if format =="svg":
+            title =f"{service or 'service'} {seconds }s @ {interval *1000 :g}ms, {samples } ticks"
+            return Response (render_flamegraph (stacks ,title ),media_type ="image/svg+xml")
+        return PlainTextResponse (render_collapsed (stacks ))
+
+    @router .get ("/stacks")
+    async def stacks ():
+
+        return PlainTextResponse (
+        "=== threads ===\n\n"+dump_threads ()+"=== asyncio tasks ===\n\n"+dump_tasks ()
+        )
+
+    @router .post ("/tracemalloc/start")
+    async def tracemalloc_start (frames :Optional [int ]=None ):
+
+        return tracker .start (frames or debug_config .tracemalloc_frames )
+
+    @router .post ("/tracemalloc/stop")
+    async def tracemalloc_stop ():
+
+        return tracker .stop ()
+
+    @router .get ("/tracemalloc/snapshot")
+    async def tracemalloc_snapshot (limit :int =30 ,key :str ="lineno"):
+
+        return await _tracemalloc_call (tracker .snapshot ,limit ,key )
+
+    @router .get ("/tracemalloc/diff")
+    async def tracemalloc_diff (limit :int =30 ,key :str ="lineno"):
+
+        return await _tracemalloc_call (tracker .diff ,limit ,key )
+
+    async def _tracemalloc_call (method ,limit :int ,key :str ):
+
+        if key not in ("lineno","filename","traceback"):
+            raise HTTPException (status_code =400 ,detail ="key must be lineno, filename or traceback")
+        try :
+            return await asyncio .to_thread (method ,limit ,key )
+        except RuntimeError as e :
+            raise HTTPException (status_code =409 ,detail =str (e ))
+
+    return router 
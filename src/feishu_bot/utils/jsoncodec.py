@@ -0,0 +1,69 @@
+"""
+JSON 编解码 - 安装了 orjson 时使用 orjson, 否则回退到标准库 json
+
+- loads 直接接受 bytes / str, 无需先 decode
+- dumps 返回 str (飞书消息 content 字段为字符串), dumpb 返回 UTF-8 bytes (写文件 / 网络)
+- 输出统一为紧凑格式且不转义非 ASCII 字符
+- 两个后端接受的输入一致: datetime / dataclass 等需调用方先转换 (否则抛出 TypeError),
+  Enum 与 UUID 统一编码为其值与字符串形式
+"""
+
+import json 
+from enum import Enum 
+from typing import Any ,Union 
+from uuid import UUID 
+
+try :
+    import orjson 
+except ImportError :
+    orjson =None 
+
+
+BACKEND ="orjson"if orjson is not None else "json"
+
+JSONDecodeError =ValueError 
+
+
+def _default (obj :Any )->Any :
+
+
+    if isinstance (obj ,Enum ):
+        return obj .value 
+    if isinstance (obj ,UUID ):
+        return str (obj )
+    raise TypeError (f"Object of type {type (obj ).__name__ } is not JSON serializable")
+
+
+if orjson is not None :
+
+    _OPTIONS =orjson .OPT_NON_STR_KEYS |orjson .OPT_PASSTHROUGH_DATETIME |orjson .OPT_PASSTHROUGH_DATACLASS 
+
+    def loads (data :Union [bytes ,bytearray ,memoryview ,str ])->Any :
+
+        return orjson .loads (data )
+
+    def dumpb (obj :Any )->bytes :
+
+        return orjson .dumps (obj ,default =_default ,option =_OPTIONS )
+
+    def dumps (obj :Any )->str :
+
+        return orjson .dumps (obj ,default =_default ,option =_OPTIONS ).decode ('utf-8')
+
+else :
+
+    _encoder =json .JSONEncoder (ensure_ascii =False ,separators =(',',':'),default =_default )
+
+    def loads (data :Union [bytes ,bytearray ,memoryview ,str ])->Any :
+
+        if isinstance (data ,memoryview ):
+            data =data .tobytes ()
+        return json .loads (data )
+
+    def dumpb (obj :Any )->bytes :
+
+        return _encoder .encode (obj ).encode ('utf-8')
+
+    def dumps (obj :Any )->str :
+
+        return _encoder .encode (obj )
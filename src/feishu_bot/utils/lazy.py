@@ -0,0 +1,31 @@
+"""
+延迟导入 - 基于 PEP 562 的模块级 __getattr__
+
+包的 __init__ 只登记 "导出名 -> 子模块", 首次访问导出名时才导入对应子模块,
+lark-oapi、APScheduler、pydantic 等重量级依赖因此只在真正用到时加载
+"""
+
+import sys 
+import importlib 
+from typing import Any ,Callable ,Dict ,List ,Tuple 
+
+
+def lazy_exports (package :str ,exports :Dict [str ,str ])->Tuple [Callable [[str ],Any ],Callable [[],List [str ]]]:
+
+
+    def __getattr__ (name :str )->Any :
+
+        module_name =exports .get (name )
+        if module_name is None :
+            raise AttributeError (f"module {repr (package )} has no attribute {repr (name )}")
+
+        module =importlib .import_module (module_name ,package )
+        value =module if module_name ==f".{name }"else getattr (module ,name )
+        setattr (sys .modules [package ],name ,value )
+        return value 
+
+    def __dir__ ()->List [str ]:
+
+        return sorted (set (vars (sys .modules [package ]))|set (exports ))
+
+    return __getattr__ ,__dir__ 
@@ -0,0 +1,176 @@
+"""
+日志配置 - 根据 LoggingConfig 建立队列化的非阻塞日志管道
+
+- 业务代码只把日志记录放入有界队列, 格式化与文件 I/O 在 QueueListener 线程中完成
+- 可选 JSON 输出 (需要 python-json-logger, 未安装时回退为文本格式)
+- 按大小或按时间滚动日志文件
+- 按 logger 名称前缀采样, 用于请求体等大负载日志
+"""
+
+import sys 
+import queue 
+import atexit 
+import random 
+import logging 
+import logging .handlers 
+from pathlib import Path 
+from typing import Any ,Dict ,Optional 
+
+from .import jsoncodec 
+
+PAYLOAD_LOGGER ="feishu_bot.payload"
+MAX_PAYLOAD_CHARS =2000 
+
+_listener :Optional [logging .handlers .QueueListener ]=None 
+_queue_handler :Optional ['NonBlockingQueueHandler']=None 
+
+
+class NonBlockingQueueHandler (logging .handlers .QueueHandler ):
+
+
+    def __init__ (self ,log_queue :queue .Queue ):
+        super ().__init__ (log_queue )
+        self .dropped =0 
+
+    def prepare (self ,record :logging .LogRecord )->logging .LogRecord :
+
+
+        record .msg =record .getMessage ()
+        record .args =None 
+        return record 
+
+    def enqueue (self ,record :logging .LogRecord )->None :
+
+        try :
+            self .queue .put_nowait (record )
+        except queue .Full :
+            self .dropped +=1 
+
+
+class SamplingFilter (logging .Filter ):
+
+
+    def __init__ (self ,rates :Optional [Dict [str ,float ]]=None ):
+        super ().__init__ ()
+        self .rates =sorted ((rates or {}).items (),key =lambda item :len (item [0 ]),reverse =True )
+        self .sampled_out =0 
+
+    def rate_for (self ,name :str )->float :
+
+        for prefix ,rate in self .rates :
+            if name ==prefix or name .startswith (prefix +'.'):
+                return rate 
+        return 1.0 
+
+    def filter (self ,record :logging .LogRecord )->bool :
+
+        rate =self .rate_for (record .name )
+        if rate >=1.0 or random .random ()<rate :
+            return True 
+        self .sampled_out +=1 
+        return False 
+
+
+def _formatter (logging_config )->logging .Formatter :
+
+    if logging_config .json :
+        try :
+            from pythonjsonlogger import jsonlogger 
+            return jsonlogger .JsonFormatter (logging_config .format )
+        except ImportError :
+            print ("python-json-logger is not installed, falling back to text logs",file =sys .stderr )
+    return logging .Formatter (logging_config .format )
+
+
+def _file_handler (logging_config ,service :str )->Optional [logging .Handler ]:
+
+
+    if not logging_config .file :
+        return None 
+
+    path =Path (logging_config .file )
+    if service :
+        path =path .with_name (f"{path .stem }-{service }{path .suffix }")
+    path .parent .mkdir (parents =True ,exist_ok =True )
+
+    if logging_config .rotation =="time":
+        return logging .handlers .TimedRotatingFileHandler (
+        path ,
+        when =logging_config .when ,
+        backupCount =logging_config .backup_count ,
+        encoding ='utf-8'
+        )
+    if logging_config .rotation =="size":
+        return logging .handlers .RotatingFileHandler (
+        path ,
+        maxBytes =logging_config .max_bytes ,
+        backupCount =logging_config .backup_count ,
+        encoding ='utf-8'
+        )
+    return logging .FileHandler (path ,encoding ='utf-8')
+
+
+def setup_logging (logging_config ,service :str ="")->logging .handlers .QueueListener :
+
+
+    global _listener ,_queue_handler 
+    if _listener is not None :
+        return _listener 
+
+    formatter =_formatter (logging_config )
+    handlers =[]
+    if logging_config .console :
+        handlers .append (logging .StreamHandler ())
+    file_handler =_file_handler (logging_config ,service )
+    if file_handler is not None :
+        handlers .append (file_handler )
+    for handler in handlers :
+        handler .setFormatter (formatter )
+
+    _queue_handler =NonBlockingQueueHandler (queue .Queue (maxsize =logging_config .queue_size ))
+    _queue_handler .addFilter (SamplingFilter (logging_config .sampling ))
+
+    root =logging .getLogger ()
+    for handler in list (root .handlers ):
+        root .removeHandler (handler )
+    root .addHandler (_queue_handler )
+    root .setLevel (getattr (logging ,str (logging_config .level ).upper (),logging .INFO ))
+    for name ,level in (logging_config .levels or {}).items ():
+        logging .getLogger (name ).setLevel (str (level ).upper ())
+
+    _listener =logging .handlers .QueueListener (_queue_handler .queue ,*handlers ,respect_handler_level =True )
+    _listener .start ()
+    atexit .register (_listener .stop )
+    return _listener 
+
+
+def logging_stats ()->dict :
+
+    if _queue_handler is None :
+        return {}
+    sampler =_queue_handler .filters [0 ]
+    return {
+    'queued':_queue_handler .queue .qsize (),
+    'dropped':_queue_handler .dropped ,
+    'sampled_out':sampler .sampled_out 
+    }
+
+
+def payload_logger (service :str )->logging .Logger :
+
+    return logging .getLogger (f"{PAYLOAD_LOGGER }.{service }")
+
+
+def log_payload (logger :logging .Logger ,label :str ,payload :Any )->None :
+
+
+    if not logger .isEnabledFor (logging .DEBUG ):
+        return 
+
+    if isinstance (payload ,(bytes ,bytearray )):
+        text =bytes (payload [:MAX_PAYLOAD_CHARS ]).decode ('utf-8','replace')
+    elif isinstance (payload ,str ):
+        text =payload [:MAX_PAYLOAD_CHARS ]
+    else :
+        text =jsoncodec .dumps (payload )[:MAX_PAYLOAD_CHARS ]
+    logger .debug (f"{label }: {text }")
@@ -0,0 +1,217 @@
+"""
+运行时诊断 - 采样分析器、tracemalloc 快照对比、线程与 asyncio 任务栈
+
+- 采样分析器在独立线程中按固定间隔读取 sys._current_frames(), 输出折叠栈 (flamegraph.pl / speedscope 可直接读取)
+  或自包含的 SVG 火焰图; 默认忽略阻塞在 select / 条件变量 / 线程池队列上的空闲栈
+- tracemalloc 快照保存为基线, 下一次对比时按分配位置给出增长最多的条目
+- 线程栈与 asyncio 任务栈以文本形式输出, 用于排查卡死与事件循环阻塞
+"""
+
+import io 
+import os 
+import sys 
+import time 
+import asyncio 
+import threading 
+import traceback 
+import tracemalloc 
+from collections import Counter 
+from html import escape 
+from typing import Any ,Dict ,List ,Optional ,Tuple 
+
+
+IDLE_FRAMES ={
+('selectors.py','select'),
+('threading.py','wait'),
+('threading.py','_wait_for_tstate_lock'),
+('queue.py','get'),
+('thread.py','_worker'),
+('tracing.py','_run'),
+}
+
+TRACEMALLOC_IGNORED =('<frozen importlib._bootstrap>','<frozen importlib._bootstrap_external>','<unknown>',tracemalloc .__file__ )
+
+
+def _frame_label (frame )->str :
+
+    code =frame .f_code 
+    return f"{code .co_name } ({os .path .basename (code .co_filename )}:{frame .f_lineno })"
+
+
+def _is_idle (frame )->bool :
+
+    return (os .path .basename (frame .f_code .co_filename ),frame .f_code .co_name )in IDLE_FRAMES 
+
+
+def sample_stacks (seconds :float ,interval :float =0.01 ,include_idle :bool =False )->Tuple [Counter ,int ]:
+
+
+    own =threading .get_ident ()
+    names :Dict [int ,str ]={}
+    stacks :Counter =Counter ()
+    samples =0 
+    deadline =time .monotonic ()+seconds 
+
+    while time .monotonic ()<deadline :
+        for ident ,frame in sys ._current_frames ().items ():
+            if ident ==own or (not include_idle and _is_idle (frame )):
+                continue 
+            name =names .get (ident )
+            if name is None :
+                names .update ((thread .ident ,thread .name )for thread in threading .enumerate ())
+                name =names .get (ident ,f"thread-{ident }")
+            labels =[]
+            while frame is not None :
+                labels .append (_frame_label (frame ))
+                frame =frame .f_back 
+            labels .append (name )
+            stacks [';'.join (reversed (labels ))]+=1 
+        samples +=1 
+        time .sleep (interval )
+    return stacks ,samples 
+
+
+def render_collapsed (stacks :Counter )->str :
+
+    return ''.join (f"{stack } {count }\n"for stack ,count in stacks .most_common ())
+
+
+def render_flamegraph (stacks :Counter ,title :str ="CPU samples",width :int =1200 ,row_height :int =16 )->str :
+
+
+    root :Dict [str ,Any ]={'count':0 ,'children':{}}
+    for stack ,count in stacks .items ():
+        node =root 
+        node ['count']+=count 
+        for label in stack .split (';'):
+            node =node ['children'].setdefault (label ,{'count':0 ,'children':{}})
+            node ['count']+=count 
+
+    total =max (1 ,root ['count'])
+    rects :List [str ]=[]
+    depth_max =0 
+
+    def walk (children :Dict [str ,Any ],x :float ,depth :int )->None :
+        nonlocal depth_max 
+        depth_max =max (depth_max ,depth )
+        for label ,node in sorted (children .items ()):
+            w =node ['count']/total *width 
+            if w >=0.5 :
+                y =(depth +1 )*row_height +24 
+                hue =20 +sum (map (ord ,label .split (' (')[0 ]))%40 
+                text =escape (label [:int (w /7 )])if w >21 else ""
+                rects .append (
+                f'<g><title>{escape (label )} ({node ["count"]} samples, {node ["count"]*100 /total :.1f}%)</title>'
+                f'<rect x="{x :.1f}" y="{y }" width="{w :.1f}" height="{row_height -1 }" fill="hsl({hue },85%,60%)"/>'
+                f'<text x="{x +3 :.1f}" y="{y +row_height -4 }">{text }</text></g>'
+                )
+                walk (node ['children'],x ,depth +1 )
+            x +=w 
+
+    walk (root ['children'],0.0 ,0 )
+    height =(depth_max +2 )*row_height +24 
+    return (
+    f'<svg xmlns="http://www.w3.org/2000/svg" width="{width }" height="{height }" font-family="monospace" font-size="11">'
+    f'<text x="4" y="16" font-size="13">{escape (title )} - {total } samples</text>'
+    +''.join (rects )+'</svg>'
+    )
+
+
+def dump_threads ()->str :
+
+    frames =sys ._current_frames ()
+    out =io .StringIO ()
+    for thread in threading .enumerate ():
+        out .write (f"Thread {thread .name } (ident={thread .ident }, daemon={thread .daemon })\n")
+        frame =frames .get (thread .ident )
+        if frame is not None :
+            out .write (''.join (traceback .format_stack (frame )))
+        out .write ("\n")
+    return out .getvalue ()
+
+
+def dump_tasks (loop :Optional [asyncio .AbstractEventLoop ]=None )->str :
+
+    out =io .StringIO ()
+    tasks =sorted (asyncio .all_tasks (loop ),key =lambda task :task .get_name ())
+    out .write (f"{len (tasks )} asyncio tasks\n\n")
+    for task in tasks :
+        task .print_stack (file =out )
+        out .write ("\n")
+    return out .getvalue ()
+
+
+class TracemallocTracker :
+
+
+    def __init__ (self ):
+        self .baseline :Optional [tracemalloc .Snapshot ]=None 
+        self .lock =threading .Lock ()
+
+    def start (self ,frames :int =10 )->Dict [str ,Any ]:
+
+        with self .lock :
+            if not tracemalloc .is_tracing ():
+                tracemalloc .start (frames )
+            self .baseline =None 
+        return self .status ()
+
+    def stop (self )->Dict [str ,Any ]:
+
+        with self .lock :
+            tracemalloc .stop ()
+            self .baseline =None 
+        return self .status ()
+
+    def status (self )->Dict [str ,Any ]:
+
+        current ,peak =tracemalloc .get_traced_memory ()
+        return {
+        'tracing':tracemalloc .is_tracing (),
+        'frames':tracemalloc .get_traceback_limit (),
+        'traced_kb':round (current /1024 ,1 ),
+        'peak_kb':round (peak /1024 ,1 ),
+        'has_baseline':self .baseline is not None 
+        }
+
+    def _take (self )->tracemalloc .Snapshot :
+
+        if not tracemalloc .is_tracing ():
+            raise RuntimeError ("tracemalloc is not running, start it first")
+        return tracemalloc .take_snapshot ().filter_traces (
+        [tracemalloc .Filter (False ,pattern )for pattern in TRACEMALLOC_IGNORED ]
+        )
+
+    @staticmethod 
+    def _where (traceback_ :tracemalloc .Traceback )->List [str ]:
+
+        return [f"{frame .filename }:{frame .lineno }"for frame in traceback_ ]
+
+    def snapshot (self ,limit :int =30 ,key_type :str ='lineno')->Dict [str ,Any ]:
+
+        with self .lock :
+            snapshot =self ._take ()
+            self .baseline =snapshot 
+        stats =snapshot .statistics (key_type )
+        return dict (self .status (),top =[
+        {'where':self ._where (stat .traceback ),'size_kb':round (stat .size /1024 ,1 ),'count':stat .count }
+        for stat in stats [:limit ]
+        ])
+
+    def diff (self ,limit :int =30 ,key_type :str ='lineno')->Dict [str ,Any ]:
+
+        with self .lock :
+            snapshot =self ._take ()
+            baseline ,self .baseline =self .baseline ,snapshot 
+        if baseline is None :
+            return dict (self .status (),top =[],note ="no baseline yet, this snapshot is the new baseline")
+        stats =snapshot .compare_to (baseline ,key_type )
+        return dict (self .status (),top =[
+        {
+        'where':self ._where (stat .traceback ),
+        'size_diff_kb':round (stat .size_diff /1024 ,1 ),
+        'size_kb':round (stat .size /1024 ,1 ),
+        'count_diff':stat .count_diff 
+        }
+        for stat in stats [:limit ]
+        ])
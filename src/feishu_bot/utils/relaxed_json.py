@@ -0,0 +1,213 @@
+"""
+宽松 JSON 解析 - 兼容 Windows 下 Claude Code hook 发出的不规范请求体
+
+支持的写法 (单次线性扫描, 不使用回溯正则):
+- 整体被单引号包裹, 末尾可带分号: '{"type":"completed"}';
+- 单引号字符串, 除 \\' 外反斜杠原样保留 (如 'C:\\Users\\dev')
+- 不带引号的键: {type:completed}
+- 不带引号的值, 直到下一个键或对象结束: {description:Claude Code task completed}
+- {{placeholder}} 占位符值
+- 尾随逗号
+"""
+
+import re 
+from typing import Any ,List ,Tuple 
+
+MAX_DEPTH =256 
+MAX_KEY_LOOKAHEAD =64 
+MAX_PLACEHOLDER =256 
+
+_WHITESPACE =re .compile (r'[ \t\r\n]*')
+_DOUBLE_CHUNK =re .compile (r'[^"\\]+')
+_SINGLE_CHUNK =re .compile (r"[^'\\]+")
+_BARE_KEY =re .compile (r'[^\s:,{}\[\]"\']{1,%d}'%MAX_KEY_LOOKAHEAD )
+_OBJECT_BARE_CHUNK =re .compile (r'[^,}]+')
+_ARRAY_BARE_CHUNK =re .compile (r'[^,\]]+')
+_NUMBER =re .compile (r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?')
+_LOOKS_LIKE_KEY =re .compile (r'[ \t\r\n]*(?:"[^"\\]{0,%d}"|\'[^\'\\]{0,%d}\'|[^\s:,{}\[\]"\']{1,%d})[ \t\r\n]*:'%(
+MAX_KEY_LOOKAHEAD ,MAX_KEY_LOOKAHEAD ,MAX_KEY_LOOKAHEAD ))
+_VALUE_END =re .compile (r'[ \t\r\n]*(?:[,}\]]|$)')
+
+_ESCAPES ={
+'"':'"','\\':'\\','/':'/',
+'b':'\b','f':'\f','n':'\n','r':'\r','t':'\t'
+}
+
+_LITERALS ={'true':True ,'false':False ,'null':None }
+
+
+class RelaxedJSONError (ValueError ):
+
+    def __init__ (self ,msg :str ,pos :int ):
+        super ().__init__ (f"{msg } at position {pos }")
+        self .pos =pos 
+
+
+class _Parser :
+
+    __slots__ =('text','length')
+
+    def __init__ (self ,text :str ):
+        self .text =text 
+        self .length =len (text )
+
+    def skip (self ,pos :int )->int :
+
+        return _WHITESPACE .match (self .text ,pos ).end ()
+
+    def value (self ,pos :int ,depth :int ,in_array :bool )->Tuple [Any ,int ]:
+
+        if depth >MAX_DEPTH :
+            raise RelaxedJSONError ("Nesting too deep",pos )
+        if pos >=self .length :
+            raise RelaxedJSONError ("Unexpected end of input",pos )
+
+        char =self .text [pos ]
+        if char =='{':
+            if self .text .startswith ('{{',pos ):
+                end =self .text .find ('}}',pos +2 ,pos +MAX_PLACEHOLDER )
+                if end !=-1 :
+                    return self .text [pos :end +2 ],end +2 
+            return self .object (pos +1 ,depth +1 )
+        if char =='[':
+            return self .array (pos +1 ,depth +1 )
+        if char =='"'or char =="'":
+            return self .string (pos +1 ,char )
+        return self .bare (pos ,in_array )
+
+    def object (self ,pos :int ,depth :int )->Tuple [dict ,int ]:
+
+        result ={}
+        pos =self .skip (pos )
+        while True :
+            if pos >=self .length :
+                raise RelaxedJSONError ("Unterminated object",pos )
+            char =self .text [pos ]
+            if char =='}':
+                return result ,pos +1 
+
+            if char =='"'or char =="'":
+                key ,pos =self .string (pos +1 ,char )
+            else :
+                match =_BARE_KEY .match (self .text ,pos )
+                if match is None :
+                    raise RelaxedJSONError ("Expected object key",pos )
+                key ,pos =match .group (),match .end ()
+
+            pos =self .skip (pos )
+            if pos >=self .length or self .text [pos ]!=':':
+                raise RelaxedJSONError ("Expected ':' after object key",pos )
+            pos =self .skip (pos +1 )
+
+            result [key ],pos =self .value (pos ,depth ,False )
+            pos =self .skip (pos )
+            if pos <self .length and self .text [pos ]==',':
+                pos =self .skip (pos +1 )
+            elif pos <self .length and self .text [pos ]!='}':
+                raise RelaxedJSONError ("Expected ',' or '}'",pos )
+
+    def array (self ,pos :int ,depth :int )->Tuple [list ,int ]:
+
+        result :List [Any ]=[]
+        pos =self .skip (pos )
+        while True :
+            if pos >=self .length :
+                raise RelaxedJSONError ("Unterminated array",pos )
+            if self .text [pos ]==']':
+                return result ,pos +1 
+
+            item ,pos =self .value (pos ,depth ,True )
+            result .append (item )
+            pos =self .skip (pos )
+            if pos <self .length and self .text [pos ]==',':
+                pos =self .skip (pos +1 )
+            elif pos <self .length and self .text [pos ]!=']':
+                raise RelaxedJSONError ("Expected ',' or ']'",pos )
+
+    def string (self ,pos :int ,quote :str )->Tuple [str ,int ]:
+
+        chunk =_DOUBLE_CHUNK if quote =='"'else _SINGLE_CHUNK 
+        parts =[]
+        while True :
+            match =chunk .match (self .text ,pos )
+            if match is not None :
+                parts .append (match .group ())
+                pos =match .end ()
+            if pos >=self .length :
+                raise RelaxedJSONError ("Unterminated string",pos )
+
+            char =self .text [pos ]
+            if char ==quote :
+                return ''.join (parts ),pos +1 
+
+            escaped =self .text [pos +1 :pos +2 ]
+            if quote =="'":
+                if escaped =="'":
+                    parts .append ("'")
+                    pos +=2 
+                else :
+                    parts .append ('\\')
+                    pos +=1 
+            elif escaped in _ESCAPES :
+                parts .append (_ESCAPES [escaped ])
+                pos +=2 
+            elif escaped =='u'and re .fullmatch (r'[0-9a-fA-F]{4}',self .text [pos +2 :pos +6 ]):
+                parts .append (chr (int (self .text [pos +2 :pos +6 ],16 )))
+                pos +=6 
+            else :
+                parts .append ('\\')
+                pos +=1 
+
+    def bare (self ,pos :int ,in_array :bool )->Tuple [Any ,int ]:
+
+
+        chunk =_ARRAY_BARE_CHUNK if in_array else _OBJECT_BARE_CHUNK 
+        start =pos 
+        braces =0 
+        while True :
+            match =chunk .match (self .text ,pos )
+            if match is not None :
+                braces +=match .group ().count ('{')
+                pos =match .end ()
+            if pos >=self .length :
+                break 
+
+            char =self .text [pos ]
+            if char ==','and (in_array or _LOOKS_LIKE_KEY .match (self .text ,pos +1 )or _VALUE_END .match (self .text ,pos +1 )):
+                break 
+            if char =='}'and braces >0 :
+                braces -=1 
+            elif char in '}]'and _VALUE_END .match (self .text ,pos +1 ):
+                break 
+            pos +=1 
+
+        raw =self .text [start :pos ].strip ()
+        if not raw :
+            raise RelaxedJSONError ("Expected value",start )
+        if raw in _LITERALS :
+            return _LITERALS [raw ],pos 
+        if _NUMBER .fullmatch (raw ):
+            return (float (raw )if any (c in raw for c in '.eE')else int (raw )),pos 
+        return raw ,pos 
+
+
+def _unwrap (text :str )->str :
+
+    text =text .strip ()
+    if text .endswith (';'):
+        text =text [:-1 ].rstrip ()
+    if len (text )>=2 and text [0 ]=="'"and text [-1 ]=="'"and text [1 :2 ]in ('{','['):
+        text =text [1 :-1 ]
+    return text 
+
+
+def parse_relaxed (text :str )->Any :
+
+
+    text =_unwrap (text )
+    parser =_Parser (text )
+    value ,pos =parser .value (parser .skip (0 ),0 ,False )
+    pos =parser .skip (pos )
+    if pos !=len (text ):
+        raise RelaxedJSONError ("Extra data after value",pos )
+    return value 
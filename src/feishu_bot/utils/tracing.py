@@ -0,0 +1,469 @@
+"""
+链路追踪 - 轻量级 span, 按 OpenTelemetry OTLP/JSON 格式导出 (不依赖 opentelemetry-sdk)
+
+- 当前 span 保存在 contextvars 中, asyncio 任务与 asyncio.to_thread 自动继承; 经过内部队列时显式传递父 span
+- token / event_id 由子 span 自动继承, 同一事件或同一会话的所有 span 可直接按属性检索
+- 结束的 span 进入有界队列, 后台线程批量导出: 写入本地文件 (每行一个 ExportTraceServiceRequest)
+  或 POST 到 OTLP/HTTP 收集器的 /v1/traces; 队列写满时丢弃, 不阻塞请求
+- 未启用或未被采样时返回空 span, 热路径上只有一次全局变量或 contextvar 读取
+"""
+
+import time 
+import queue 
+import atexit 
+import random 
+import logging 
+import threading 
+import contextvars 
+from pathlib import Path 
+from contextlib import contextmanager 
+from typing import Any ,Dict ,Iterator ,List ,Optional 
+
+from .import jsoncodec 
+
+logger =logging .getLogger (__name__ )
+
+
+KIND_INTERNAL =1 
+KIND_SERVER =2 
+KIND_CLIENT =3 
+KIND_PRODUCER =4 
+KIND_CONSUMER =5 
+
+STATUS_UNSET =0 
+STATUS_OK =1 
+STATUS_ERROR =2 
+
+INHERITED_ATTRIBUTES =('token','event_id')
+SCOPE_NAME ='feishu_bot'
+
+_current :contextvars .ContextVar =contextvars .ContextVar ('feishu_bot_span',default =None )
+_tracer :Optional ['Tracer']=None 
+
+
+def _attribute_value (value :Any )->Dict [str ,Any ]:
+
+    if isinstance (value ,bool ):
+        return {'boolValue':value }
+    if isinstance (value ,int ):
+        return {'intValue':str (value )}
+    if isinstance (value ,float ):
+        return {'doubleValue':value }
+    return {'stringValue':str (value )}
+
+
+def _attributes (values :Dict [str ,Any ])->List [Dict [str ,Any ]]:
+
+    return [{'key':key ,'value':_attribute_value (value )}for key ,value in values .items ()]
+
+
+class NoopSpan :
+
+
+    __slots__ =()
+
+    recording =False 
+    trace_id =""
+    span_id =""
+
+    @property 
+    def attributes (self )->Dict [str ,Any ]:
+        return {}
+
+    def set_attribute (self ,key :str ,value :Any )->None :
+        pass 
+
+    def set_attributes (self ,values :Dict [str ,Any ])->None :
+        pass 
+
+    def set_status (self ,code :int ,message :str ="")->None :
+        pass 
+
+    def end (self ,end_ns :int =0 )->None :
+        pass 
+
+    def __enter__ (self )->'NoopSpan':
+        return self 
+
+    def __exit__ (self ,exc_type ,exc ,tb )->None :
+        return None 
+
+
+NOOP_SPAN =NoopSpan ()
+
+
+class _UnsampledSpan (NoopSpan ):
+
+
+    __slots__ =('_token',)
+
+    def __enter__ (self )->NoopSpan :
+        self ._token =_current .set (NOOP_SPAN )
+        return self 
+
+    def __exit__ (self ,exc_type ,exc ,tb )->None :
+        try :
+            _current .reset (self ._token )
+        except ValueError :
+            pass 
+
+
+class Span :
+
+
+    __slots__ =(
+    'tracer','name','kind','trace_id','span_id','parent_id',
+    'start_ns','end_ns','attributes','status','status_message','_token'
+    )
+
+    recording =True 
+
+    def __init__ (self ,tracer :'Tracer',name :str ,kind :int ,trace_id :str ,parent_id :str ,attributes :Dict [str ,Any ]):
+        self .tracer =tracer 
+        self .name =name 
+        self .kind =kind 
+        self .trace_id =trace_id 
+        self .span_id ='%016x'%random .getrandbits (64 )
+        self .parent_id =parent_id 
+        self .start_ns =time .time_ns ()
+        self .end_ns =0 
+        self .attributes =attributes 
+        self .status =STATUS_UNSET 
+        self .status_message =""
+        self ._token =None 
+
+    def set_attribute (self ,key :str ,value :Any )->None :
+
+        if value is not None :
+            self .attributes [key ]=value 
+
+    def set_attributes (self ,values :Dict [str ,Any ])->None :
+
+        for key ,value in values .items ():
+            self .set_attribute (key ,value )
+
+    def set_status (self ,code :int ,message :str ="")->None :
+
+        self .status =code 
+        self .status_message =message 
+
+    def end (self ,end_ns :int =0 )->None :
+
+        if self .end_ns :
+            return 
+        self .end_ns =end_ns or time .time_ns ()
+        self .tracer .on_end (self )
+
+    @property 
+    def duration_ms (self )->float :
+
+        return ((self .end_ns or time .time_ns ())-self .start_ns )/1e6 
+
+    def __enter__ (self )->'Span':
+        self ._token =_current .set (self )
+        return self 
+
+    def __exit__ (self ,exc_type ,exc ,tb )->None :
+
+        if exc is not None and self .status ==STATUS_UNSET :
+            self .set_status (STATUS_ERROR ,f"{exc_type .__name__ }: {exc }")
+        self .end ()
+        if self ._token is not None :
+            try :
+                _current .reset (self ._token )
+            except ValueError :
+                pass 
+            self ._token =None 
+
+    def to_otlp (self )->Dict [str ,Any ]:
+
+        data ={
+        'traceId':self .trace_id ,
+        'spanId':self .span_id ,
+        'name':self .name ,
+        'kind':self .kind ,
+        'startTimeUnixNano':str (self .start_ns ),
+        'endTimeUnixNano':str (self .end_ns ),
+        'attributes':_attributes (self .attributes ),
+        'status':{'code':self .status }
+        }
+        if self .parent_id :
+            data ['parentSpanId']=self .parent_id 
+        if self .status_message :
+            data ['status']['message']=self .status_message 
+        return data 
+
+
+class FileSpanExporter :
+
+
+    def __init__ (self ,path :str ):
+        self .path =Path (path )
+        self .path .parent .mkdir (parents =True ,exist_ok =True )
+
+    def export (self ,payload :bytes )->None :
+
+        with open (self .path ,'ab')as f :
+            f .write (payload +b'\n')
+
+    def __repr__ (self )->str :
+        return f"file:{self .path }"
+
+
+class OtlpHttpSpanExporter :
+
+
+    def __init__ (self ,endpoint :str ,timeout :float =5.0 ):
+        endpoint =endpoint .rstrip ('/')
+        self .url =endpoint if endpoint .endswith ('/v1/traces')else f"{endpoint }/v1/traces"
+        self .timeout =timeout 
+
+    def export (self ,payload :bytes )->None :
+
+        import urllib .request 
+        request =urllib .request .Request (
+        self .url ,
+        data =payload ,
+        headers ={'Content-Type':'application/json'},
+        method ='POST'
+        )
+        with urllib .request .urlopen (request ,timeout =self .timeout )as response :
+            response .read ()
+
+    def __repr__ (self )->str :
+        return self .url 
+
+
+class Tracer :
+
+
+    def __init__ (
+    self ,
+    exporter ,
+    service :str ="feishu-bot",
+    sample_rate :float =1.0 ,
+    queue_size :int =4096 ,
+    batch_size :int =256 ,
+    flush_interval_seconds :float =2.0 
+    ):
+        self .exporter =exporter 
+        self .service =service 
+        self .sample_rate =sample_rate 
+        self .batch_size =max (1 ,batch_size )
+        self .flush_interval_seconds =flush_interval_seconds 
+        self .resource =_attributes ({'service.name':service ,'telemetry.sdk.name':SCOPE_NAME })
+
+        self .started =0 
+        self .exported =0 
+        self .dropped =0 
+        self .failed =0 
+
+        self ._queue :queue .Queue =queue .Queue (maxsize =queue_size )
+        self ._thread =threading .Thread (target =self ._run ,name ="span-exporter",daemon =True )
+        self ._thread .start ()
+
+    def start_span (self ,name :str ,kind :int =KIND_INTERNAL ,parent =None ,attributes :Optional [Dict [str ,Any ]]=None ):
+
+
+        if parent is None :
+            parent =_current .get ()
+        if parent is None :
+            if self .sample_rate <1.0 and random .random ()>=self .sample_rate :
+                return _UnsampledSpan ()
+            trace_id ='%032x'%random .getrandbits (128 )
+            parent_id =""
+            values ={}
+        elif not parent .recording :
+            return NOOP_SPAN 
+        else :
+            trace_id =parent .trace_id 
+            parent_id =parent .span_id 
+            values ={key :parent .attributes [key ]for key in INHERITED_ATTRIBUTES if key in parent .attributes }
+
+        if attributes :
+            values .update ((key ,value )for key ,value in attributes .items ()if value is not None )
+        self .started +=1 
+        return Span (self ,name ,kind ,trace_id ,parent_id ,values )
+
+    def on_end (self ,span :Span )->None :
+
+        try :
+            self ._queue .put_nowait (span )
+        except queue .Full :
+            self .dropped +=1 
+
+    def _run (self )->None :
+
+        batch :List [Span ]=[]
+        deadline =time .monotonic ()+self .flush_interval_seconds 
+        while True :
+            try :
+                item =self ._queue .get (timeout =max (0.0 ,deadline -time .monotonic ()))
+            except queue .Empty :
+                item =False 
+
+            if isinstance (item ,Span ):
+                batch .append (item )
+                if len (batch )<self .batch_size :
+                    continue 
+            if batch :
+                self ._export (batch )
+                batch =[]
+            deadline =time .monotonic ()+self .flush_interval_seconds 
+            if item is None :
+                return 
+
+    def _export (self ,batch :List [Span ])->None :
+
+        payload ={'resourceSpans':[{
+        'resource':{'attributes':self .resource },
+        'scopeSpans':[{'scope':{'name':SCOPE_NAME },'spans':[span .to_otlp ()for span in batch ]}]
+        }]}
+        try :
+            self .exporter .export (jsoncodec .dumpb (payload ))
+            self .exported +=len (batch )
+        except Exception as e :
+            self .failed +=len (batch )
+            logger .warning (f"Failed to export {len (batch )} spans to {self .exporter }: {e }")
+
+    def shutdown (self ,timeout :float =5.0 )->None :
+
+        if not self ._thread .is_alive ():
+            return 
+        try :
+            self ._queue .put (None ,timeout =timeout )
+        except queue .Full :
+            logger .warning ("Span queue full at shutdown, pending spans dropped")
+            return 
+        self ._thread .join (timeout )
+
+    def stats (self )->Dict [str ,Any ]:
+
+        return {
+        'exporter':repr (self .exporter ),
+        'sample_rate':self .sample_rate ,
+        'started':self .started ,
+        'queued':self ._queue .qsize (),
+        'exported':self .exported ,
+        'dropped':self .dropped ,
+        'failed':self .failed 
+        }
+
+
+def setup_tracing (tracing_config ,service :str ="")->Optional [Tracer ]:
+
+
+    global _tracer 
+    if _tracer is not None or not tracing_config .enabled :
+        return _tracer 
+
+    if tracing_config .exporter =="otlp":
+        exporter =OtlpHttpSpanExporter (tracing_config .endpoint ,tracing_config .timeout_seconds )
+    else :
+        path =Path (tracing_config .file )
+        if service :
+            path =path .with_name (f"{path .stem }-{service }{path .suffix }")
+        exporter =FileSpanExporter (str (path ))
+
+    _tracer =Tracer (
+    exporter ,
+    service =f"{tracing_config .service_name }-{service }"if service else tracing_config .service_name ,
+    sample_rate =tracing_config .sample_rate ,
+    queue_size =tracing_config .queue_size ,
+    batch_size =tracing_config .batch_size ,
+    flush_interval_seconds =tracing_config .flush_interval_seconds 
+    )
+    atexit .register (shutdown_tracing )
+    logger .info (f"Tracing enabled, exporting to {exporter } (sample rate {tracing_config .sample_rate })")
+    return _tracer 
+
+
+def shutdown_tracing (timeout :float =5.0 )->None :
+
+    global _tracer 
+    if _tracer is not None :
+        _tracer .shutdown (timeout )
+        _tracer =None 
+
+
+def tracing_stats ()->Dict [str ,Any ]:
+
+    if _tracer is None :
+        return {'enabled':False }
+    return dict (_tracer .stats (),enabled =True )
+
+
+def span (name :str ,kind :int =KIND_INTERNAL ,parent =None ,**attributes ):
+
+
+    tracer =_tracer 
+    if tracer is None :
+        return NOOP_SPAN 
+    return tracer .start_span (name ,kind ,parent ,attributes )
+
+
+def current_span ():
+
+    return _current .get ()
+
+
+def set_attribute (key :str ,value :Any )->None :
+
+    current =_current .get ()
+    if current is not None :
+        current .set_attribute (key ,value )
+
+
+def record_span (name :str ,start_ns :int ,end_ns :int ,**attributes )->None :
+
+
+    recorded =span (name ,**attributes )
+    if recorded .recording :
+        recorded .start_ns =start_ns 
+        recorded .end (end_ns )
+
+
+@contextmanager 
+def timed (timings :Dict [str ,float ],phase :str ,name :str ="",**attributes )->Iterator [Any ]:
+
+
+    started =time .perf_counter ()
+    with span (name or phase ,**attributes )as current :
+        try :
+            yield current 
+        finally :
+            timings [phase ]=round ((time .perf_counter ()-started )*1000 ,3 )
+
+
+class TracingMiddleware :
+
+
+    def __init__ (self ,app ,service :str ,exclude =('/health','/metrics')):
+        self .app =app 
+        self .service =service 
+        self .exclude =tuple (exclude )
+
+    async def __call__ (self ,scope ,receive ,send ):
+
+        if scope ['type']!='http'or _tracer is None or scope ['path']in self .exclude :
+            await self .app (scope ,receive ,send )
+            return 
+
+        status =[500 ]
+
+        async def send_with_status (message ):
+            if message ['type']=='http.response.start':
+                status [0 ]=message ['status']
+            await send (message )
+
+        attributes ={'service':self .service ,'http.method':scope ['method'],'http.target':scope ['path']}
+        with span (f"{scope ['method']} {scope ['path']}",KIND_SERVER ,**attributes )as current :
+            try :
+                await self .app (scope ,receive ,send_with_status )
+            finally :
+                route =scope .get ('route')
+                if route is not None and current .recording :
+                    current .name =f"{scope ['method']} {route .path }"
+                current .set_attribute ('http.status_code',status [0 ])
+                if status [0 ]>=500 :
+                    current .set_status (STATUS_ERROR ,f"HTTP {status [0 ]}")
@@ -0,0 +1,144 @@
+"""
+事件循环卡顿看门狗 - 持续测量事件循环延迟, 卡顿时记录事件循环线程的调用栈
+
+- 心跳任务每隔 interval 休眠一次, 实际醒来时间与预期之差即为事件循环延迟, 写入直方图
+- 监控线程独立于事件循环运行, 心跳超过 threshold 未更新时立即抓取事件循环线程当前的调用栈,
+  此时阻塞调用仍在栈上, 日志直接指向卡住事件循环的代码
+- 卡顿结束后记录总时长, 便于按日志统计每一处阻塞调用的影响
+"""
+
+import sys 
+import time 
+import asyncio 
+import logging 
+import threading 
+import traceback 
+from typing import Any ,Dict ,Optional 
+
+from .import metrics 
+
+logger =logging .getLogger (__name__ )
+
+
+LOOP_LAG_BUCKETS =(0.001 ,0.005 ,0.01 ,0.025 ,0.05 ,0.1 ,0.25 ,0.5 ,1 ,2.5 ,5 ,10 ,30 )
+
+LOOP_LAG_SECONDS =metrics .histogram (
+'feishu_bot_event_loop_lag_seconds',
+"Delay between when the watchdog heartbeat was due and when the event loop ran it",
+(),
+LOOP_LAG_BUCKETS 
+)
+LOOP_BLOCKED_SECONDS =metrics .gauge (
+'feishu_bot_event_loop_blocked_seconds',
+"Time since the last watchdog heartbeat beyond the heartbeat interval"
+)
+LOOP_STALLS =metrics .counter (
+'feishu_bot_event_loop_stalls_total',
+"Event loop stalls longer than the watchdog threshold"
+)
+
+
+class LoopWatchdog :
+
+
+    def __init__ (self ,interval :float =0.1 ,threshold :float =0.5 ,stack_limit :int =30 ):
+        self .interval =interval 
+        self .threshold =threshold 
+        self .stack_limit =stack_limit 
+
+        self .stalls =0 
+        self .max_lag =0.0 
+        self .last_stall :Optional [Dict [str ,Any ]]=None 
+
+        self ._last_beat =time .monotonic ()
+        self ._stalled_at :Optional [float ]=None 
+        self ._loop_thread :Optional [int ]=None 
+        self ._task :Optional [asyncio .Task ]=None 
+        self ._thread :Optional [threading .Thread ]=None 
+        self ._stopping =threading .Event ()
+
+    @classmethod 
+    def from_config (cls ,watchdog_config )->'LoopWatchdog':
+
+        return cls (
+        interval =watchdog_config .interval_ms /1000 ,
+        threshold =watchdog_config .threshold_ms /1000 ,
+        stack_limit =watchdog_config .stack_limit 
+        )
+
+    def blocked_for (self )->float :
+
+        return max (0.0 ,time .monotonic ()-self ._last_beat -self .interval )
+
+    def start (self )->None :
+
+        if self ._task is not None :
+            return 
+        self ._loop_thread =threading .get_ident ()
+        self ._last_beat =time .monotonic ()
+        self ._stopping .clear ()
+        self ._task =asyncio .ensure_future (self ._heartbeat ())
+        self ._thread =threading .Thread (target =self ._monitor ,name ="loop-watchdog",daemon =True )
+        self ._thread .start ()
+        LOOP_BLOCKED_SECONDS .set_function (self .blocked_for )
+        logger .info (f"Event loop watchdog started (interval {self .interval *1000 :g}ms, threshold {self .threshold *1000 :g}ms)")
+
+    async def stop (self )->None :
+
+        if self ._task is None :
+            return 
+        self ._stopping .set ()
+        self ._task .cancel ()
+        await asyncio .gather (self ._task ,return_exceptions =True )
+        self ._task =None 
+        await asyncio .to_thread (self ._thread .join ,1.0 )
+        LOOP_BLOCKED_SECONDS .set_function (None )
+
+    async def _heartbeat (self )->None :
+
+        while True :
+            started =time .monotonic ()
+            await asyncio .sleep (self .interval )
+            now =time .monotonic ()
+            lag =max (0.0 ,now -started -self .interval )
+            self ._last_beat =now 
+            LOOP_LAG_SECONDS .observe (lag )
+            self .max_lag =max (self .max_lag ,lag )
+
+            if self ._stalled_at is not None :
+                self ._stalled_at =None 
+                if self .last_stall is not None :
+                    self .last_stall ['duration_ms']=round (lag *1000 ,1 )
+                logger .warning (f"Event loop stall ended after {lag *1000 :.0f}ms")
+
+    def _monitor (self )->None :
+
+        check_interval =max (0.01 ,min (self .interval ,self .threshold /4 ))
+        while not self ._stopping .wait (check_interval ):
+            blocked =self .blocked_for ()
+            if blocked <self .threshold or self ._stalled_at is not None :
+                continue 
+
+            self ._stalled_at =self ._last_beat 
+            self .stalls +=1 
+            LOOP_STALLS .inc ()
+            frame =sys ._current_frames ().get (self ._loop_thread )
+            stack =''.join (traceback .format_stack (frame ,self .stack_limit ))if frame is not None else "<unavailable>\n"
+            self .last_stall ={
+            'at':time .time (),
+            'blocked_ms':round (blocked *1000 ,1 ),
+            'duration_ms':None ,
+            'stack':stack 
+            }
+            logger .warning (f"Event loop blocked for {blocked *1000 :.0f}ms, event loop thread stack:\n{stack .rstrip ()}")
+
+    def stats (self )->Dict [str ,Any ]:
+
+        return {
+        'running':self ._task is not None ,
+        'threshold_ms':self .threshold *1000 ,
+        'stalls':self .stalls ,
+        'max_lag_ms':round (self .max_lag *1000 ,1 ),
+        'blocked_ms':round (self .blocked_for ()*1000 ,1 )if self ._task is not None else 0.0 ,
+        'last_stall':dict (self .last_stall ,stack =self .last_stall ['stack'].splitlines ()[-4 :])if self .last_stall else None 
+        }